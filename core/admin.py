@@ -1,3 +1,46 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import ChangeLogCheckpoint, ChangeLogEntry, DeletionJob, ImageAsset, StoredFile
+
+
+@admin.register(DeletionJob)
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = ('model_label', 'object_id', 'object_repr', 'status', 'deleted_rows', 'created_at', 'finished_at')
+    list_filter = ('status', 'model_label')
+    readonly_fields = ('model_label', 'object_id', 'object_repr', 'deleted_rows', 'error', 'requested_by',
+                       'created_at', 'started_at', 'finished_at')
+    ordering = ('-created_at',)
+
+
+@admin.register(ChangeLogEntry)
+class ChangeLogEntryAdmin(admin.ModelAdmin):
+    list_display = ('seq', 'model', 'object_id', 'action', 'request_id', 'created_at')
+    list_filter = ('action', 'model')
+    search_fields = ('object_id', 'request_id')
+    ordering = ('-seq',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ChangeLogCheckpoint)
+class ChangeLogCheckpointAdmin(admin.ModelAdmin):
+    list_display = ('consumer', 'position', 'updated_at')
+
+
+@admin.register(ImageAsset)
+class ImageAssetAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'sha256', 'width', 'height', 'created_at', 'processed_at')
+    list_filter = ('status',)
+    search_fields = ('name', 'sha256')
+    readonly_fields = ('name', 'sha256', 'width', 'height', 'error', 'created_at', 'processed_at')
+
+
+@admin.register(StoredFile)
+class StoredFileAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'refcount', 'created_at')
+    search_fields = ('name', 'sha256')
+    readonly_fields = ('name', 'sha256', 'size', 'refcount', 'created_at')
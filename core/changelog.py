@@ -0,0 +1,198 @@
+"""
+Change-data feed over ChangeLogEntry.
+
+Writers: models extending ChangeLoggedModel record saves themselves; their
+ChangeLogQuerySet records update/bulk_create/bulk_update; the receivers
+connected here record deletes (including cascades) and M2M changes. All of
+these run inside the writing transaction.
+
+Readers: Consumer('search-index').poll() returns entries after the stored
+checkpoint and commit() advances it. On PostgreSQL sequence values are
+handed out before commit, so a consumer can see seq N+1 before N. Consumers
+therefore re-read CHANGELOG_REREAD_WINDOW seqs behind their checkpoint and
+skip the entries they already returned; after a restart the window is
+delivered again, so handlers must be idempotent. Tail does the same for
+in-memory readers, from the head they loaded their snapshot at.
+"""
+import logging
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, router
+from django.db.models import Max, Min, OuterRef, Subquery
+from django.db.models.signals import m2m_changed, post_delete
+from django.utils import timezone
+
+from . import metrics
+from .db import retry_on_lock
+from .models import ChangeLogCheckpoint, ChangeLogEntry, ChangeLoggedModel
+
+logger = logging.getLogger(__name__)
+
+
+def tracked_models():
+    return [model for model in apps.get_models() if issubclass(model, ChangeLoggedModel)]
+
+
+def _record_delete(sender, instance, using, **kwargs):
+    ChangeLogEntry.record(sender, [instance.pk], 'delete', None, using)
+
+
+def _record_m2m(sender, instance, action, reverse, model, pk_set, using, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, ChangeLoggedModel):
+        ChangeLogEntry.record(type(instance), [instance.pk], 'update', None, using)
+    if pk_set and issubclass(model, ChangeLoggedModel):
+        ChangeLogEntry.record(model, sorted(pk_set), 'update', None, using)
+
+
+def connect():
+    """Called from CoreConfig.ready()."""
+    for model in tracked_models():
+        post_delete.connect(_record_delete, sender=model, dispatch_uid=f'changelog-delete-{model._meta.label}')
+        for field in model._meta.local_many_to_many:
+            m2m_changed.connect(_record_m2m, sender=field.remote_field.through,
+                                dispatch_uid=f'changelog-m2m-{model._meta.label}-{field.name}')
+
+
+def read(after=0, limit=1000, models=None, using=DEFAULT_DB_ALIAS):
+    """Entries with seq > after, oldest first. models: optional list of 'app.Model' labels."""
+    queryset = ChangeLogEntry.objects.using(using).filter(seq__gt=after)
+    if models:
+        queryset = queryset.filter(model__in=models)
+    return list(queryset.order_by('seq')[:limit])
+
+
+class Tail:
+    """
+    In-memory position for per-process readers that keep no checkpoint row
+    (the read model, the suggestion index, live updates). Like Consumer it
+    re-reads CHANGELOG_REREAD_WINDOW seqs behind the position and skips the
+    entries it already returned:
+        tail = Tail([...])
+        head = tail.start()    # then load the snapshot
+        for entry in tail.poll():
+            ...
+    """
+
+    def __init__(self, models=None, using=DEFAULT_DB_ALIAS):
+        self.models = models
+        self.using = using
+        self.position = 0
+        # seqs inside the re-read window already returned, or reflected by the snapshot
+        self._seen = set()
+
+    def _entries(self):
+        queryset = ChangeLogEntry.objects.using(self.using)
+        return queryset.filter(model__in=self.models) if self.models else queryset
+
+    def start(self):
+        """
+        Follow from the current head and return it. Call it before loading the
+        snapshot: the window's entries committed by now are then in the
+        snapshot, later ones are still returned by poll().
+        """
+        self.position = ChangeLogEntry.objects.using(self.using).aggregate(seq=Max('seq'))['seq'] or 0
+        self._seen = set(self._entries().filter(
+            seq__gt=max(self.position - settings.CHANGELOG_REREAD_WINDOW, 0)).values_list('seq', flat=True))
+        return self.position
+
+    def poll(self, limit=1000):
+        after = max(self.position - settings.CHANGELOG_REREAD_WINDOW, 0)
+        self._seen = {seq for seq in self._seen if seq > after}
+        # at most the window's worth of the rows read are behind the position
+        entries = read(after, limit + self.position - after, self.models, self.using)
+        entries = [entry for entry in entries if entry.seq not in self._seen][:limit]
+        self._seen.update(entry.seq for entry in entries)
+        if entries:
+            self.position = max(self.position, entries[-1].seq)
+        return entries
+
+
+class Consumer:
+    """
+    Checkpointed reader:
+        consumer = Consumer('search-index')
+        for entry in consumer.poll():
+            ...
+        consumer.commit()
+    """
+
+    def __init__(self, name, models=None, using=DEFAULT_DB_ALIAS):
+        self.name = name
+        self.using = using
+        self._last = None
+        self._tail = Tail(models, using)
+
+    @property
+    def position(self):
+        checkpoint = ChangeLogCheckpoint.objects.using(self.using).filter(consumer=self.name).first()
+        return checkpoint.position if checkpoint else 0
+
+    def poll(self, limit=1000):
+        # from the stored checkpoint, which commit() or another process may have moved
+        self._tail.position = self.position
+        entries = self._tail.poll(limit)
+        self._last = self._tail.position if entries else None
+        return entries
+
+    @retry_on_lock
+    def commit(self, position=None):
+        """Store position (default: the last entry returned by poll)."""
+        position = self._last if position is None else position
+        if position is None:
+            return
+        ChangeLogCheckpoint.objects.using(self.using).update_or_create(
+            consumer=self.name, defaults={'position': position},
+        )
+
+    def reset(self, position=0):
+        self.commit(position)
+
+
+@retry_on_lock
+def _delete(ids):
+    return ChangeLogEntry.objects.filter(seq__in=ids).delete()[0]
+
+
+def compact(older_than_days=None, batch_size=None):
+    """
+    Drop entries older than the cutoff that a newer entry for the same
+    object supersedes, then old delete tombstones every consumer has read.
+    Returns the number of entries removed.
+    """
+    days = settings.CHANGELOG_COMPACT_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.CHANGELOG_COMPACT_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=days)
+
+    latest = ChangeLogEntry.objects.filter(
+        model=OuterRef('model'), object_id=OuterRef('object_id'),
+    ).order_by('-seq').values('seq')[:1]
+    superseded = ChangeLogEntry.objects.filter(created_at__lt=cutoff).exclude(seq=Subquery(latest))
+    tombstones = ChangeLogEntry.objects.filter(created_at__lt=cutoff, action='delete')
+    consumed = ChangeLogCheckpoint.objects.aggregate(position=Min('position'))['position']
+    tombstones = tombstones.filter(seq__lte=consumed) if consumed is not None else tombstones
+
+    removed = 0
+    for queryset in (superseded, tombstones):
+        while True:
+            ids = list(queryset.order_by('seq').values_list('seq', flat=True)[:batch_size])
+            if not ids:
+                break
+            removed += _delete(ids)
+    logger.info('Compacted %s change log entries', removed)
+    return removed
+
+
+def _outbox_depth():
+    using = router.db_for_read(ChangeLogEntry)
+    head = ChangeLogEntry.objects.using(using).aggregate(seq=Max('seq'))['seq'] or 0
+    return {
+        (('consumer', consumer),): head - position
+        for consumer, position in ChangeLogCheckpoint.objects.using(using).values_list('consumer', 'position')
+    }
+
+
+OUTBOX_DEPTH = metrics.Gauge('changelog_outbox_depth', 'Change log entries each consumer has not read yet.', _outbox_depth)
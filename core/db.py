@@ -0,0 +1,79 @@
+import functools
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def is_lock_error(exc):
+    message = str(exc).lower()
+    return 'database is locked' in message or 'database is busy' in message or 'database table is locked' in message
+
+
+def retry_on_lock(func=None, *, using=DEFAULT_DB_ALIAS, attempts=None, base_delay=None):
+    """
+    Run func in transaction.atomic() and retry it when SQLite reports lock
+    contention. With IMMEDIATE transactions the lock is taken at BEGIN, so a
+    failed attempt has not written anything yet. Nested inside another atomic
+    block it just runs once, since only the outer transaction can retry.
+    """
+    if func is None:
+        return functools.partial(retry_on_lock, using=using, attempts=attempts, base_delay=base_delay)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        tries = attempts or settings.DB_LOCK_RETRY_ATTEMPTS
+        delay = base_delay or settings.DB_LOCK_RETRY_DELAY
+        if connections[using].in_atomic_block:
+            return func(*args, **kwargs)
+        for attempt in range(1, tries + 1):
+            try:
+                with transaction.atomic(using=using):
+                    return func(*args, **kwargs)
+            except OperationalError as e:
+                if attempt == tries or not is_lock_error(e):
+                    raise
+                logger.warning('Database locked, retrying %s (attempt %s/%s)', func.__qualname__, attempt, tries)
+                time.sleep(delay * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+
+    return wrapper
+
+
+def stream(queryset, chunk_size=None):
+    """
+    Iterate a large queryset without loading it all. On PostgreSQL this uses a
+    named server-side cursor; on SQLite rows are fetched in chunks.
+    """
+    return queryset.iterator(chunk_size=chunk_size or settings.DB_STREAM_CHUNK_SIZE)
+
+
+@asynccontextmanager
+async def async_execute_wrapper(wrapper, aliases=None):
+    """
+    connection.execute_wrapper() for async code. The async ORM runs queries
+    through thread-sensitive sync_to_async, i.e. on the one thread serving the
+    request, whose connections are not the ones visible from the event loop;
+    the wrapper is installed on that thread's connections instead.
+    """
+    aliases = list(aliases or connections)
+
+    def install():
+        for alias in aliases:
+            connections[alias].execute_wrappers.append(wrapper)
+
+    def remove():
+        for alias in aliases:
+            connections[alias].execute_wrappers.remove(wrapper)
+
+    await sync_to_async(install)()
+    try:
+        yield
+    finally:
+        await sync_to_async(remove)()
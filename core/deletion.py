@@ -0,0 +1,158 @@
+"""
+Two-phase deletion for objects with large cascades.
+
+schedule_deletion() runs in the request: it stamps deleted_at (and clears
+is_active) on the objects and on cascading children that also have
+deleted_at, so LiveManager hides them at once, and queues a DeletionJob.
+Only the objects themselves go to the change log there.
+
+purge() runs from manage.py process_deletions: it walks the model's cascade
+graph leaf first and removes rows in batches of DELETION_BATCH_SIZE, one
+short transaction per batch, without loading model instances or firing
+delete signals. Each batch is written to the change log in its transaction:
+deletes for change-logged rows, and updates for the change-logged rows on
+the other side of removed M2M links. An interrupted purge resumes where it
+stopped because a parent row is only removed after all of its children.
+"""
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models
+from django.db.models import F
+from django.utils import timezone
+
+from .db import retry_on_lock
+from .models import ChangeLogEntry, ChangeLoggedModel, DeletionJob
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeBlocked(Exception):
+    """A PROTECT/RESTRICT relation still references a row being purged."""
+
+
+def _soft_fields(model, now):
+    names = {field.name for field in model._meta.concrete_fields}
+    fields = {}
+    if 'deleted_at' in names:
+        fields['deleted_at'] = now
+    if 'is_active' in names:
+        fields['is_active'] = False
+    return fields
+
+
+@retry_on_lock
+def schedule_deletion(queryset, requested_by=None):
+    """Hide every object in queryset now and queue it for purging. Returns the count."""
+    model = queryset.model
+    objects = list(queryset.values_list('pk', flat=True).order_by())
+    if not objects:
+        return 0
+    now = timezone.now()
+    reprs = {obj.pk: str(obj)[:200] for obj in model._base_manager.filter(pk__in=objects)}
+    model._base_manager.filter(pk__in=objects).update(**_soft_fields(model, now))
+    if issubclass(model, ChangeLoggedModel):
+        ChangeLogEntry.record(model, objects, 'delete')
+    for rel in model._meta.related_objects:
+        child = rel.related_model
+        child_fields = _soft_fields(child, now) if rel.one_to_many else {}
+        if rel.on_delete is models.CASCADE and 'deleted_at' in child_fields:
+            # logged by the purge, in batches, rather than all here
+            child._base_manager.filter(**{f'{rel.field.name}__in': objects}, deleted_at__isnull=True).update(
+                **child_fields)
+    DeletionJob.objects.bulk_create([
+        DeletionJob(model_label=model._meta.label, object_id=pk, object_repr=reprs.get(pk, ''),
+                    requested_by=requested_by if getattr(requested_by, 'is_authenticated', False) else None)
+        for pk in objects
+    ])
+    return len(objects)
+
+
+class Purger:
+    def __init__(self, job, batch_size=None, progress=None):
+        self.job = job
+        self.batch_size = batch_size or settings.DELETION_BATCH_SIZE
+        self.progress = progress or (lambda job: None)
+
+    def _log(self, model, field, ids):
+        """Change log entries for a batch about to be deleted by a cascade through field."""
+        if issubclass(model, ChangeLoggedModel):
+            # the job's own rows were logged by schedule_deletion()
+            if field != 'pk':
+                ChangeLogEntry.record(model, ids, 'delete')
+            return
+        if not model._meta.auto_created:
+            return
+        # an M2M through row: the rows it linked, other than the one being purged, changed
+        for link in model._meta.concrete_fields:
+            if link.is_relation and link.name != field and issubclass(link.related_model, ChangeLoggedModel):
+                linked = model._base_manager.filter(pk__in=ids).order_by().values_list(link.attname, flat=True)
+                ChangeLogEntry.record(link.related_model, sorted(set(linked)), 'update')
+
+    @retry_on_lock
+    def _delete(self, model, field, ids):
+        self._log(model, field, ids)
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)} '
+                f'WHERE {connection.ops.quote_name(model._meta.pk.column)} IN ({placeholders})', ids,
+            )
+            count = cursor.rowcount
+        DeletionJob.objects.filter(pk=self.job.pk).update(deleted_rows=F('deleted_rows') + count)
+        return count
+
+    def _report(self, count):
+        self.job.deleted_rows += count
+        self.progress(self.job)
+
+    def _delete_batches(self, model, field, ids):
+        """Delete the rows of model whose field is in ids, children first."""
+        queryset = model._base_manager.filter(**{f'{field}__in': ids}).order_by().values_list('pk', flat=True)
+        while True:
+            batch = list(queryset[:self.batch_size])
+            if not batch:
+                return
+            self.purge_children(model, batch)
+            self._report(self._delete(model, field, batch))
+
+    @retry_on_lock
+    def _set_null(self, model, field, ids):
+        return model._base_manager.filter(**{f'{field}__in': ids}).update(**{field: None})
+
+    def purge_children(self, model, ids):
+        # include_hidden also yields the FKs of auto-created M2M through tables
+        for rel in model._meta.get_fields(include_hidden=True):
+            if not (rel.auto_created and not rel.concrete and (rel.one_to_many or rel.one_to_one)):
+                continue
+            child = rel.related_model
+            if child._meta.proxy or not child._meta.managed:
+                continue
+            if rel.on_delete is models.CASCADE:
+                self._delete_batches(child, rel.field.name, ids)
+            elif rel.on_delete is models.SET_NULL:
+                self._set_null(child, rel.field.name, ids)
+            elif rel.on_delete in (models.PROTECT, models.RESTRICT):
+                if child._base_manager.filter(**{f'{rel.field.name}__in': ids}).exists():
+                    raise PurgeBlocked(f'{child._meta.label} rows still reference {model._meta.label} {ids[:5]}')
+
+    def run(self):
+        model = apps.get_model(self.job.model_label)
+        self._delete_batches(model, 'pk', [self.job.object_id])
+
+
+def purge(job, batch_size=None, progress=None):
+    """Remove a queued object and everything that cascades from it."""
+    DeletionJob.objects.filter(pk=job.pk).update(status='running', started_at=timezone.now())
+    job.status = 'running'
+    try:
+        Purger(job, batch_size, progress).run()
+    except Exception as e:
+        logger.exception('Deletion job %s failed', job.pk)
+        DeletionJob.objects.filter(pk=job.pk).update(status='failed', error=str(e), finished_at=timezone.now())
+        job.status = 'failed'
+        return job
+    DeletionJob.objects.filter(pk=job.pk).update(status='done', finished_at=timezone.now())
+    job.status = 'done'
+    return job
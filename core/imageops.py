@@ -0,0 +1,67 @@
+"""
+Pillow work for the image pipeline (core.images). Kept free of Django so it
+can run in a spawned process pool without setting Django up.
+"""
+import hashlib
+import os
+
+from PIL import Image, ImageOps
+
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def variant_dir(root, sha256):
+    return os.path.join(root, sha256[:2], sha256)
+
+
+def variant_name(variant, fmt):
+    return f'{variant}.{"jpg" if fmt == "jpeg" else fmt}'
+
+
+def _save(image, path, fmt, quality):
+    tmp = path + '.tmp'
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    # no exif= argument: metadata (GPS, camera, thumbnails) is not carried over
+    image.save(tmp, FORMATS[fmt], quality=quality, optimize=fmt == 'jpeg', progressive=fmt == 'jpeg')
+    os.replace(tmp, path)
+
+
+def render_variants(source, root, variants, quality, sha256=None):
+    """
+    Writes <root>/<sha[:2]>/<sha>/<variant>.<webp|jpg> for every variant
+    {'card': (640, 360), ...} of source, center-cropped to the exact size.
+    Identical content is only processed once. sha256 is hashed from source
+    unless the caller already knows it. Returns the hash, original size and
+    whether anything was rendered.
+    """
+    sha256 = sha256 or file_hash(source)
+    directory = variant_dir(root, sha256)
+    expected = [os.path.join(directory, variant_name(variant, fmt)) for variant in variants for fmt in FORMATS]
+
+    with Image.open(source) as original:
+        width, height = original.size
+        if all(os.path.exists(path) for path in expected):
+            return {'sha256': sha256, 'width': width, 'height': height, 'rendered': False}
+
+        # apply the EXIF orientation before the metadata is dropped
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+        os.makedirs(directory, exist_ok=True)
+        for variant, size in variants.items():
+            resized = ImageOps.fit(image, tuple(size), Image.Resampling.LANCZOS)
+            for fmt in FORMATS:
+                _save(resized, os.path.join(directory, variant_name(variant, fmt)), fmt, quality)
+    return {'sha256': sha256, 'width': width, 'height': height, 'rendered': True}
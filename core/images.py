@@ -0,0 +1,195 @@
+"""
+Resized WebP/JPEG variants of uploaded images.
+
+register(Event, 'image') watches an ImageField. Once a save that sets a new
+file commits, an ImageAsset row is created and the file goes to a process
+pool (core.imageops). The pool renders every IMAGE_VARIANTS size at 1x and
+2x with EXIF dropped, into MEDIA_ROOT/IMAGE_VARIANTS_DIR/<sha[:2]>/<sha>/,
+so identical uploads share one set of files. When a job finishes, the asset
+is marked ready and the owning rows' updated_at is touched, so cached cards
+and pages pick the variants up.
+
+Templates use the tags in core.templatetags.images, which fall back to the
+original file until the asset is ready. Listings look up the hashes of a
+page's images in one query first (ready_hashes()). A name's hash never
+changes once it is ready, so workers keep it; an image that is not ready is
+asked about again after IMAGE_PENDING_RECHECK seconds, or as soon as a job
+finishes (the 'images' invalidation namespace). Jobs lost with a
+worker process are picked up by `manage.py process_images`.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from . import imageops, invalidation, metrics, storage
+
+logger = logging.getLogger(__name__)
+
+DENSITIES = (1, 2)
+
+IMAGE_JOBS = metrics.Counter('image_jobs', 'Image variant jobs by result (rendered/deduplicated/failed).')
+
+_fields = []
+_ready = invalidation.LocalCache('images', max_entries=10000)
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def variants():
+    """{'card': (640, 360), 'card@2x': (1280, 720), ...}"""
+    sizes = {}
+    for variant, (width, height) in settings.IMAGE_VARIANTS.items():
+        for density in DENSITIES:
+            suffix = '' if density == 1 else f'@{density}x'
+            sizes[variant + suffix] = (width * density, height * density)
+    return sizes
+
+
+def variants_root():
+    return os.path.join(settings.MEDIA_ROOT, settings.IMAGE_VARIANTS_DIR)
+
+
+def variant_url(sha256, variant, fmt):
+    name = imageops.variant_name(variant, fmt)
+    return f'{settings.MEDIA_URL}{settings.IMAGE_VARIANTS_DIR}/{sha256[:2]}/{sha256}/{name}'
+
+
+def ready_hashes(names):
+    """{name: content hash, or None while pending, failed or unknown} in at most one query."""
+    from .models import ImageAsset
+
+    names = {name for name in names if name}
+    now = time.monotonic()
+    # entries are (hash, None) once ready, else (None, when to ask again)
+    entries = {name: entry for name, entry in _ready.get_many(names).items()
+               if entry[1] is None or entry[1] > now}
+    missing = names - entries.keys()
+    if missing:
+        generation = _ready.generation
+        ready = dict(ImageAsset.objects.filter(name__in=missing, status='ready').values_list('name', 'sha256'))
+        recheck = now + settings.IMAGE_PENDING_RECHECK
+        looked_up = {name: (ready[name], None) if name in ready else (None, recheck) for name in missing}
+        _ready.set_many(looked_up, generation)
+        entries.update(looked_up)
+    return {name: entry[0] for name, entry in entries.items()}
+
+
+def ready_hash(name):
+    """Content hash of a processed image, or None while it is pending, failed or unknown."""
+    if not name:
+        return None
+    return ready_hashes([name])[name]
+
+
+def get_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            # spawn: the children only run Pillow and must not inherit the parent's DB connections
+            _pool = ProcessPoolExecutor(settings.IMAGE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+            _pool_pid = os.getpid()
+        return _pool
+
+
+@atexit.register
+def _shutdown():
+    if _pool is not None and _pool_pid == os.getpid():
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _touch_owners(name):
+    now = timezone.now()
+    for model, field_name in _fields:
+        queryset = model._default_manager.filter(**{field_name: name})
+        if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+            queryset.update(updated_at=now)
+
+
+def finish(name, result=None, error=None):
+    """Record a job's outcome; runs in the pool's callback thread or the command."""
+    from .models import ImageAsset
+
+    try:
+        if error is not None:
+            logger.warning('Image variants failed', extra={'image': name, 'error': repr(error)})
+            ImageAsset.objects.filter(name=name).update(status='failed', error=repr(error),
+                                                        processed_at=timezone.now())
+            IMAGE_JOBS.inc(result='failed')
+            return
+        ImageAsset.objects.filter(name=name).update(
+            status='ready', sha256=result['sha256'], width=result['width'], height=result['height'], error='',
+            processed_at=timezone.now())
+        IMAGE_JOBS.inc(result='rendered' if result['rendered'] else 'deduplicated')
+        # drop the workers' "pending" entries first, or the re-rendered cards would keep the original
+        invalidation.bump_on_commit('images')
+        # cached cards and pages re-render and look the hash up again
+        _touch_owners(name)
+    finally:
+        if threading.current_thread() is not threading.main_thread():
+            connections.close_all()
+
+
+def _done(name, future):
+    try:
+        result = future.result()
+    except Exception as e:
+        finish(name, error=e)
+    else:
+        finish(name, result)
+
+
+def job_args(name):
+    # content-addressed names already carry the hash, the worker does not read the file for it
+    return default_storage.path(name), variants_root(), variants(), settings.IMAGE_QUALITY, storage.name_hash(name)
+
+
+def submit(name):
+    future = get_pool().submit(imageops.render_variants, *job_args(name))
+    future.add_done_callback(partial(_done, name))
+    return future
+
+
+def enqueue(names):
+    """Create assets for new names and hand them to the pool."""
+    from .models import ImageAsset
+
+    for name in names:
+        _, created = ImageAsset.objects.get_or_create(name=name)
+        if created:
+            submit(name)
+
+
+def _saved(sender, instance, raw=False, using=None, **kwargs):
+    if raw or not settings.IMAGE_PIPELINE_ENABLED:
+        return
+    names = []
+    for model, field_name in _fields:
+        if model is sender:
+            field = model._meta.get_field(field_name)
+            name = getattr(instance, field_name).name
+            if name and name != field.get_default() and ready_hash(name) is None:
+                names.append(name)
+    if names:
+        transaction.on_commit(partial(enqueue, names), using=using)
+
+
+def register(model, field_name):
+    """Process the images stored in model.field_name."""
+    _fields.append((model, field_name))
+    post_save.connect(_saved, sender=model, dispatch_uid=f'images-{model._meta.label}')
+
+
+def registered_fields():
+    return list(_fields)
@@ -0,0 +1,276 @@
+"""
+Cross-worker invalidation for per-process caches.
+
+Generation counters live in a small memory-mapped file (INVALIDATION_FILE)
+shared by every worker on the host: one 8-byte slot per namespace, chosen
+by hashing the name (a collision only means an extra invalidation).
+Writers bump a namespace when a watched model commits a change; each
+worker compares the counters it has seen at request start
+(InvalidationMiddleware) and runs the subscribers of the namespaces that
+moved, so only stale caches are dropped.
+
+    invalidation.watch('categories', Category)
+    categories = invalidation.LocalCache('categories')
+    categories.get_or_set('all', lambda: list(Category.objects.all()))
+
+Caches shared between workers (the Django cache) can instead put
+generation() of their namespaces into the key, so a bump makes old entries
+unreachable without deleting them; watch_objects() maps a logged write to
+per-object namespaces for that.
+
+ChangeLoggedModel subclasses are bumped from ChangeLogEntry.record(), which
+also covers queryset.update() and bulk writes; other models (auth Group,
+auto-created M2M through tables) are bumped from their signals.
+"""
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import zlib
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+SLOTS = 4096
+_SLOT = struct.Struct('<Q')
+
+INVALIDATIONS = metrics.Counter('cache_invalidations', 'Per-process cache namespaces dropped after a bump.')
+
+_subscribers = defaultdict(list)
+_seen = {}
+_watched = defaultdict(set)
+_resolvers = defaultdict(list)
+_lock = threading.Lock()
+
+
+def _slot(namespace):
+    return zlib.crc32(namespace.encode()) % SLOTS * _SLOT.size
+
+
+class GenerationFile:
+    """The shared counters; opened lazily and again after a fork."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._fd = None
+        self._map = None
+        self._pid = None
+
+    def _open(self):
+        if self._map is None or self._pid != os.getpid():
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            size = SLOTS * _SLOT.size
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._fd, self._map, self._pid = fd, mmap.mmap(fd, size), os.getpid()
+        return self._map
+
+    def read(self, namespace):
+        return _SLOT.unpack_from(self._open(), _slot(namespace))[0]
+
+    def bump(self, namespace):
+        counters = self._open()
+        offset = _slot(namespace)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            value = _SLOT.unpack_from(counters, offset)[0] + 1
+            _SLOT.pack_into(counters, offset, value)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return value
+
+
+_file = None
+
+
+def get_file():
+    global _file
+    if _file is None:
+        _file = GenerationFile(settings.INVALIDATION_FILE)
+    return _file
+
+
+def subscribe(namespace, callback):
+    """Run callback() in this process whenever namespace is bumped by any worker."""
+    with _lock:
+        _subscribers[namespace].append(callback)
+        if namespace not in _seen:
+            try:
+                _seen[namespace] = get_file().read(namespace)
+            except OSError:
+                _seen[namespace] = None
+
+
+def _invalidate(namespace):
+    callbacks = _subscribers.get(namespace)
+    if callbacks:
+        for callback in callbacks:
+            callback()
+        INVALIDATIONS.inc(namespace=namespace)
+
+
+def generation(namespace):
+    """Current counter for namespace, or None if the shared file is unusable."""
+    try:
+        return get_file().read(namespace)
+    except OSError:
+        logger.warning('Could not read invalidation counters', exc_info=True)
+        return None
+
+
+def check():
+    """Drop the local caches of every namespace bumped since the last check."""
+    if not _seen:
+        return []
+    try:
+        generations = {namespace: get_file().read(namespace) for namespace in list(_seen)}
+    except OSError:
+        logger.warning('Could not read invalidation counters', exc_info=True)
+        return []
+    stale = []
+    with _lock:
+        for namespace, generation in generations.items():
+            if _seen[namespace] != generation:
+                _seen[namespace] = generation
+                stale.append(namespace)
+    for namespace in stale:
+        _invalidate(namespace)
+    return stale
+
+
+def bump(*namespaces):
+    """Advance the counters now; this process is invalidated immediately."""
+    for namespace in namespaces:
+        try:
+            generation = get_file().bump(namespace)
+        except OSError:
+            logger.warning('Could not bump %s, other workers keep their cache', namespace, exc_info=True)
+            generation = None
+        with _lock:
+            if namespace in _seen:
+                _seen[namespace] = generation
+        _invalidate(namespace)
+
+
+def bump_on_commit(*namespaces, using=None):
+    """Bump once the current transaction commits (immediately outside one)."""
+    transaction.on_commit(partial(bump, *namespaces), using=using)
+
+
+def changed(label, object_ids, action, using=None):
+    """Called by ChangeLogEntry.record() for every logged write."""
+    namespaces = set(_watched.get(label, ()))
+    for resolver in _resolvers.get(label, ()):
+        namespaces.update(resolver(object_ids, action, using))
+    if namespaces:
+        bump_on_commit(*sorted(namespaces), using=using)
+
+
+def _signal_receiver(namespace):
+    def receiver(sender, using=None, **kwargs):
+        if kwargs.get('action', 'post_').startswith('post_'):
+            bump_on_commit(namespace, using=using)
+    return receiver
+
+
+def watch(namespace, *models):
+    """Bump namespace whenever one of models changes."""
+    from .models import ChangeLoggedModel
+
+    for model in models:
+        if issubclass(model, ChangeLoggedModel):
+            _watched[model._meta.label].add(namespace)
+            continue
+        receiver = _signal_receiver(namespace)
+        uid = f'invalidation-{namespace}-{model._meta.label}'
+        if model._meta.auto_created:
+            m2m_changed.connect(receiver, sender=model, dispatch_uid=uid, weak=False)
+        else:
+            post_save.connect(receiver, sender=model, dispatch_uid=uid + '-save', weak=False)
+            post_delete.connect(receiver, sender=model, dispatch_uid=uid + '-delete', weak=False)
+
+
+def watch_objects(model, resolver):
+    """
+    For a change-logged model: resolver(object_ids, action, using) returns
+    the namespaces to bump. It runs inside the writing transaction.
+    """
+    _resolvers[model._meta.label].append(resolver)
+
+
+class LocalCache:
+    """
+    Per-process dict emptied whenever its namespace is bumped. A value
+    computed while a bump lands is returned but not stored.
+    """
+
+    def __init__(self, namespace, max_entries=None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._data = {}
+        self._generation = 0
+        subscribe(namespace, self.clear)
+
+    def clear(self):
+        self._data = {}
+        self._generation += 1
+
+    def get_or_set(self, key, default):
+        data = self._data
+        try:
+            value = data[key]
+        except KeyError:
+            metrics.record_cache(self.namespace, False)
+        else:
+            metrics.record_cache(self.namespace, True)
+            return value
+        generation = self._generation
+        value = default()
+        self._store(key, value, generation)
+        return value
+
+    async def aget_or_set(self, key, default):
+        """get_or_set() with a coroutine function as default."""
+        try:
+            value = self._data[key]
+        except KeyError:
+            metrics.record_cache(self.namespace, False)
+        else:
+            metrics.record_cache(self.namespace, True)
+            return value
+        generation = self._generation
+        value = await default()
+        self._store(key, value, generation)
+        return value
+
+    @property
+    def generation(self):
+        """Pass to set_many() to drop values computed across a bump."""
+        return self._generation
+
+    def get_many(self, keys):
+        """{key: value} for the keys held; the rest can be looked up together and set_many()."""
+        data = self._data
+        found = {key: data[key] for key in keys if key in data}
+        metrics.record_cache(self.namespace, True, len(found))
+        metrics.record_cache(self.namespace, False, len(keys) - len(found))
+        return found
+
+    def set_many(self, values, generation):
+        for key, value in values.items():
+            self._store(key, value, generation)
+
+    def _store(self, key, value, generation):
+        if generation == self._generation:
+            if self.max_entries and len(self._data) >= self.max_entries:
+                self.clear()
+            self._data[key] = value
@@ -0,0 +1,127 @@
+"""
+Structured logging: records are rendered to JSON lines on the calling thread
+(so lazy values and request context resolve there) and handed to a
+QueueListener thread that does the blocking write.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from functools import cached_property
+from logging.handlers import QueueHandler, QueueListener
+
+from django.conf import settings
+
+request_id = contextvars.ContextVar('request_id', default=None)
+
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+
+class Lazy:
+    """
+    Defers an expensive log argument until the record is actually emitted.
+    Usage: logger.debug('%s matches', Lazy(queryset.count))
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    @cached_property
+    def value(self):
+        return self.func(*self.args, **self.kwargs)
+
+    def __str__(self):
+        return str(self.value)
+
+
+class RequestIDFilter(logging.Filter):
+    def filter(self, record):
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of records per logger, from LOG_SAMPLE_RATES
+    ({'events.views': 0.1}); the longest matching logger prefix wins and
+    WARNING and above are never dropped.
+    """
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = None
+        best = -1
+        for name, value in settings.LOG_SAMPLE_RATES.items():
+            if (record.name == name or record.name.startswith(name + '.')) and len(name) > best:
+                rate, best = value, len(name)
+        return rate is None or random.random() < rate
+
+
+def _json_default(value):
+    if isinstance(value, Lazy):
+        return value.value
+    return str(value)
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info:
+            data['exc'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(data, default=_json_default)
+
+
+class QueueStreamHandler(QueueHandler):
+    """Formats on the caller, writes on a background listener thread."""
+
+    def __init__(self, stream=None):
+        super().__init__(queue.SimpleQueue())
+        self.setFormatter(JSONFormatter())
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.listener = None
+        self._pid = None
+        self._start()
+        atexit.register(self._stop)
+
+    def _start(self):
+        # a forked worker inherits the handler but not the listener thread
+        self.listener = QueueListener(self.queue, self.target)
+        self.listener.start()
+        self._pid = os.getpid()
+
+    def _stop(self):
+        if self.listener is not None and self._pid == os.getpid():
+            self.listener.stop()
+            self.listener = None
+
+    def prepare(self, record):
+        line = self.format(record)
+        record = logging.makeLogRecord({
+            'name': record.name, 'levelno': record.levelno, 'levelname': record.levelname,
+            'msg': line, 'created': record.created,
+        })
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        super().enqueue(record)
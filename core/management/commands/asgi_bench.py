@@ -0,0 +1,129 @@
+import http.client
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = ('Load the public read endpoints under gunicorn (sync views, WSGI) and uvicorn '
+            '(async views, ASGI) and compare requests/s and latency')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Server processes for each server')
+        parser.add_argument('--concurrency', type=int, default=32, help='Concurrent keep-alive clients')
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per server')
+        parser.add_argument('--port', type=int, default=8101, help='First of the two ports used')
+        parser.add_argument('--no-page-cache', action='store_true',
+                            help='Disable the anonymous page cache so every request renders')
+
+    def servers(self, options):
+        workers = str(options['workers'])
+        return {
+            'gunicorn/sync': (
+                ['gunicorn', 'event_management.wsgi:application', '--workers', workers,
+                 '--bind', f'127.0.0.1:{options["port"]}'],
+                options['port'], {'ASYNC_VIEWS': 'False'},
+            ),
+            'uvicorn/async': (
+                ['uvicorn', 'event_management.asgi:application', '--workers', workers,
+                 '--port', str(options['port'] + 1), '--no-access-log'],
+                options['port'] + 1, {'ASYNC_VIEWS': 'True'},
+            ),
+        }
+
+    def start(self, command, port, env, options):
+        environment = dict(os.environ, DEBUG='False', **env)
+        if options['no_page_cache']:
+            environment['PAGE_CACHE_ENABLED'] = 'False'
+        # a file rather than a pipe, a chatty server must not block on a full pipe
+        log = tempfile.TemporaryFile()
+        process = subprocess.Popen(command, env=environment, stdout=subprocess.DEVNULL, stderr=log)
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                log.seek(0)
+                raise CommandError(f'{command[0]} exited: {log.read().decode()[-2000:]}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+                return process
+            except OSError:
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f'{command[0]} did not start listening on port {port}')
+
+    def load(self, port, paths, concurrency, requests):
+        latencies = []
+        errors = []
+        counter = iter(range(requests))
+        lock = threading.Lock()
+
+        def client():
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            timings = []
+            try:
+                while True:
+                    with lock:
+                        number = next(counter, None)
+                    if number is None:
+                        break
+                    started = time.perf_counter()
+                    connection.request('GET', paths[number % len(paths)])
+                    response = connection.getresponse()
+                    response.read()
+                    timings.append(time.perf_counter() - started)
+                    if response.status != 200:
+                        errors.append(response.status)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+            latencies.extend(timings)
+
+        clients = [threading.Thread(target=client) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        return len(latencies) / elapsed, latencies, errors
+
+    def percentile(self, latencies, fraction):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000 if latencies else 0
+
+    def handle(self, *args, **options):
+        missing = [name for name in ('gunicorn', 'uvicorn') if not shutil.which(name)]
+        if missing:
+            raise CommandError(f'{" and ".join(missing)} not installed (pip install -r requirements.txt)')
+
+        paths = ['/', '/events/']
+        event = Event.objects.order_by('-date').values_list('pk', flat=True).first()
+        if event is not None:
+            paths.append(f'/event/{event}/')
+
+        self.stdout.write(f'{options["workers"]} worker(s) each, {options["concurrency"]} clients, '
+                          f'{options["requests"]} requests over {", ".join(paths)}'
+                          f'{" (page cache off)" if options["no_page_cache"] else ""}')
+        for name, (command, port, env) in self.servers(options).items():
+            process = self.start(command, port, env, options)
+            try:
+                # one pass per path first so caches and read models are warm in every worker
+                self.load(port, paths, len(paths), len(paths) * options['workers'] * 2)
+                rate, latencies, errors = self.load(port, paths, options['concurrency'], options['requests'])
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+            self.stdout.write(f'{name:<14} {rate:>8.0f} requests/s  p50 {self.percentile(latencies, 0.5):>7.1f} ms  '
+                              f'p99 {self.percentile(latencies, 0.99):>7.1f} ms  errors {len(errors)}')
+            if errors:
+                self.stdout.write(self.style.WARNING(f'  first error: {errors[0]!r}'))
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import changelog
+
+
+class Command(BaseCommand):
+    help = 'Compact the change log: keep only the latest entry per object once entries are old enough'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CHANGELOG_COMPACT_AFTER_DAYS,
+                            help='Only compact entries older than this many days')
+        parser.add_argument('--batch-size', type=int, default=settings.CHANGELOG_COMPACT_BATCH_SIZE,
+                            help='Entries deleted per transaction')
+
+    def handle(self, *args, **options):
+        removed = changelog.compact(options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} change log entries'))
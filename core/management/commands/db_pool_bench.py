@@ -0,0 +1,70 @@
+import copy
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from events.models import Event
+
+
+class Command(BaseCommand):
+    help = ('Compare request-style throughput against PostgreSQL with and without the '
+            'psycopg connection pool (connect, query, close per simulated request)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent simulated requests')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per thread')
+
+    def alias(self, name, pooled):
+        settings_dict = copy.deepcopy(connections[DEFAULT_DB_ALIAS].settings_dict)
+        options = settings_dict['OPTIONS']
+        if pooled:
+            options.setdefault('pool', {'min_size': 2, 'max_size': 10})
+        else:
+            options.pop('pool', None)
+        settings_dict['CONN_MAX_AGE'] = 0
+        connections.settings[name] = settings_dict
+        return name
+
+    def run(self, alias, threads, requests):
+        errors = []
+        queryset = Event.objects.using(alias).select_related('category').order_by('date', 'time')
+
+        def worker():
+            try:
+                for _ in range(requests):
+                    # what a request does with CONN_MAX_AGE=0: connect, query, close
+                    list(queryset[:20])
+                    connections[alias].close()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections[alias].close()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if errors:
+            raise CommandError(f'{len(errors)} worker(s) failed: {errors[0]}')
+        return threads * requests / elapsed
+
+    def handle(self, *args, **options):
+        if connections[DEFAULT_DB_ALIAS].vendor != 'postgresql':
+            raise CommandError('Set DATABASE_URL to a PostgreSQL database to run this benchmark')
+
+        threads, requests = options['threads'], options['requests']
+        self.stdout.write(f'{threads} threads x {requests} requests')
+        for label, pooled in (('no pool', False), ('pooled', True)):
+            alias = self.alias(f'bench_{label.replace(" ", "_")}', pooled)
+            try:
+                rate = self.run(alias, threads, requests)
+            finally:
+                if pooled:
+                    connections[alias].close_pool()
+            self.stdout.write(f'{label:<8} {rate:>10.0f} requests/s')
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,96 @@
+import os
+import shutil
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import imageops, images, storage
+from core.db import stream
+from core.models import ImageAsset, StoredFile
+
+
+class Command(BaseCommand):
+    help = ('Recount references to content-addressed uploads and delete files no row points at '
+            '(with their image variants)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=None,
+                            help='Keep unreferenced files younger than this (default MEDIA_GC_GRACE_HOURS)')
+        parser.add_argument('--dry-run', action='store_true', help='Report without deleting anything')
+
+    def recount(self):
+        counts = storage.reference_counts()
+        changed = []
+        for stored in stream(StoredFile.objects.all()):
+            references = counts.get(stored.name, 0)
+            if stored.refcount != references:
+                stored.refcount = references
+                changed.append(stored)
+        if not self.dry_run:
+            StoredFile.objects.bulk_update(changed, ['refcount'], batch_size=500)
+        self.stdout.write(f'{len(changed)} reference count(s) corrected')
+        return counts
+
+    def remove(self, name):
+        if self.dry_run or default_storage.purge(name):
+            self.stdout.write(f'  {name}')
+            return True
+        return False
+
+    def collect_orphans(self, cutoff, counts):
+        old = StoredFile.objects.filter(created_at__lt=cutoff)
+        if self.dry_run:
+            names = [name for name in old.values_list('name', flat=True) if not counts.get(name)]
+        else:
+            names = list(old.filter(refcount=0).values_list('name', flat=True))
+        self.stdout.write(f'{len(names)} unreferenced file(s)')
+        removed = []
+        for name in names:
+            # an upload may have taken a reference since the recount
+            if self.dry_run or StoredFile.objects.filter(name=name, refcount=0).delete()[0]:
+                if self.remove(name):
+                    removed.append(name)
+        return removed
+
+    def collect_strays(self, cutoff):
+        """Files written without a StoredFile row, e.g. by an upload whose transaction rolled back."""
+        root = os.path.join(settings.MEDIA_ROOT, settings.CONTENT_STORAGE_DIR)
+        strays = []
+        for directory, _, filenames in os.walk(root):
+            names = {
+                os.path.relpath(os.path.join(directory, filename), settings.MEDIA_ROOT).replace(os.sep, '/'): filename
+                for filename in filenames
+            }
+            known = set(StoredFile.objects.filter(name__in=names).values_list('name', flat=True))
+            for name, filename in names.items():
+                if filename.endswith('.gc'):
+                    continue
+                modified = os.path.getmtime(os.path.join(directory, filename))
+                if name not in known and modified < cutoff.timestamp():
+                    strays.append(name)
+        self.stdout.write(f'{len(strays)} untracked file(s)')
+        return [name for name in strays if self.remove(name)]
+
+    def collect_variants(self, names):
+        assets = ImageAsset.objects.filter(name__in=names)
+        hashes = set(assets.exclude(sha256='').values_list('sha256', flat=True))
+        if self.dry_run:
+            return
+        assets.delete()
+        still_used = set(ImageAsset.objects.filter(sha256__in=hashes).values_list('sha256', flat=True))
+        for sha256 in hashes - still_used:
+            shutil.rmtree(imageops.variant_dir(images.variants_root(), sha256), ignore_errors=True)
+        self.stdout.write(f'{len(hashes - still_used)} variant set(s) removed')
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        hours = options['grace_hours']
+        cutoff = timezone.now() - timedelta(hours=settings.MEDIA_GC_GRACE_HOURS if hours is None else hours)
+
+        counts = self.recount()
+        removed = self.collect_orphans(cutoff, counts) + self.collect_strays(cutoff)
+        self.collect_variants(removed)
+        self.stdout.write(self.style.SUCCESS(f'{len(removed)} file(s) {"would be " if self.dry_run else ""}removed'))
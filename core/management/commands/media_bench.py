@@ -0,0 +1,123 @@
+import os
+import shutil
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.views.static import serve as static_serve
+
+from core import media
+
+
+class Command(BaseCommand):
+    help = ('Compare media throughput of django.views.static.serve and core.media.serve '
+            '(full downloads, browser revalidation and range requests)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Concurrent simulated requests')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per thread')
+        parser.add_argument('--size', type=int, default=512, help='File size in KiB')
+        parser.add_argument('--no-sendfile', action='store_true',
+                            help='Stream through Python like runserver instead of a sendfile-capable server')
+
+    def views(self):
+        return {
+            'static.serve': lambda request, path: static_serve(request, path, document_root=settings.MEDIA_ROOT),
+            'core.media': media.serve,
+        }
+
+    def send(self, response, sink, use_sendfile):
+        """Write the body the way a WSGI server would; returns bytes sent."""
+        filelike = getattr(response, 'file_to_stream', None)
+        sent = 0
+        try:
+            if use_sendfile and filelike is not None and hasattr(filelike, 'fileno'):
+                # gunicorn's wsgi.file_wrapper: Content-Length bytes from the current offset
+                fileno = filelike.fileno()
+                offset = os.lseek(fileno, 0, os.SEEK_CUR)
+                remaining = int(response['Content-Length'])
+                while remaining:
+                    count = os.sendfile(sink, fileno, offset + sent, remaining)
+                    if not count:
+                        break
+                    sent += count
+                    remaining -= count
+            elif response.streaming:
+                for chunk in response:
+                    sent += os.write(sink, chunk)
+            else:
+                sent = os.write(sink, response.content) if response.content else 0
+        finally:
+            response.close()
+        return sent
+
+    def validators(self, view, path):
+        response = view(RequestFactory().get(f'/media/{path}'), path)
+        response.close()
+        headers = {}
+        if response.has_header('ETag'):
+            headers['HTTP_IF_NONE_MATCH'] = response['ETag']
+        elif response.has_header('Last-Modified'):
+            headers['HTTP_IF_MODIFIED_SINCE'] = response['Last-Modified']
+        return headers
+
+    def run(self, view, path, headers, threads, requests, use_sendfile):
+        errors = []
+        totals = []
+        factory = RequestFactory()
+
+        def worker():
+            sent = 0
+            statuses = set()
+            sink = os.open(os.devnull, os.O_WRONLY)
+            try:
+                for _ in range(requests):
+                    response = view(factory.get(f'/media/{path}', **headers), path)
+                    statuses.add(response.status_code)
+                    sent += self.send(response, sink, use_sendfile)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                os.close(sink)
+            totals.append((sent, statuses))
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if errors:
+            raise CommandError(f'{len(errors)} worker(s) failed: {errors[0]!r}')
+        sent = sum(total for total, _ in totals)
+        statuses = sorted(set().union(*(statuses for _, statuses in totals)))
+        return threads * requests / elapsed, sent / elapsed / (1 << 20), statuses
+
+    def handle(self, *args, **options):
+        threads, requests = options['threads'], options['requests']
+        use_sendfile = not options['no_sendfile']
+        directory = os.path.join(settings.MEDIA_ROOT, '.media-bench')
+        os.makedirs(directory, exist_ok=True)
+        path = '.media-bench/sample.bin'
+        with open(os.path.join(settings.MEDIA_ROOT, path), 'wb') as fh:
+            fh.write(os.urandom(options['size'] * 1024))
+
+        self.stdout.write(f'{threads} threads x {requests} requests, {options["size"]} KiB file, '
+                          f'{"sendfile" if use_sendfile else "streamed through Python"}')
+        try:
+            for view_name, view in self.views().items():
+                scenarios = {
+                    'full': {},
+                    'revalidate': self.validators(view, path),
+                    'range 64K': {'HTTP_RANGE': 'bytes=0-65535'},
+                }
+                for scenario, headers in scenarios.items():
+                    rate, throughput, statuses = self.run(view, path, headers, threads, requests, use_sendfile)
+                    self.stdout.write(f'{view_name:<13} {scenario:<11} {rate:>9.0f} requests/s '
+                                      f'{throughput:>9.1f} MiB/s  status {"/".join(map(str, statuses))}')
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import storage
+from core.models import ImageAsset, StoredFile
+
+
+class Command(BaseCommand):
+    help = ('Move uploads stored under their upload_to names into the content-addressed layout '
+            '(core.storage) and point the rows at the new names')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='List what would move without changing anything')
+        parser.add_argument('--keep-originals', action='store_true',
+                            help='Leave the old files in place after the rows are updated')
+
+    def legacy_names(self, model, field):
+        prefix = f'{settings.CONTENT_STORAGE_DIR}/'
+        queryset = (model._base_manager.exclude(**{f'{field.name}__startswith': prefix})
+                    .exclude(**{field.name: ''}).exclude(**{f'{field.name}__isnull': True}))
+        default = field.get_default()
+        if default:
+            # the shared placeholder is not an upload
+            queryset = queryset.exclude(**{field.name: default})
+        return list(queryset.order_by().values_list(field.name, flat=True).distinct())
+
+    def move(self, file_storage, old):
+        with file_storage.open(old) as fh:
+            new = file_storage.save(old, fh)
+        # processed variants are keyed by name, their content (and hash) is unchanged
+        if ImageAsset.objects.filter(name=new).exists():
+            ImageAsset.objects.filter(name=old).delete()
+        else:
+            ImageAsset.objects.filter(name=old).update(name=new)
+        return new
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        moved = {}
+        storages = {}
+        missing = set()
+        rows = 0
+        for model, field in storage.content_fields():
+            for old in self.legacy_names(model, field):
+                if old not in moved and old not in missing:
+                    if not field.storage.exists(old):
+                        missing.add(old)
+                        self.stdout.write(self.style.WARNING(f'  missing: {old}'))
+                        continue
+                    moved[old] = old if dry_run else self.move(field.storage, old)
+                    storages[old] = field.storage
+                    self.stdout.write(f'  {old} -> {moved[old]}')
+                if dry_run or old in missing:
+                    continue
+                # through the default queryset class so the change log and updated_at see it
+                rows += storage.unfiltered(model).filter(**{field.name: old}).update(**{field.name: moved[old]})
+
+        if dry_run:
+            self.stdout.write(self.style.SUCCESS(f'{len(moved)} file(s) would move, {len(missing)} missing'))
+            return
+
+        # save() counted one reference per file, set the real numbers
+        counts = storage.reference_counts(list(set(moved.values())))
+        for new, references in counts.items():
+            StoredFile.objects.filter(name=new).update(refcount=references)
+
+        if not options['keep_originals']:
+            for old in moved:
+                storages[old].delete(old)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(moved)} file(s) moved, {rows} row(s) updated, {len(missing)} missing'))
@@ -0,0 +1,44 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.deletion import purge
+from core.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = 'Purge soft-deleted objects and their cascaded rows in bounded batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.DELETION_BATCH_SIZE,
+                            help='Rows deleted per transaction')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep polling for new jobs every N seconds (default: drain the queue and exit)')
+        parser.add_argument('--retry-failed', action='store_true', help='Also pick up jobs that failed before')
+
+    def progress(self, job):
+        self.stdout.write(f'\r  {job.model_label} {job.object_id}: {job.deleted_rows} rows deleted', ending='')
+        self.stdout.flush()
+
+    def pending(self, retry_failed):
+        # 'running' jobs left behind by a killed worker are resumed too
+        statuses = ['pending', 'running'] + (['failed'] if retry_failed else [])
+        return DeletionJob.objects.filter(status__in=statuses).order_by('created_at')
+
+    def handle(self, *args, **options):
+        while True:
+            jobs = list(self.pending(options['retry_failed']))
+            for job in jobs:
+                started = timezone.now()
+                self.stdout.write(f'Purging {job.model_label} {job.object_id} ({job.object_repr})')
+                purge(job, options['batch_size'], self.progress)
+                seconds = (timezone.now() - started).total_seconds()
+                style = self.style.SUCCESS if job.status == 'done' else self.style.ERROR
+                self.stdout.write('')
+                self.stdout.write(style(f'  {job.status}: {job.deleted_rows} rows in {seconds:.1f}s'))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS('Deletion queue drained'))
@@ -0,0 +1,51 @@
+from concurrent.futures import as_completed
+
+from django.core.management.base import BaseCommand
+
+from core import images
+from core.db import stream
+from core.models import ImageAsset
+
+
+class Command(BaseCommand):
+    help = 'Render resized image variants for pending uploads (and existing images with --backfill)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true',
+                            help='Create assets for every image already stored in a registered field')
+        parser.add_argument('--retry-failed', action='store_true', help='Also retry images that failed before')
+
+    def backfill(self):
+        created = 0
+        for model, field_name in images.registered_fields():
+            default = model._meta.get_field(field_name).get_default()
+            names = (model._base_manager.exclude(**{field_name: ''}).exclude(**{field_name: default})
+                     .exclude(**{f'{field_name}__isnull': True}).values_list(field_name, flat=True).distinct())
+            for name in stream(names):
+                created += ImageAsset.objects.get_or_create(name=name)[1]
+        self.stdout.write(f'{created} new image(s) found')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.backfill()
+        # pending rows may still be in a web worker's pool; rendering twice is harmless
+        statuses = ['pending'] + (['failed'] if options['retry_failed'] else [])
+        names = list(ImageAsset.objects.filter(status__in=statuses).values_list('name', flat=True))
+        self.stdout.write(f'Processing {len(names)} image(s)')
+
+        pool = images.get_pool()
+        futures = {pool.submit(images.imageops.render_variants, *images.job_args(name)): name for name in names}
+        failed = 0
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                failed += 1
+                images.finish(name, error=e)
+                self.stdout.write(self.style.ERROR(f'  {name}: {e}'))
+            else:
+                images.finish(name, result)
+                self.stdout.write(f'  {name}: {"rendered" if result["rendered"] else "already rendered"}')
+        style = self.style.ERROR if failed else self.style.SUCCESS
+        self.stdout.write(style(f'{len(names) - failed} processed, {failed} failed'))
@@ -0,0 +1,66 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import changelog
+
+
+class Command(BaseCommand):
+    help = 'Print change log entries as JSON lines, from a consumer checkpoint or a sequence number'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consumer', help='Read from (and with --commit, advance) this checkpoint')
+        parser.add_argument('--after', type=int, help='Start after this sequence number instead of a checkpoint')
+        parser.add_argument('--model', action='append', dest='models', help="Only this model label, e.g. events.Event")
+        parser.add_argument('--limit', type=int, default=1000, help='Entries per batch')
+        parser.add_argument('--commit', action='store_true', help='Advance the consumer checkpoint after printing')
+        parser.add_argument('--follow', type=float, metavar='SECONDS',
+                            help='Keep polling every SECONDS (implies reading until interrupted)')
+        parser.add_argument('--reset', type=int, metavar='SEQ', help='Move the consumer checkpoint to SEQ and exit')
+
+    def emit(self, entries):
+        for entry in entries:
+            self.stdout.write(json.dumps({
+                'seq': entry.seq,
+                'model': entry.model,
+                'object_id': entry.object_id,
+                'action': entry.action,
+                'fields': entry.fields,
+                'request_id': entry.request_id or None,
+                'created_at': entry.created_at.isoformat(),
+            }))
+
+    def handle(self, *args, **options):
+        if (options['commit'] or options['reset'] is not None) and not options['consumer']:
+            raise CommandError('--commit and --reset need --consumer')
+
+        if options['consumer']:
+            consumer = changelog.Consumer(options['consumer'], options['models'])
+            if options['reset'] is not None:
+                consumer.reset(options['reset'])
+                self.stderr.write(self.style.SUCCESS(f'{consumer.name} reset to {options["reset"]}'))
+                return
+            if options['after'] is not None:
+                consumer.commit(options['after'])
+            while True:
+                entries = consumer.poll(options['limit'])
+                self.emit(entries)
+                if options['commit']:
+                    consumer.commit()
+                if len(entries) < options['limit']:
+                    if not options['follow']:
+                        break
+                    time.sleep(options['follow'])
+            return
+
+        position = options['after'] or 0
+        while True:
+            entries = changelog.read(position, options['limit'], options['models'])
+            self.emit(entries)
+            if entries:
+                position = entries[-1].seq
+            if len(entries) < options['limit']:
+                if not options['follow']:
+                    break
+                time.sleep(options['follow'])
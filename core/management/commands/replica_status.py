@@ -0,0 +1,62 @@
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import Client
+from django.urls import reverse
+
+from events.models import RSVP, Event, Participant
+
+LAG_MODELS = (Event, RSVP, Participant)
+
+
+class Command(BaseCommand):
+    help = 'Report row lag per replica and check which database serves anonymous and pinned reads'
+
+    def lag(self):
+        for model in LAG_MODELS:
+            primary = model.objects.using(DEFAULT_DB_ALIAS).count()
+            for alias in settings.DATABASE_REPLICAS:
+                try:
+                    replica = model.objects.using(alias).count()
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f'{alias:<10} {model.__name__:<12} unavailable: {e}'))
+                    continue
+                behind = primary - replica
+                style = self.style.SUCCESS if behind == 0 else self.style.WARNING
+                self.stdout.write(style(f'{alias:<10} {model.__name__:<12} primary {primary} replica {replica} '
+                                        f'({behind:+d} rows behind)'))
+
+    def served_by(self, client, path):
+        """Aliases that ran at least one query while rendering path."""
+        used = set()
+
+        def make_wrapper(alias):
+            def wrapper(execute, sql, params, many, context):
+                used.add(alias)
+                return execute(sql, params, many, context)
+            return wrapper
+
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(make_wrapper(alias)))
+            response = client.get(path)
+        return response.status_code, sorted(used)
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas configured, set SQLITE_REPLICAS or REPLICA_DATABASE_URLS')
+
+        self.lag()
+
+        path = reverse('events')
+        client = Client()
+        status, used = self.served_by(client, path)
+        self.stdout.write(f'anonymous GET {path} [{status}] -> {", ".join(used)}')
+
+        client.cookies[settings.REPLICA_STICKY_COOKIE] = '1'
+        status, used = self.served_by(client, path)
+        self.stdout.write(f'pinned    GET {path} [{status}] -> {", ".join(used)}')
+        if used != [DEFAULT_DB_ALIAS]:
+            raise CommandError('Pinned request read from a replica')
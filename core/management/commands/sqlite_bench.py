@@ -0,0 +1,98 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+PROFILES = {
+    'default': {'pragmas': [], 'begin': 'BEGIN'},
+    'production': {'pragmas': None, 'begin': 'BEGIN IMMEDIATE'},
+}
+
+
+def _connect(path, pragmas):
+    conn = sqlite3.connect(path, timeout=5, isolation_level=None)
+    for pragma in pragmas:
+        conn.execute(pragma)
+    return conn
+
+
+def _worker(path, pragmas, begin, seconds, write_ratio, seed, results):
+    rng = random.Random(seed)
+    conn = _connect(path, pragmas)
+    reads = writes = errors = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        event_id = rng.randint(1, 1000)
+        try:
+            if rng.random() < write_ratio:
+                conn.execute(begin)
+                conn.execute('SELECT COUNT(*) FROM rsvp WHERE event_id = ?', (event_id,)).fetchone()
+                conn.execute('INSERT INTO rsvp (event_id, status) VALUES (?, ?)', (event_id, 'confirmed'))
+                conn.execute('COMMIT')
+                writes += 1
+            else:
+                conn.execute(
+                    'SELECT status, COUNT(*) FROM rsvp WHERE event_id = ? GROUP BY status', (event_id,)
+                ).fetchall()
+                reads += 1
+        except sqlite3.OperationalError:
+            errors += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+    conn.close()
+    results.put((reads, writes, errors))
+
+
+class Command(BaseCommand):
+    help = 'Benchmark concurrent SQLite reads/writes with the default and production connection profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Number of worker processes')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+        parser.add_argument('--write-ratio', type=float, default=0.2, help='Fraction of operations that write')
+        parser.add_argument('--profile', choices=sorted(PROFILES), action='append',
+                            help='Profile to run (repeatable, default: all)')
+
+    def run(self, profile, options):
+        pragmas = PROFILES[profile]['pragmas']
+        if pragmas is None:
+            pragmas = settings.SQLITE_PRAGMAS
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.sqlite3')
+            conn = _connect(path, pragmas)
+            conn.execute('CREATE TABLE rsvp (id INTEGER PRIMARY KEY, event_id INTEGER NOT NULL, status TEXT NOT NULL)')
+            conn.execute('CREATE INDEX rsvp_event_idx ON rsvp (event_id, status)')
+            conn.close()
+
+            results = multiprocessing.Queue()
+            processes = [
+                multiprocessing.Process(target=_worker, args=(
+                    path, pragmas, PROFILES[profile]['begin'], options['seconds'],
+                    options['write_ratio'], seed, results,
+                ))
+                for seed in range(options['workers'])
+            ]
+            started = time.monotonic()
+            for process in processes:
+                process.start()
+            totals = [sum(values) for values in zip(*(results.get() for _ in processes))]
+            for process in processes:
+                process.join()
+            elapsed = time.monotonic() - started
+        return totals, elapsed
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{options["workers"]} workers, {options["seconds"]}s per run, '
+                          f'write ratio {options["write_ratio"]}')
+        for profile in options['profile'] or ['default', 'production']:
+            (reads, writes, errors), elapsed = self.run(profile, options)
+            self.stdout.write(
+                f'{profile:<11} {reads / elapsed:>10.0f} reads/s {writes / elapsed:>8.0f} writes/s '
+                f'{errors:>6} lock errors'
+            )
+        self.stdout.write(self.style.SUCCESS('Done'))
@@ -0,0 +1,52 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = ('Copy the primary SQLite database into the local SQLITE_REPLICAS files. '
+            'With --interval it keeps copying, which simulates replication lag of that many seconds.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Repeat every N seconds until interrupted (default: copy once)')
+
+    def replicas(self):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        if primary['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('sync_replica only handles SQLite; use database replication for PostgreSQL')
+        replicas = [
+            settings.DATABASES[alias]['NAME'] for alias in settings.DATABASE_REPLICAS
+            if settings.DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3'
+        ]
+        if not replicas:
+            raise CommandError('No SQLite replicas configured, set SQLITE_REPLICAS')
+        return primary['NAME'], replicas
+
+    def sync(self, primary, replicas):
+        source = sqlite3.connect(primary, timeout=5)
+        try:
+            for name in replicas:
+                target = sqlite3.connect(name, timeout=5)
+                try:
+                    source.backup(target)
+                    target.execute('PRAGMA journal_mode=WAL')
+                finally:
+                    target.close()
+        finally:
+            source.close()
+
+    def handle(self, *args, **options):
+        primary, replicas = self.replicas()
+        while True:
+            started = time.perf_counter()
+            self.sync(primary, replicas)
+            self.stdout.write(self.style.SUCCESS(
+                f'Copied {primary} to {len(replicas)} replica(s) in {time.perf_counter() - started:.2f}s'
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
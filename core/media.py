@@ -0,0 +1,191 @@
+"""
+Serving of MEDIA_ROOT, replacing django.views.static.serve.
+
+With MEDIA_ACCEL set, the view only resolves the path and answers
+conditional requests, then hands the transfer to the front proxy:
+
+    nginx   X-Accel-Redirect: MEDIA_ACCEL_PREFIX + path, with
+                location /protected-media/ { internal; alias /srv/app/media/; }
+    apache  X-Sendfile: absolute path (mod_xsendfile)
+
+Without a proxy the file goes out as a FileResponse, which WSGI servers
+with wsgi.file_wrapper (gunicorn) send with sendfile(). Either way responses
+carry an ETag and Last-Modified, answer If-None-Match/If-Modified-Since with
+304 and single byte ranges with 206. Files under CONTENT_STORAGE_DIR and
+IMAGE_VARIANTS_DIR have the content hash in their path and are cached as
+immutable for a year; other uploads for MEDIA_CACHE_SECONDS.
+"""
+import mimetypes
+import os
+import posixpath
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+
+from . import metrics
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+MEDIA_RESPONSES = metrics.Counter('media_responses', 'Media responses by how they were served.')
+
+
+def resolve(path):
+    """Absolute path and stat of a media file, or Http404."""
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(fullpath)
+    except (SuspiciousFileOperation, ValueError, OSError):
+        raise Http404('File not found')
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404('File not found')
+    return path, fullpath, st
+
+
+def make_etag(st):
+    return quote_etag(f'{st.st_size:x}-{st.st_mtime_ns:x}')
+
+
+def cache_control(path):
+    if path.startswith((f'{settings.CONTENT_STORAGE_DIR}/', f'{settings.IMAGE_VARIANTS_DIR}/')):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={settings.MEDIA_CACHE_SECONDS}'
+
+
+def parse_range(header, size):
+    """
+    (start, end) inclusive for a single 'bytes=' range, None to send the
+    whole file, or False when the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        # multipart/byteranges is not worth it here, send everything
+        return None
+    first, sep, last = spec.strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        else:
+            # suffix range: the last N bytes
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return False
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _range_applies(request, etag, mtime):
+    """If-Range: only honour the range while the client's copy is current."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return parse_etags(if_range) == [etag]
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+class RangeFile:
+    """
+    Reads at most length bytes from an already positioned file. Keeps
+    fileno() so sendfile-capable servers can still use it; gunicorn sends
+    Content-Length bytes from the current offset.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def _accel(response, path, fullpath):
+    backend = settings.MEDIA_ACCEL
+    if backend == 'nginx':
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX.rstrip('/') + '/' + quote(path)
+    elif backend == 'apache':
+        response['X-Sendfile'] = fullpath
+    else:
+        raise ValueError(f'Unknown MEDIA_ACCEL backend: {backend}')
+    return response
+
+
+def serve(request, path):
+    path, fullpath, st = resolve(path)
+    etag = make_etag(st)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(st.st_mtime),
+        'Cache-Control': cache_control(path),
+        'Accept-Ranges': 'bytes',
+    }
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(st.st_mtime))
+    if response is not None:
+        MEDIA_RESPONSES.inc(result=str(response.status_code))
+        for header, value in headers.items():
+            response[header] = value
+        return response
+
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+
+    if settings.MEDIA_ACCEL:
+        # the proxy does ranges and the transfer itself
+        MEDIA_RESPONSES.inc(result='accel')
+        response = HttpResponse(content_type=content_type, headers=headers)
+        return _accel(response, path, fullpath)
+
+    size = st.st_size
+    byte_range = None
+    if request.headers.get('Range') and _range_applies(request, etag, st.st_mtime):
+        byte_range = parse_range(request.headers['Range'], size)
+    if byte_range is False:
+        MEDIA_RESPONSES.inc(result='416')
+        response = HttpResponse(status=416, headers=headers)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if request.method == 'HEAD':
+        MEDIA_RESPONSES.inc(result='head')
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['Content-Length'] = size
+        return response
+
+    file = open(fullpath, 'rb')
+    if byte_range is None:
+        MEDIA_RESPONSES.inc(result='200')
+        response = FileResponse(file, content_type=content_type, headers=headers)
+        response['Content-Length'] = size
+        return response
+
+    start, end = byte_range
+    length = end - start + 1
+    file.seek(start)
+    MEDIA_RESPONSES.inc(result='206')
+    response = FileResponse(RangeFile(file, length), status=206, content_type=content_type, headers=headers)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Content-Length'] = length
+    return response
@@ -0,0 +1,228 @@
+"""
+Process-local metric buffers aggregated across workers through a shared
+SQLite file. Counters and histogram buckets are additive, so each worker
+flushes its deltas into the same rows and any worker can render the totals
+in Prometheus text format.
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = {}
+_pending = defaultdict(float)
+_lock = threading.Lock()
+_last_flush = time.monotonic()
+
+
+def _key(name, labels):
+    return name, json.dumps(sorted(labels.items()))
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        REGISTRY[name] = self
+
+    def sample_names(self):
+        return (self.name,)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def sample_names(self):
+        return (self.name + '_total',)
+
+    def inc(self, amount=1, **labels):
+        if not settings.METRICS_ENABLED:
+            return
+        with _lock:
+            _pending[_key(self.name + '_total', labels)] += amount
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+
+    def sample_names(self):
+        return (self.name + '_bucket', self.name + '_sum', self.name + '_count')
+
+    def observe(self, value, **labels):
+        if not settings.METRICS_ENABLED:
+            return
+        with _lock:
+            for bound in self.buckets:
+                _pending[_key(self.name + '_bucket', {**labels, 'le': repr(bound)})] += value <= bound
+            _pending[_key(self.name + '_bucket', {**labels, 'le': '+Inf'})] += 1
+            _pending[_key(self.name + '_sum', labels)] += value
+            _pending[_key(self.name + '_count', labels)] += 1
+
+
+class Gauge(Metric):
+    """Computed at scrape time; callback returns a number or {labels-tuple: value}."""
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, callback):
+        super().__init__(name, documentation)
+        self.callback = callback
+
+    def collect(self):
+        try:
+            value = self.callback()
+        except Exception:
+            logger.exception('Gauge %s failed', self.name)
+            return []
+        if isinstance(value, dict):
+            return [(json.dumps(sorted(dict(labels).items())), v) for labels, v in value.items()]
+        return [(json.dumps([]), value)]
+
+
+class SQLiteStore:
+    """Shared sample table; one connection per process."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._conn = None
+        self._pid = None
+
+    def connection(self):
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS samples ('
+                'name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, '
+                'PRIMARY KEY (name, labels))'
+            )
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def add(self, deltas):
+        conn = self.connection()
+        with conn:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.executemany(
+                'INSERT INTO samples (name, labels, value) VALUES (?, ?, ?) '
+                'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                [(name, labels, value) for (name, labels), value in deltas.items()],
+            )
+
+    def read(self):
+        return self.connection().execute('SELECT name, labels, value FROM samples').fetchall()
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = SQLiteStore(settings.METRICS_DB)
+    return _store
+
+
+def flush():
+    """Write buffered deltas to the shared store."""
+    global _last_flush
+    with _lock:
+        if not _pending:
+            _last_flush = time.monotonic()
+            return
+        deltas = dict(_pending)
+        _pending.clear()
+        _last_flush = time.monotonic()
+    try:
+        get_store().add(deltas)
+    except sqlite3.Error:
+        logger.exception('Could not flush metrics')
+        with _lock:
+            for key, value in deltas.items():
+                _pending[key] += value
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+atexit.register(flush)
+
+
+def _format_labels(labels_json):
+    labels = json.loads(labels_json)
+    if not labels:
+        return ''
+    parts = []
+    for name, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        parts.append(f'{name}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _sort_key(row):
+    name, labels_json, _ = row
+    labels = json.loads(labels_json)
+    le = [float(v) for k, v in labels if k == 'le']
+    rest = [(k, v) for k, v in labels if k != 'le']
+    return name, rest, le
+
+
+def render():
+    """Prometheus text exposition of all workers' samples."""
+    flush()
+    samples = defaultdict(list)
+    for row in sorted(get_store().read(), key=_sort_key):
+        samples[row[0]].append(row)
+
+    lines = []
+    for metric in REGISTRY.values():
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        if isinstance(metric, Gauge):
+            for labels_json, value in metric.collect():
+                lines.append(f'{metric.name}{_format_labels(labels_json)} {_format_value(value)}')
+            continue
+        for sample_name in metric.sample_names():
+            for name, labels_json, value in samples.get(sample_name, []):
+                lines.append(f'{name}{_format_labels(labels_json)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# request metrics
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Request latency by URL name.')
+RESPONSES = Counter('http_responses', 'Responses by URL name and status code.')
+DB_TIME = Counter('db_query_seconds', 'Time spent in database queries by URL name.')
+DB_QUERIES = Counter('db_queries', 'Database queries executed by URL name.')
+
+# cache metrics, hit ratio = hits / (hits + misses)
+CACHE_REQUESTS = Counter('cache_requests', 'Cache lookups by cache name and result (hit/miss).')
+
+# business metrics
+RSVP_TRANSITIONS = Counter('rsvp_transitions', 'New RSVPs and RSVP status changes, by new status.')
+
+
+def record_cache(cache_name, hit, count=1):
+    if count:
+        CACHE_REQUESTS.inc(count, cache=cache_name, result='hit' if hit else 'miss')
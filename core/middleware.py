@@ -0,0 +1,260 @@
+import logging
+import random
+import re
+import time
+import uuid
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from . import invalidation, log, metrics, profiling, routers
+from .db import async_execute_wrapper
+from .nplusone import NPlusOneError, QueryTracker
+
+nplusone_logger = logging.getLogger('core.nplusone')
+
+_REQUEST_ID = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class HybridMiddleware:
+    """
+    Base for middleware that runs natively in both stacks: handle() under
+    WSGI and ahandle() under ASGI, picked by whether the rest of the chain is
+    async. Without it Django would wrap the middleware (and everything below
+    it) in a thread hop on every ASGI request.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.ahandle(request)
+        return self.handle(request)
+
+    def handle(self, request):
+        raise NotImplementedError
+
+    async def ahandle(self, request):
+        raise NotImplementedError
+
+
+class AsyncWhiteNoiseMiddleware(HybridMiddleware, WhiteNoiseMiddleware):
+    """WhiteNoiseMiddleware (sync only in 6.x) that keeps an ASGI stack async for non-static requests."""
+
+    def __init__(self, get_response):
+        WhiteNoiseMiddleware.__init__(self, get_response)
+        HybridMiddleware.__init__(self, get_response)
+
+    def find(self, request):
+        if self.autorefresh:
+            return self.find_file(request.path_info)
+        return self.files.get(request.path_info)
+
+    def handle(self, request):
+        return WhiteNoiseMiddleware.__call__(self, request)
+
+    async def ahandle(self, request):
+        static_file = self.find(request)
+        if static_file is not None:
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
+
+
+class RequestIDMiddleware(HybridMiddleware):
+    """Tags the request and its log records with X-Request-ID (generated if missing)."""
+
+    def start(self, request):
+        request_id = request.headers.get('X-Request-ID', '')
+        if not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        request.request_id = request_id
+        return request_id, log.request_id.set(request_id)
+
+    def handle(self, request):
+        request_id, token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            log.request_id.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
+
+    async def ahandle(self, request):
+        request_id, token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            log.request_id.reset(token)
+        response['X-Request-ID'] = request_id
+        return response
+
+
+class ReplicaRoutingMiddleware(HybridMiddleware):
+    """
+    Lets GET/HEAD requests read from DATABASE_REPLICAS in views that opt in
+    (core.routers.ReplicaReadsMixin) by setting request.replica_reads. Once a
+    request writes to the primary, the client gets a cookie that keeps its
+    reads on the primary for REPLICA_STICKY_SECONDS so it sees its own change
+    despite replication lag.
+    """
+
+    def reads_from_replica(self, request):
+        pinned = settings.REPLICA_STICKY_COOKIE in request.COOKIES
+        return request.method in ('GET', 'HEAD') and not pinned
+
+    def finish(self, response, detector):
+        if detector.wrote:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax',
+            )
+        return response
+
+    def handle(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        request.replica_reads = self.reads_from_replica(request)
+        detector = routers.WriteDetector(ignored_tables=['django_session'])
+        with connections[DEFAULT_DB_ALIAS].execute_wrapper(detector):
+            response = self.get_response(request)
+        return self.finish(response, detector)
+
+    async def ahandle(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return await self.get_response(request)
+
+        request.replica_reads = self.reads_from_replica(request)
+        detector = routers.WriteDetector(ignored_tables=['django_session'])
+        async with async_execute_wrapper(detector, [DEFAULT_DB_ALIAS]):
+            response = await self.get_response(request)
+        return self.finish(response, detector)
+
+
+class InvalidationMiddleware(HybridMiddleware):
+    """Drops per-process caches that another worker invalidated before the view runs."""
+
+    def handle(self, request):
+        invalidation.check()
+        return self.get_response(request)
+
+    async def ahandle(self, request):
+        # a read of the shared memory map, no I/O
+        invalidation.check()
+        return await self.get_response(request)
+
+
+class NPlusOneMiddleware(HybridMiddleware):
+    """
+    Flags repeated queries per request.
+    NPLUSONE_MODE: 'strict' raises (tests), 'log' samples NPLUSONE_SAMPLE_RATE
+    of requests and logs a warning (production), 'off' disables tracking.
+    """
+
+    def sampled(self):
+        mode = settings.NPLUSONE_MODE
+        return mode == 'strict' or (mode == 'log' and random.random() < settings.NPLUSONE_SAMPLE_RATE)
+
+    def report(self, request, tracker):
+        if tracker.offenders():
+            label = f'{request.method} {request.path}'
+            if settings.NPLUSONE_MODE == 'strict':
+                raise NPlusOneError(tracker.report(label))
+            nplusone_logger.warning(tracker.report(label))
+
+    def handle(self, request):
+        if not self.sampled():
+            return self.get_response(request)
+
+        tracker = QueryTracker(settings.NPLUSONE_THRESHOLD)
+        with tracker.track():
+            response = self.get_response(request)
+        self.report(request, tracker)
+        return response
+
+    async def ahandle(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        tracker = QueryTracker(settings.NPLUSONE_THRESHOLD)
+        async with async_execute_wrapper(tracker):
+            response = await self.get_response(request)
+        self.report(request, tracker)
+        return response
+
+
+class _DBTimer:
+    """Execute wrapper summing query time and count."""
+
+    def __init__(self):
+        self.elapsed = 0.0
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - start
+            self.queries += 1
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Records latency, status codes and DB time per URL name."""
+
+    def handle(self, request):
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+
+        timer = _DBTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(timer))
+            response = self.get_response(request)
+        self.record(request, response, timer, time.perf_counter() - start)
+        return response
+
+    async def ahandle(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+
+        timer = _DBTimer()
+        start = time.perf_counter()
+        async with async_execute_wrapper(timer):
+            response = await self.get_response(request)
+        self.record(request, response, timer, time.perf_counter() - start)
+        return response
+
+    def record(self, request, response, timer, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else '<unresolved>'
+        metrics.REQUEST_LATENCY.observe(elapsed, view=view, method=request.method)
+        metrics.RESPONSES.inc(view=view, status=str(response.status_code))
+        metrics.DB_TIME.inc(timer.elapsed, view=view)
+        metrics.DB_QUERIES.inc(timer.queries, view=view)
+        metrics.maybe_flush()
+
+
+class ProfilingMiddleware(HybridMiddleware):
+    """Profiles requests flagged by an Admin or picked by PROFILE_SAMPLE_RATE."""
+
+    def handle(self, request):
+        if settings.PROFILE_ENABLED and profiling.should_profile(request):
+            return profiling.profile_request(self.get_response, request)
+        return self.get_response(request)
+
+    async def ahandle(self, request):
+        # should_profile() may load the user
+        if settings.PROFILE_ENABLED and await sync_to_async(profiling.should_profile)(request):
+            return await profiling.aprofile_request(self.get_response, request)
+        return await self.get_response(request)
@@ -1,3 +1,200 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, router, transaction
+from django.utils import timezone
 
-# Create your models here.
+from . import invalidation
+from .log import request_id
+
+
+class ChangeLogEntry(models.Model):
+    """
+    Append-only change feed. seq is the consumer checkpoint; rows are written
+    in the same transaction as the change they describe.
+    """
+    ACTION_CHOICES = [
+        ('create', 'Create'),
+        ('update', 'Update'),
+        ('delete', 'Delete'),
+    ]
+
+    seq = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=100)
+    object_id = models.CharField(max_length=64)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    fields = models.JSONField(null=True, blank=True)
+    request_id = models.CharField(max_length=64, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['seq']
+        indexes = [
+            models.Index(fields=['model', 'object_id', 'seq'], name='changelog_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.action} {self.model} {self.object_id}"
+
+    @classmethod
+    def record(cls, model, object_ids, action, fields=None, using=None):
+        if not object_ids:
+            return
+        label = model._meta.label
+        fields = sorted(fields) if fields else None
+        rid = request_id.get() or ''
+        using = using or router.db_for_write(cls)
+        cls.objects.using(using).bulk_create([
+            cls(model=label, object_id=str(pk), action=action, fields=fields, request_id=rid)
+            for pk in object_ids
+        ], batch_size=500)
+        invalidation.changed(label, object_ids, action, using)
+
+
+class ChangeLogCheckpoint(models.Model):
+    consumer = models.CharField(max_length=100, unique=True)
+    position = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.consumer} @ {self.position}"
+
+
+class ChangeLogQuerySet(models.QuerySet):
+    """Records bulk writes in the change log; single deletes are caught by signals."""
+
+    def _write_db(self):
+        return self._db or router.db_for_write(self.model)
+
+    def _auto_now_fields(self):
+        return [field.name for field in self.model._meta.concrete_fields if getattr(field, 'auto_now', False)]
+
+    def update(self, **kwargs):
+        # like save(), keep auto_now columns (updated_at) current
+        for name in self._auto_now_fields():
+            kwargs.setdefault(name, timezone.now())
+        using = self._write_db()
+        with transaction.atomic(using=using, savepoint=False):
+            ids = list(self.using(using).values_list('pk', flat=True).order_by())
+            rows = super().update(**kwargs)
+            ChangeLogEntry.record(self.model, ids, 'update', kwargs, using)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        using = self._write_db()
+        with transaction.atomic(using=using, savepoint=False):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            ChangeLogEntry.record(self.model, [obj.pk for obj in objs if obj.pk is not None], 'create', None, using)
+        return objs
+
+    bulk_create.alters_data = True
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        objs = list(objs)
+        fields = list(fields)
+        for name in self._auto_now_fields():
+            if name not in fields:
+                now = timezone.now()
+                for obj in objs:
+                    setattr(obj, name, now)
+                fields.append(name)
+        using = self._write_db()
+        with transaction.atomic(using=using, savepoint=False):
+            rows = super().bulk_update(objs, fields, *args, **kwargs)
+            ChangeLogEntry.record(self.model, [obj.pk for obj in objs], 'update', fields, using)
+        return rows
+
+    bulk_update.alters_data = True
+
+
+class ChangeLogManager(models.Manager.from_queryset(ChangeLogQuerySet)):
+    pass
+
+
+class ChangeLoggedModel(models.Model):
+    """Base for models whose writes go to the change log (see core.changelog)."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+            ChangeLogEntry.record(type(self), [self.pk], 'create' if adding else 'update',
+                                  kwargs.get('update_fields'), using)
+
+
+class LiveManager(ChangeLogManager):
+    """Default manager for soft-deletable models: hides rows marked deleted_at."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class DeletionJob(models.Model):
+    """One soft-deleted object whose rows and dependents are purged by process_deletions."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    model_label = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    object_repr = models.CharField(max_length=200, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    deleted_rows = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    requested_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True,
+                                     related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.model_label} {self.object_id} ({self.status})"
+
+
+class ImageAsset(models.Model):
+    """An uploaded image (by storage name) and the state of its resized variants (core.images)."""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+
+class StoredFile(models.Model):
+    """A content-addressed upload (core.storage) and how many model fields reference it."""
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64, db_index=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} refs)"
@@ -0,0 +1,107 @@
+import logging
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_SPACE = re.compile(r"\s+")
+
+_THIS_FILE = os.path.abspath(__file__)
+
+
+class NPlusOneError(Exception):
+    """Raised in strict mode when a query repeats past the threshold."""
+
+
+def fingerprint(sql):
+    """Normalize SQL so the same statement with different parameters matches."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def _is_project_file(filename):
+    filename = os.path.abspath(filename)
+    if filename == _THIS_FILE or 'site-packages' in filename:
+        return False
+    return filename.startswith(str(settings.BASE_DIR))
+
+
+def call_site():
+    """Return 'template:line' or 'file:line' of the innermost project frame."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            token = getattr(node, 'token', None)
+            origin = getattr(node, 'origin', None)
+            if token is not None and origin is not None:
+                return f'{origin.template_name or origin.name}:{token.lineno}'
+        elif _is_project_file(code.co_filename):
+            path = os.path.relpath(code.co_filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno}'
+        frame = frame.f_back
+    return '<unknown>'
+
+
+class QueryTracker:
+    """Database execute wrapper counting statements per fingerprint and call site."""
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.counts = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        self.counts[(fingerprint(sql), call_site())] += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def track(self):
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+    def offenders(self):
+        """List of (fingerprint, call site, count) repeated more than threshold times."""
+        return [
+            (sql, site, count)
+            for (sql, site), count in self.counts.most_common()
+            if count > self.threshold
+        ]
+
+    def report(self, label=''):
+        lines = [f'N+1 queries detected{" in " + label if label else ""}:']
+        for sql, site, count in self.offenders():
+            lines.append(f'  {count}x at {site}: {sql[:300]}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def detect_n_plus_one(threshold=None, strict=True):
+    """
+    Track queries in a block and raise NPlusOneError (or log) on repeats.
+    Usage in tests: with detect_n_plus_one(): self.client.get(url)
+    """
+    if threshold is None:
+        threshold = settings.NPLUSONE_THRESHOLD
+    tracker = QueryTracker(threshold)
+    with tracker.track():
+        yield tracker
+    if tracker.offenders():
+        if strict:
+            raise NPlusOneError(tracker.report())
+        logger.warning(tracker.report())
+
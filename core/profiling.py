@@ -0,0 +1,232 @@
+"""
+On-demand request profiling. A capture writes three files sharing one stem:
+  <stem>.prof              cProfile stats (load with pstats / snakeviz)
+  <stem>.speedscope.json   wall-clock stack samples (open in speedscope.app)
+  <stem>.tracemalloc       allocation snapshot (tracemalloc.Snapshot.load)
+"""
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core import signing
+
+logger = logging.getLogger(__name__)
+
+TOKEN_HEADER = 'X-Profile-Token'
+CAPTURE_HEADER = 'X-Profile-Capture'
+QUERY_FLAG = '_profile'
+SUFFIXES = ('.prof', '.speedscope.json', '.tracemalloc')
+
+_SALT = 'core.profiling'
+_UNSAFE = re.compile(r'[^A-Za-z0-9_-]+')
+
+# tracemalloc and the sampler are process-wide, so only one capture runs at a time
+_capture_lock = threading.Lock()
+
+
+def make_token():
+    """Signed token an Admin can send in the X-Profile-Token header."""
+    return signing.dumps('profile', salt=_SALT)
+
+
+def _valid_token(token):
+    try:
+        return signing.loads(token, salt=_SALT, max_age=settings.PROFILE_TOKEN_MAX_AGE) == 'profile'
+    except signing.BadSignature:
+        return False
+
+
+def should_profile(request):
+    """Signed header, ?_profile=1 from an Admin, or random sampling."""
+    token = request.headers.get(TOKEN_HEADER)
+    if token:
+        return _valid_token(token)
+    if QUERY_FLAG in request.GET:
+        user = request.user
+        return user.is_authenticated and user.groups.filter(name='Admin').exists()
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+class StackSampler(threading.Thread):
+    """Samples one thread's stack at a fixed interval for the speedscope profile."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.frames = []
+        self.frame_index = {}
+        self.samples = []
+        self.weights = []
+        self._stop_event = threading.Event()
+
+    def _frame_id(self, code):
+        key = (code.co_name, code.co_filename, code.co_firstlineno)
+        if key not in self.frame_index:
+            self.frame_index[key] = len(self.frames)
+            self.frames.append({'name': code.co_name, 'file': code.co_filename, 'line': code.co_firstlineno})
+        return self.frame_index[key]
+
+    def run(self):
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                stack = []
+                while frame is not None:
+                    stack.append(self._frame_id(frame.f_code))
+                    frame = frame.f_back
+                stack.reverse()
+                self.samples.append(stack)
+                self.weights.append(now - last)
+            last = now
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def speedscope(self, name):
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'shared': {'frames': self.frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': name,
+                'unit': 'seconds',
+                'startValue': 0,
+                'endValue': sum(self.weights),
+                'samples': self.samples,
+                'weights': self.weights,
+            }],
+            'name': name,
+            'exporter': 'event_management',
+        }
+
+
+class Capture:
+    """Context manager profiling the current thread; call save(label) afterwards."""
+
+    def __init__(self):
+        self.profiler = cProfile.Profile()
+        self.sampler = StackSampler(threading.get_ident(), settings.PROFILE_SAMPLE_INTERVAL)
+        self.snapshot = None
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(settings.PROFILE_TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        self.sampler.start()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.disable()
+        self.sampler.stop()
+        self.snapshot = tracemalloc.take_snapshot()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+
+    def save(self, label):
+        directory = settings.PROFILE_DIR
+        os.makedirs(directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')
+        stem = f'{stamp}-{os.getpid()}-{_UNSAFE.sub("_", label)[:80]}'
+        base = os.path.join(directory, stem)
+
+        self.profiler.dump_stats(base + '.prof')
+        with open(base + '.speedscope.json', 'w') as fh:
+            json.dump(self.sampler.speedscope(label), fh)
+        self.snapshot.dump(base + '.tracemalloc')
+        enforce_retention()
+        return stem
+
+
+def _save(capture, request, response):
+    match = getattr(request, 'resolver_match', None)
+    label = f'{request.method}-{match.url_name if match else request.path}'
+    try:
+        response[CAPTURE_HEADER] = capture.save(label)
+    except OSError:
+        logger.exception('Could not write profile for %s', label)
+    return response
+
+
+def profile_request(get_response, request):
+    """Run get_response under a capture unless another capture is in progress."""
+    if not _capture_lock.acquire(blocking=False):
+        return get_response(request)
+    try:
+        with Capture() as capture:
+            response = get_response(request)
+        return _save(capture, request, response)
+    finally:
+        _capture_lock.release()
+
+
+async def aprofile_request(get_response, request):
+    """
+    profile_request() for the async stack. Only the event loop thread is
+    captured, so queries run through the async ORM show up as waits, and
+    other requests' coroutines on the same loop can appear in the profile.
+    """
+    if not _capture_lock.acquire(blocking=False):
+        return await get_response(request)
+    try:
+        with Capture() as capture:
+            response = await get_response(request)
+        return _save(capture, request, response)
+    finally:
+        _capture_lock.release()
+
+
+def list_captures():
+    """Newest first: [{'stem', 'created', 'size', 'files'}]."""
+    directory = settings.PROFILE_DIR
+    if not os.path.isdir(directory):
+        return []
+    captures = {}
+    for entry in os.scandir(directory):
+        for suffix in SUFFIXES:
+            if entry.name.endswith(suffix):
+                stem = entry.name[:-len(suffix)]
+                stat = entry.stat()
+                capture = captures.setdefault(stem, {'stem': stem, 'created': stat.st_mtime, 'size': 0, 'files': []})
+                capture['size'] += stat.st_size
+                capture['files'].append(entry.name)
+                break
+    for capture in captures.values():
+        capture['created'] = datetime.fromtimestamp(capture['created'], timezone.utc)
+        capture['files'].sort()
+    return sorted(captures.values(), key=lambda c: c['stem'], reverse=True)
+
+
+def capture_path(filename):
+    """Absolute path of a capture file, or None if the name is not one of ours."""
+    if os.path.basename(filename) != filename or not filename.endswith(SUFFIXES):
+        return None
+    path = os.path.join(settings.PROFILE_DIR, filename)
+    return path if os.path.isfile(path) else None
+
+
+def enforce_retention():
+    """Keep at most PROFILE_MAX_CAPTURES captures, none older than PROFILE_MAX_AGE_DAYS."""
+    cutoff = time.time() - settings.PROFILE_MAX_AGE_DAYS * 86400
+    for index, capture in enumerate(list_captures()):
+        if index >= settings.PROFILE_MAX_CAPTURES or capture['created'].timestamp() < cutoff:
+            for name in capture['files']:
+                try:
+                    os.remove(os.path.join(settings.PROFILE_DIR, name))
+                except FileNotFoundError:
+                    pass
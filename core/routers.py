@@ -0,0 +1,80 @@
+"""
+Primary/replica routing. Reads go to a replica only inside a view that opted
+in with ReplicaReadsMixin, and only when ReplicaRoutingMiddleware allowed it
+for the request. Everything else uses the primary: writes, reads inside a
+transaction, reads outside a request and every other view, including the
+session and user lookups done by middleware.
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# set per request by the middleware; False means read from the primary
+reads_from_replica = contextvars.ContextVar('reads_from_replica', default=False)
+
+WRITE_PREFIXES = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE')
+
+
+@contextmanager
+def use_replica(enabled=True):
+    token = reads_from_replica.set(enabled)
+    try:
+        yield
+    finally:
+        reads_from_replica.reset(token)
+
+
+class ReplicaReadsMixin:
+    """
+    For read views that tolerate replication lag (listings, event detail,
+    dashboards): their reads go to a replica when the middleware set
+    request.replica_reads. List it after LoginRequiredMixin and below role
+    checks on dispatch, so the user and roles still come from the primary.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self._adispatch(request, *args, **kwargs)
+        with use_replica(getattr(request, 'replica_reads', False)):
+            return super().dispatch(request, *args, **kwargs)
+
+    async def _adispatch(self, request, *args, **kwargs):
+        # awaited inside the block, or the view would run after it was left
+        with use_replica(getattr(request, 'replica_reads', False)):
+            return await super().dispatch(request, *args, **kwargs)
+
+
+class WriteDetector:
+    """Execute wrapper that switches the rest of the request to the primary after a write."""
+
+    def __init__(self, ignored_tables=()):
+        self.ignored_tables = tuple(ignored_tables)
+        self.wrote = False
+
+    def __call__(self, execute, sql, params, many, context):
+        statement = sql.lstrip()[:80].upper()
+        if statement.startswith(WRITE_PREFIXES) and not any(t.upper() in statement for t in self.ignored_tables):
+            self.wrote = True
+            reads_from_replica.set(False)
+        return execute(sql, params, many, context)
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas or not reads_from_replica.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
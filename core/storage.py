@@ -0,0 +1,144 @@
+"""
+Content-addressed storage for uploads.
+
+Files are named by the SHA-256 of their content and sharded two levels deep:
+
+    MEDIA_ROOT/CONTENT_STORAGE_DIR/ab/cd/abcd...ef.jpg
+
+No directory grows past a few hundred entries. The same bytes are stored
+once however many rows upload them. upload_to is not used for new files.
+
+Every save counts a reference on the file's StoredFile row. delete() drops
+one reference and removes the file once nothing in the database points at
+it any more. Rows can stop pointing at a file without calling delete(), as
+with a replaced image or a removed event. `manage.py gc_media` finds those
+by recounting the references from the database.
+
+Names stored before this layout still work. `manage.py migrate_media`
+moves them over.
+"""
+import hashlib
+import os
+import posixpath
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_content_name(name):
+    return name.startswith(f'{settings.CONTENT_STORAGE_DIR}/')
+
+
+def name_hash(name):
+    """The content hash a content-addressed name was derived from, or None."""
+    if not is_content_name(name):
+        return None
+    return posixpath.splitext(posixpath.basename(name))[0]
+
+
+def content_name(sha256, original_name):
+    extension = os.path.splitext(original_name)[1].lower()
+    return posixpath.join(settings.CONTENT_STORAGE_DIR, sha256[:2], sha256[2:4], sha256 + extension)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def _save(self, name, content):
+        # set by core.uploads.StreamingUploadHandler while the upload streamed in
+        sha256 = getattr(content, 'sha256', None) or content_hash(content)
+        target = content_name(sha256, name)
+        # counted before the existence check so gc_media cannot remove the file in between
+        add_reference(target, sha256, content.size)
+        if not self.exists(target):
+            saved = super()._save(target, content)
+            if saved != target:
+                # an identical upload was written in the meantime, keep that one
+                super().delete(saved)
+        return target
+
+    def delete(self, name):
+        if not is_content_name(name):
+            return super().delete(name)
+        # counts can drift low (rows updated in bulk), so zero is checked against the database
+        if release(name) == 0 and not reference_counts([name]):
+            from .models import StoredFile
+
+            StoredFile.objects.filter(name=name, refcount=0).delete()
+            self.purge(name)
+
+    def purge(self, name):
+        """
+        Delete a file whose StoredFile row is gone. It is set aside first and
+        restored if an upload of the same content recreated the row meanwhile.
+        Returns whether the file was deleted.
+        """
+        from .models import StoredFile
+
+        path = self.path(name)
+        aside = f'{path}.gc'
+        try:
+            os.rename(path, aside)
+        except FileNotFoundError:
+            return False
+        if StoredFile.objects.filter(name=name).exists():
+            os.replace(aside, path)
+            return False
+        os.remove(aside)
+        return True
+
+
+def add_reference(name, sha256, size):
+    from .models import StoredFile
+
+    if StoredFile.objects.filter(name=name).update(refcount=F('refcount') + 1):
+        return
+    try:
+        with transaction.atomic():
+            StoredFile.objects.create(name=name, sha256=sha256, size=size, refcount=1)
+    except IntegrityError:
+        StoredFile.objects.filter(name=name).update(refcount=F('refcount') + 1)
+
+
+def release(name):
+    """Drop one reference; returns the remaining count."""
+    from .models import StoredFile
+
+    StoredFile.objects.filter(name=name, refcount__gt=0).update(refcount=F('refcount') - 1)
+    return StoredFile.objects.filter(name=name).values_list('refcount', flat=True).first() or 0
+
+
+def content_fields():
+    """(model, field) for every file field kept in this storage."""
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField) and isinstance(field.storage, ContentAddressedStorage):
+                yield model, field
+
+
+def unfiltered(model):
+    """All rows of model, soft-deleted ones included, through its default queryset class."""
+    return model._default_manager._queryset_class(model=model)
+
+
+def reference_counts(names=None):
+    """Counter of content-addressed names -> rows referencing them, optionally limited to names."""
+    counts = Counter()
+    for model, field in content_fields():
+        queryset = model._base_manager.filter(**{f'{field.name}__startswith': f'{settings.CONTENT_STORAGE_DIR}/'})
+        if names is not None:
+            queryset = queryset.filter(**{f'{field.name}__in': names})
+        rows = queryset.order_by().values(field.name).annotate(references=Count('pk'))
+        for name, references in rows.values_list(field.name, 'references'):
+            counts[name] += references
+    return counts
@@ -0,0 +1,175 @@
+"""
+Stale-while-revalidate on top of the Django cache, with single-flight
+recomputation.
+
+    stats = swr.fetch('dashboard-stats', 'stats:dashboard', compute, version=..., ttl=30)
+
+An entry is fresh while its stored version matches and it is younger than
+ttl. Once it is not, the caller that wins cache.add() on the key's lock
+recomputes; everyone else gets the stale copy straight away, or, if there is
+no copy yet, waits up to SWR_LOCK_WAIT for the winner. Copies are kept for
+SWR_KEEP_SECONDS so they can be served while the database is down.
+
+afetch() is the same for async views, with a coroutine function as compute.
+
+Degraded mode: when a recomputation raises a DatabaseError or takes longer
+than SWR_SLOW_SECONDS, this worker serves any stale copy without touching
+the database for SWR_DEGRADED_SECONDS.
+"""
+import asyncio
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DatabaseError
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+STALE_SERVES = metrics.Counter('swr_stale_serves', 'Stale cache entries served, by cache name and reason.')
+LOCK_WAIT = metrics.Histogram('swr_lock_wait_seconds', 'Time spent waiting for another request to recompute a value.')
+DEGRADED = metrics.Gauge('swr_degraded', 'Whether this worker is serving stale copies instead of querying.',
+                         lambda: int(degraded()))
+
+_MISSING = object()
+_degraded_until = 0.0
+
+
+def degraded():
+    return time.monotonic() < _degraded_until
+
+
+def enter_degraded(reason):
+    global _degraded_until
+    if not degraded():
+        logger.warning('Entering degraded mode, serving stale cache entries', extra={'reason': reason})
+    _degraded_until = time.monotonic() + settings.SWR_DEGRADED_SECONDS
+
+
+def _fresh(entry, version):
+    value, stored_version, expires_at = entry
+    return stored_version == version and (expires_at is None or time.time() < expires_at)
+
+
+def _entry(value, version, ttl):
+    return value, version, time.time() + ttl if ttl else None
+
+
+def _stale(name, entry, reason):
+    STALE_SERVES.inc(cache=name, reason=reason)
+    return entry[0]
+
+
+def _failed(name, entry):
+    enter_degraded('error')
+    if entry is None:
+        raise
+    logger.warning('Recomputing %s failed, serving the stale copy', name, exc_info=True)
+    return _stale(name, entry, 'error')
+
+
+def _compute(name, cache, key, compute, version, ttl, entry):
+    start = time.monotonic()
+    try:
+        value = compute()
+    except DatabaseError:
+        return _failed(name, entry)
+    if time.monotonic() - start > settings.SWR_SLOW_SECONDS:
+        enter_degraded('slow')
+    if value is not None:
+        cache.set(key, _entry(value, version, ttl), settings.SWR_KEEP_SECONDS)
+    return value
+
+
+async def _acompute(name, cache, key, compute, version, ttl, entry):
+    start = time.monotonic()
+    try:
+        value = await compute()
+    except DatabaseError:
+        return _failed(name, entry)
+    if time.monotonic() - start > settings.SWR_SLOW_SECONDS:
+        enter_degraded('slow')
+    if value is not None:
+        await cache.aset(key, _entry(value, version, ttl), settings.SWR_KEEP_SECONDS)
+    return value
+
+
+def fetch(name, key, compute, version=None, ttl=None, alias=None):
+    """
+    Cached compute() for key. name labels the metrics. compute() returning
+    None is passed through without being stored.
+    """
+    cache = caches[alias or settings.SWR_CACHE_ALIAS]
+    entry = cache.get(key)
+    if entry is not None and _fresh(entry, version):
+        metrics.record_cache(name, True)
+        return entry[0]
+    metrics.record_cache(name, False)
+    if entry is not None and degraded():
+        return _stale(name, entry, 'degraded')
+
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, settings.SWR_LOCK_TIMEOUT):
+        try:
+            return _compute(name, cache, key, compute, version, ttl, entry)
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+
+    if entry is not None:
+        return _stale(name, entry, 'revalidating')
+
+    # nothing to serve yet: give the winner a moment before computing ourselves
+    start = time.monotonic()
+    deadline = start + settings.SWR_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None and entry[1] == version:
+            LOCK_WAIT.observe(time.monotonic() - start, cache=name)
+            return entry[0]
+        if cache.get(lock_key, _MISSING) is _MISSING:
+            break
+    LOCK_WAIT.observe(time.monotonic() - start, cache=name)
+    return _compute(name, cache, key, compute, version, ttl, None)
+
+
+async def afetch(name, key, compute, version=None, ttl=None, alias=None):
+    """fetch() for async callers; compute is a coroutine function."""
+    cache = caches[alias or settings.SWR_CACHE_ALIAS]
+    entry = await cache.aget(key)
+    if entry is not None and _fresh(entry, version):
+        metrics.record_cache(name, True)
+        return entry[0]
+    metrics.record_cache(name, False)
+    if entry is not None and degraded():
+        return _stale(name, entry, 'degraded')
+
+    lock_key = f'{key}:lock'
+    token = uuid.uuid4().hex
+    if await cache.aadd(lock_key, token, settings.SWR_LOCK_TIMEOUT):
+        try:
+            return await _acompute(name, cache, key, compute, version, ttl, entry)
+        finally:
+            if await cache.aget(lock_key) == token:
+                await cache.adelete(lock_key)
+
+    if entry is not None:
+        return _stale(name, entry, 'revalidating')
+
+    start = time.monotonic()
+    deadline = start + settings.SWR_LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        entry = await cache.aget(key)
+        if entry is not None and entry[1] == version:
+            LOCK_WAIT.observe(time.monotonic() - start, cache=name)
+            return entry[0]
+        if await cache.aget(lock_key, _MISSING) is _MISSING:
+            break
+    LOCK_WAIT.observe(time.monotonic() - start, cache=name)
+    return await _acompute(name, cache, key, compute, version, ttl, None)
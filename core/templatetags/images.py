@@ -0,0 +1,54 @@
+from django import template
+from django.utils.html import format_html
+
+from core import images
+
+register = template.Library()
+
+
+def _srcset(sha256, variant, fmt):
+    width, _ = images.variants()[variant]
+    candidates = []
+    for density in images.DENSITIES:
+        name = variant if density == 1 else f'{variant}@{density}x'
+        candidates.append(f'{images.variant_url(sha256, name, fmt)} {width * density}w')
+    return ', '.join(candidates)
+
+
+@register.simple_tag
+def image_url(field, variant, fmt='webp'):
+    """
+    URL of one variant, or of the original until it is processed.
+    Usage: style="background-image: url('{% image_url event.image 'card' %}')"
+    """
+    if not field:
+        return ''
+    sha256 = images.ready_hash(field.name)
+    if sha256 is None:
+        return field.url
+    return images.variant_url(sha256, variant, fmt)
+
+
+@register.simple_tag
+def picture(field, variant, alt='', css_class='', sizes=None):
+    """
+    <picture> with WebP and JPEG srcsets at 1x/2x, or a plain <img> of the
+    original until the variants exist.
+    Usage: {% picture event.image 'card' alt=event.name css_class='w-full h-48 object-cover' %}
+    """
+    if not field:
+        return ''
+    sha256 = images.ready_hash(field.name)
+    if sha256 is None:
+        return format_html('<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">',
+                           field.url, alt, css_class)
+    width, height = images.variants()[variant]
+    sizes = sizes or f'{width}px'
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" alt="{}" class="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        _srcset(sha256, variant, 'webp'), sizes,
+        images.variant_url(sha256, variant, 'jpeg'), _srcset(sha256, variant, 'jpeg'), sizes,
+        width, height, alt, css_class,
+    )
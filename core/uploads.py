@@ -0,0 +1,120 @@
+"""
+Upload handling for image fields.
+
+StreamingUploadHandler replaces Django's memory and temporary-file handlers
+(FILE_UPLOAD_HANDLERS). Each upload is written chunk by chunk to a
+temporary file, so no upload is held in memory. Two checks run while it
+streams:
+
+- the first chunk's magic bytes must be a JPEG, PNG, GIF or WebP image;
+- the upload must stay within UPLOAD_MAX_BYTES. The declared length is
+  checked up front, and the bytes are counted as they arrive.
+
+A rejected upload stops being written and the rest of it is discarded as it
+is read. The form still receives a RejectedUpload, and
+UploadedImageField turns it into a field error.
+
+Accepted files carry .sha256, computed from the same chunks, so
+core.storage and core.images use it instead of reading the file again.
+"""
+import hashlib
+import io
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+
+from . import metrics
+
+# (offset, signature) -> content type
+SIGNATURES = [
+    ((0, b'\xff\xd8\xff'), 'image/jpeg'),
+    ((0, b'\x89PNG\r\n\x1a\n'), 'image/png'),
+    ((0, b'GIF87a'), 'image/gif'),
+    ((0, b'GIF89a'), 'image/gif'),
+    ((8, b'WEBP'), 'image/webp'),
+]
+
+UPLOAD_REJECTIONS = metrics.Counter('upload_rejections', 'Uploads rejected while streaming, by reason.')
+
+
+def sniff(head):
+    """Content type from the first bytes of a file, or None if it is not an accepted image."""
+    for (offset, signature), content_type in SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            if content_type == 'image/webp' and not head.startswith(b'RIFF'):
+                continue
+            return content_type
+    return None
+
+
+class RejectedUpload(UploadedFile):
+    """Stand-in for an upload that was discarded while streaming."""
+
+    def __init__(self, name, error):
+        super().__init__(io.BytesIO(), name=name, content_type='application/octet-stream', size=0)
+        self.upload_error = error
+
+
+class StreamingUploadHandler(FileUploadHandler):
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.file = None
+        self.error = None
+        self.digest = hashlib.sha256()
+        self.received = 0
+        if content_length and content_length > settings.UPLOAD_MAX_BYTES:
+            self.reject('size')
+
+    def reject(self, reason):
+        UPLOAD_REJECTIONS.inc(reason=reason)
+        if reason == 'size':
+            self.error = f'The file is larger than {filesizeformat(settings.UPLOAD_MAX_BYTES)}.'
+        else:
+            self.error = 'Upload a JPEG, PNG, GIF or WebP image.'
+        if self.file is not None:
+            # closing the temporary file deletes it
+            self.file.close()
+            self.file = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        if start == 0:
+            content_type = sniff(raw_data)
+            if content_type is None:
+                self.reject('type')
+                return None
+            self.file = TemporaryUploadedFile(self.file_name, content_type, 0, self.charset, self.content_type_extra)
+        self.received += len(raw_data)
+        if self.received > settings.UPLOAD_MAX_BYTES:
+            self.reject('size')
+            return None
+        self.file.write(raw_data)
+        self.digest.update(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.error or self.file is None:
+            return RejectedUpload(self.file_name, self.error or 'The submitted file is empty.')
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.digest.hexdigest()
+        return self.file
+
+    def upload_interrupted(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class UploadedImageField(forms.ImageField):
+    """forms.ImageField that reports uploads StreamingUploadHandler rejected."""
+
+    def to_python(self, data):
+        error = getattr(data, 'upload_error', None)
+        if error:
+            raise forms.ValidationError(error, code='invalid_upload')
+        return super().to_python(data)
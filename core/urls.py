@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import metrics_view, ProfileListView, ProfileDownloadView
+
+urlpatterns = [
+    path('metrics/', metrics_view, name='metrics'),
+    path('profiles/', ProfileListView.as_view(), name='profile-list'),
+    path('profiles/<str:filename>', ProfileDownloadView.as_view(), name='profile-download'),
+]
@@ -1,5 +1,61 @@
-from django.shortcuts import render
-from django.http import HttpResponse
+import hmac
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.shortcuts import render, redirect
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.views.generic import TemplateView, View
+
+from . import metrics, profiling
 
 def home(request):
     return HttpResponse("Core app is working!")
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, protected by METRICS_TOKEN; without one it only answers under DEBUG."""
+    token = settings.METRICS_TOKEN
+    if not token:
+        if not settings.DEBUG:
+            raise Http404('Metrics are not configured')
+    else:
+        supplied = request.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not hmac.compare_digest(supplied, token):
+            return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class AdminRequiredMixin(LoginRequiredMixin):
+    login_url = 'sign-in'
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated and not request.user.groups.filter(name='Admin').exists():
+            messages.error(request, 'Access denied. Admin privileges required.')
+            return redirect('dashboard-redirect')
+        return super().dispatch(request, *args, **kwargs)
+
+
+class ProfileListView(AdminRequiredMixin, TemplateView):
+    template_name = 'core/profile_list.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context.update({
+            'captures': profiling.list_captures(),
+            'token': profiling.make_token(),
+            'token_header': profiling.TOKEN_HEADER,
+            'query_flag': profiling.QUERY_FLAG,
+            'sample_rate': settings.PROFILE_SAMPLE_RATE,
+            'max_captures': settings.PROFILE_MAX_CAPTURES,
+            'max_age_days': settings.PROFILE_MAX_AGE_DAYS,
+        })
+        return context
+
+
+class ProfileDownloadView(AdminRequiredMixin, View):
+    def get(self, request, filename):
+        path = profiling.capture_path(filename)
+        if path is None:
+            raise Http404('Profile not found')
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=filename)
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'event_management.settings')
 
 application = get_asgi_application()
+
+from events import readmodel, suggest  # noqa: E402
+
+readmodel.warm()
+suggest.warm()
@@ -18,12 +18,14 @@ from django.contrib import admin
 from django.urls import path, include, re_path
 from django.contrib.auth import views as auth_views
 from django.conf import settings
-from django.views.static import serve
+
+from core import media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', include('events.urls')),
     path('users/', include('users.urls')),
+    path('', include('core.urls')),
     
     # Pass reset 
     path('password-reset/', auth_views.PasswordResetView.as_view(
@@ -40,7 +42,7 @@ urlpatterns = [
     path('password-reset/complete/', auth_views.PasswordResetCompleteView.as_view(
         template_name='events/password_reset_complete.html'
     ), name='password_reset_complete'),
-    re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
+    re_path(r'^media/(?P<path>.*)$', media.serve, name='media'),
 ]
 
 if settings.DEBUG:
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'event_management.settings')
 
 application = get_wsgi_application()
+
+from events import readmodel, suggest  # noqa: E402
+
+readmodel.warm()
+suggest.warm()
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Event, Participant, Category, RSVP
+from django.db import models
+
+from core.uploads import UploadedImageField
+from .models import Event, Participant, Category, RSVP, ArchivedEvent, ArchivedRSVP
 
 
 @admin.register(RSVP)
@@ -18,6 +21,7 @@ class EventAdmin(admin.ModelAdmin):
     search_fields = ('name', 'location', 'description')
     ordering = ('-date',)
     readonly_fields = ('image_preview',)
+    formfield_overrides = {models.ImageField: {'form_class': UploadedImageField}}
     
     def image_preview(self, obj):
         if obj.image:
@@ -27,5 +31,21 @@ class EventAdmin(admin.ModelAdmin):
     image_preview.allow_tags = True
 
 
+@admin.register(ArchivedEvent)
+class ArchivedEventAdmin(admin.ModelAdmin):
+    list_display = ('name', 'date', 'time', 'location', 'category', 'archived_at')
+    list_filter = ('date', 'category')
+    search_fields = ('name', 'location')
+    ordering = ('-date',)
+
+
+@admin.register(ArchivedRSVP)
+class ArchivedRSVPAdmin(admin.ModelAdmin):
+    list_display = ('user', 'event_id', 'status', 'created_at', 'archived_at')
+    list_filter = ('status',)
+    search_fields = ('user__username', 'user__email')
+    ordering = ('-created_at',)
+
+
 admin.site.register(Participant)
 admin.site.register(Category)
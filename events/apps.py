@@ -6,4 +6,15 @@ class EventsConfig(AppConfig):
     name = 'events'
 # Register signal 
     def ready(self):
-        import events.signals  
+        import events.signals
+        import events.checks
+        from core import images
+        from events import caches, fragments, live, pagecache, readmodel, suggest
+        from events.models import Event
+        images.register(Event, 'image')
+        caches.connect()
+        fragments.connect()
+        live.connect()
+        pagecache.connect()
+        readmodel.connect()
+        suggest.connect()
@@ -0,0 +1,141 @@
+"""
+Moves old events (with their RSVPs and participant links) and old cancelled
+RSVPs out of the hot tables into ArchivedEvent / ArchivedRSVP, one batch per
+transaction, and restores them on demand. Archived rows keep their ids, so
+/event/<pk>/ links keep working.
+"""
+import logging
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.db import retry_on_lock
+from .models import RSVP, ArchivedEvent, ArchivedRSVP, Event, Participant
+
+logger = logging.getLogger(__name__)
+
+EVENT_FIELDS = ('id', 'name', 'description', 'image', 'date', 'time', 'location', 'category_id')
+RSVP_FIELDS = ('id', 'user_id', 'event_id', 'status', 'created_at', 'updated_at', 'notes')
+
+EventParticipants = Participant.events.through
+EventUsers = Event.rsvps.through
+ArchivedEventParticipants = ArchivedEvent.participants.through
+ArchivedEventUsers = ArchivedEvent.rsvps.through
+
+
+def _copy(model, source, fields):
+    return model(**{field: getattr(source, field) for field in fields})
+
+
+@retry_on_lock
+def _archive_event_batch(ids):
+    events = list(Event.objects.filter(id__in=ids))
+    ArchivedEvent.objects.bulk_create([_copy(ArchivedEvent, event, EVENT_FIELDS) for event in events])
+    ArchivedEventParticipants.objects.bulk_create([
+        ArchivedEventParticipants(archivedevent_id=event_id, participant_id=participant_id)
+        for event_id, participant_id in EventParticipants.objects.filter(event_id__in=ids)
+        .values_list('event_id', 'participant_id')
+    ])
+    ArchivedEventUsers.objects.bulk_create([
+        ArchivedEventUsers(archivedevent_id=event_id, customuser_id=user_id)
+        for event_id, user_id in EventUsers.objects.filter(event_id__in=ids).values_list('event_id', 'customuser_id')
+    ])
+    ArchivedRSVP.objects.bulk_create([
+        _copy(ArchivedRSVP, rsvp, RSVP_FIELDS) for rsvp in RSVP.objects.filter(event_id__in=ids)
+    ])
+    # through rows and RSVPs go with the events via cascade
+    Event.objects.filter(id__in=ids).delete()
+    return len(events)
+
+
+@retry_on_lock
+def _archive_rsvp_batch(ids):
+    rsvps = list(RSVP.objects.filter(id__in=ids))
+    ArchivedRSVP.objects.bulk_create([_copy(ArchivedRSVP, rsvp, RSVP_FIELDS) for rsvp in rsvps])
+    RSVP.objects.filter(id__in=ids).delete()
+    return len(rsvps)
+
+
+def _batches(queryset, batch_size):
+    """Yield id batches until the queryset is empty; each batch is removed before the next read."""
+    while True:
+        ids = list(queryset.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+
+
+def archive_events(older_than_days=None, batch_size=None, dry_run=False):
+    """Archive events dated more than older_than_days ago. Returns the number archived."""
+    days = settings.ARCHIVE_EVENTS_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    queryset = Event.objects.filter(date__lt=date.today() - timedelta(days=days)).order_by('date', 'id')
+    if dry_run:
+        return queryset.count()
+    total = 0
+    for ids in _batches(queryset, batch_size):
+        total += _archive_event_batch(ids)
+        logger.info('Archived %s events', total)
+    return total
+
+
+def archive_cancelled_rsvps(older_than_days=None, batch_size=None, dry_run=False):
+    """Archive RSVPs cancelled more than older_than_days ago. Returns the number archived."""
+    days = settings.ARCHIVE_RSVPS_AFTER_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or settings.ARCHIVE_BATCH_SIZE
+    queryset = RSVP.objects.filter(
+        status='cancelled', updated_at__lt=timezone.now() - timedelta(days=days),
+    ).order_by('updated_at', 'id')
+    if dry_run:
+        return queryset.count()
+    total = 0
+    for ids in _batches(queryset, batch_size):
+        total += _archive_rsvp_batch(ids)
+        logger.info('Archived %s cancelled RSVPs', total)
+    return total
+
+
+@retry_on_lock
+def restore_event(event_id):
+    """Move an archived event and its RSVPs and links back into the hot tables."""
+    archived = ArchivedEvent.objects.get(id=event_id)
+    Event.objects.bulk_create([_copy(Event, archived, EVENT_FIELDS)])
+    EventParticipants.objects.bulk_create([
+        EventParticipants(event_id=event_id, participant_id=participant_id)
+        for participant_id in ArchivedEventParticipants.objects.filter(archivedevent_id=event_id)
+        .values_list('participant_id', flat=True)
+    ])
+    EventUsers.objects.bulk_create([
+        EventUsers(event_id=event_id, customuser_id=user_id)
+        for user_id in ArchivedEventUsers.objects.filter(archivedevent_id=event_id).values_list('customuser_id', flat=True)
+    ])
+    # a cancelled RSVP archived while the event was live and the user's later
+    # RSVP can both be here; only the newest fits RSVP's (user, event) key
+    rsvps = {}
+    for rsvp in ArchivedRSVP.objects.filter(event_id=event_id).order_by('-updated_at', '-id'):
+        rsvps.setdefault(rsvp.user_id, rsvp)
+    RSVP.objects.bulk_create([_copy(RSVP, rsvp, RSVP_FIELDS) for rsvp in rsvps.values()])
+    for rsvp in rsvps.values():
+        # bulk_create stamps auto_now fields, put the original times back
+        RSVP.objects.filter(id=rsvp.id).update(created_at=rsvp.created_at, updated_at=rsvp.updated_at)
+    # the older ones stay archived
+    ArchivedRSVP.objects.filter(id__in=[rsvp.id for rsvp in rsvps.values()]).delete()
+    archived.delete()
+    return Event.objects.get(id=event_id)
+
+
+def get_event(pk):
+    """Live event, else archived event, else None."""
+    return (
+        Event.objects.select_related('category').prefetch_related('participants').filter(pk=pk).first()
+        or ArchivedEvent.objects.select_related('category').prefetch_related('participants').filter(pk=pk).first()
+    )
+
+
+async def aget_event(pk):
+    return (
+        await Event.objects.select_related('category').prefetch_related('participants').filter(pk=pk).afirst()
+        or await ArchivedEvent.objects.select_related('category').prefetch_related('participants').filter(
+            pk=pk).afirst()
+    )
@@ -0,0 +1,87 @@
+"""
+Native async versions of the read-heavy public views, used instead of the
+ones in events.views when ASYNC_VIEWS is on (an ASGI server such as uvicorn).
+
+Each view loads its data with the async ORM and the async cache helpers
+(readmodel.aupcoming, caches.acategories, caches.adashboard_stats,
+archive.aget_event) and keeps template names, context and page caching from
+the sync view it extends. Templates are rendered by Django in a worker thread
+as for any TemplateResponse, so lazy relations they follow still work.
+"""
+from datetime import date
+
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import Http404
+
+from . import archive, caches, readmodel
+from .models import ArchivedEvent, Event
+from .views import EventDetailView, EventsView, HomeView, MyRSVPsView
+
+
+class AsyncHomeView(HomeView):
+
+    async def get(self, request, *args, **kwargs):
+        today = date.today()
+        previous_events = [event async for event in Event.objects.filter(date__lt=today).order_by('-date', 'time')[:6]]
+        if len(previous_events) < 6:
+            previous_events += [
+                event async for event in ArchivedEvent.objects.order_by('-date', 'time')[:6 - len(previous_events)]
+            ]
+        stats = await caches.adashboard_stats()
+        # TemplateView's context, HomeView's own would query synchronously
+        context = super(HomeView, self).get_context_data(
+            upcoming_events=await readmodel.aupcoming(limit=6),
+            previous_events=previous_events,
+            categories=await caches.acategories(),
+            total_participants=stats['total_participants'],
+            **kwargs,
+        )
+        return self.render_to_response(context)
+
+
+class AsyncEventsView(EventsView):
+
+    async def get(self, request, *args, **kwargs):
+        search = request.GET.get('search')
+        category = request.GET.get('category')
+        start_date = request.GET.get('start_date')
+        end_date = request.GET.get('end_date')
+
+        window = self.upcoming_window(start_date, end_date, category)
+        if window is not None:
+            events = await readmodel.aupcoming(*window, category, search)
+            self.object_list = events[::-1]
+        else:
+            queryset = self.search_queryset(search, category, start_date, end_date)
+            self.object_list = [event async for event in queryset]
+
+        stats = await caches.adashboard_stats()
+        context = super(EventsView, self).get_context_data(
+            categories=await caches.acategories(),
+            total_participants=stats['total_participants'],
+        )
+        return self.render_to_response(context)
+
+
+class AsyncEventDetailView(EventDetailView):
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await archive.aget_event(self.kwargs['pk'])
+        if self.object is None:
+            raise Http404('No event found matching the query')
+        return self.render_to_response(self.get_context_data(object=self.object))
+
+
+class AsyncMyRSVPsView(MyRSVPsView):
+
+    async def dispatch(self, request, *args, **kwargs):
+        # resolved here so nothing later loads the user synchronously
+        request.user = await request.auser()
+        if not request.user.is_authenticated:
+            return self.handle_no_permission()
+        return await super(LoginRequiredMixin, self).dispatch(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = [rsvp async for rsvp in self.get_queryset()]
+        context = super(MyRSVPsView, self).get_context_data(total_rsvps=len(self.object_list))
+        return self.render_to_response(context)
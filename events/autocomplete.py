@@ -0,0 +1,110 @@
+"""
+Autocomplete for the dashboard's event and category pickers.
+
+The forms used to render every event and category as an <option>. The
+pickers now use AutocompleteSelect and AutocompleteSelectMultiple. Those
+widgets render only the options currently selected. The page's script
+(events/autocomplete_script.html) asks the JSON endpoint for the rest as
+the user types:
+
+    GET /autocomplete/<source>/?q=<prefix>&page=<n>     (source: events or categories)
+    {"results": [{"id": 1, "text": "Tech Talk (Oct 21, 2026)"}, ...],
+     "pagination": {"more": true}}
+
+Matching is a case-insensitive name prefix: a LIKE 'term%' over name_key,
+the case-folded name kept by models.SearchKeyField. The column's index
+serves the name order, and on PostgreSQL Django adds a varchar_pattern_ops
+index for the LIKE. Results come AUTOCOMPLETE_PAGE_SIZE per page.
+"""
+from django import forms
+from django.conf import settings
+from django.urls import reverse
+
+from .models import Category, Event, search_key
+
+# no name is longer, so a longer term cannot match anything
+MAX_TERM_LENGTH = 200
+
+
+def event_label(event):
+    return f'{event.name} ({event.date:%b %d, %Y})'
+
+
+# name -> (queryset factory, label)
+SOURCES = {
+    'events': (lambda: Event.objects.only('pk', 'name', 'date'), event_label),
+    'categories': (lambda: Category.objects.only('pk', 'name'), str),
+}
+
+
+def prefix_queryset(queryset, term):
+    """Rows whose name starts with term, ignoring case, in name order."""
+    term = search_key(term.strip())[:MAX_TERM_LENGTH]
+    if term:
+        queryset = queryset.filter(name_key__startswith=term)
+    return queryset.order_by('name_key', 'pk')
+
+
+def page_slice(page):
+    size = settings.AUTOCOMPLETE_PAGE_SIZE
+    offset = (page - 1) * size
+    # one extra row tells whether another page follows
+    return slice(offset, offset + size + 1)
+
+
+def paginate(rows, label):
+    size = settings.AUTOCOMPLETE_PAGE_SIZE
+    return {
+        'results': [{'id': row.pk, 'text': label(row)} for row in rows[:size]],
+        'pagination': {'more': len(rows) > size},
+    }
+
+
+async def asearch(source, term, page=1):
+    """One page of matches from SOURCES[source] as the endpoint's JSON body."""
+    queryset, label = SOURCES[source]
+    return paginate([row async for row in prefix_queryset(queryset(), term)[page_slice(page)]], label)
+
+
+class AutocompleteMixin:
+    """
+    A model choice widget that renders only the selected options and leaves
+    the rest to the autocomplete endpoint for source (a SOURCES key).
+    """
+    template_name = 'events/widgets/autocomplete.html'
+
+    def __init__(self, source, attrs=None, placeholder='Type to search...'):
+        super().__init__(attrs)
+        self.source = source
+        self.placeholder = placeholder
+
+    def use_required_attribute(self, initial):
+        # Select's version looks at the first choice, which can load the whole table
+        field = self.choices.field
+        return not self.is_hidden and (self.allow_multiple_selected or field.empty_label is not None)
+
+    def optgroups(self, name, value, attrs=None):
+        field = self.choices.field
+        label = SOURCES[self.source][1]
+        options = []
+        if not self.allow_multiple_selected and field.empty_label is not None:
+            options.append(self.create_option(name, '', field.empty_label, not any(value), 0))
+        pks = [pk for pk in value if pk.isdigit()]
+        if pks:
+            for instance in self.choices.queryset.filter(pk__in=pks):
+                options.append(self.create_option(
+                    name, field.prepare_value(instance), label(instance), True, len(options)))
+        return [(None, options, 0)]
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget'].update(url=reverse('autocomplete', args=[self.source]), placeholder=self.placeholder)
+        return context
+
+
+class AutocompleteSelect(AutocompleteMixin, forms.Select):
+    pass
+
+
+class AutocompleteSelectMultiple(AutocompleteMixin, forms.SelectMultiple):
+    pass
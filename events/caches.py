@@ -0,0 +1,75 @@
+"""
+Per-process caches of small lookup tables, emptied in every worker through
+core.invalidation when the underlying rows change. Cached instances are
+shared between requests; treat them as read-only.
+
+The dashboard statistics are shared through the Django cache instead and
+recomputed by one request at a time (core.swr).
+"""
+from datetime import date
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from core import invalidation, swr
+from . import readmodel
+from .models import ArchivedEvent, Category, Event, Participant
+from .pagecache import ALL, LISTS
+
+_categories = invalidation.LocalCache('categories')
+
+
+def categories():
+    # filled from the primary so a lagging replica cannot pin an old list
+    return _categories.get_or_set('all', lambda: list(Category.objects.using(DEFAULT_DB_ALIAS).all()))
+
+
+async def acategories():
+    async def load():
+        return [category async for category in Category.objects.using(DEFAULT_DB_ALIAS).all()]
+    return await _categories.aget_or_set('all', load)
+
+
+def _compute_stats():
+    today = date.today()
+    return {
+        'total_participants': Participant.objects.using(DEFAULT_DB_ALIAS).count(),
+        'total_events': Event.objects.using(DEFAULT_DB_ALIAS).count(),
+        'total_categories': len(categories()),
+        'upcoming_events_count': readmodel.count(),
+        'past_events_count': Event.objects.using(DEFAULT_DB_ALIAS).filter(date__lt=today).count()
+        + ArchivedEvent.objects.using(DEFAULT_DB_ALIAS).count(),
+    }
+
+
+async def _acompute_stats():
+    today = date.today()
+    past = await Event.objects.using(DEFAULT_DB_ALIAS).filter(date__lt=today).acount()
+    return {
+        'total_participants': await Participant.objects.using(DEFAULT_DB_ALIAS).acount(),
+        'total_events': await Event.objects.using(DEFAULT_DB_ALIAS).acount(),
+        'total_categories': len(await acategories()),
+        'upcoming_events_count': len(await readmodel.aupcoming()),
+        'past_events_count': past + await ArchivedEvent.objects.using(DEFAULT_DB_ALIAS).acount(),
+    }
+
+
+def _stats_version():
+    # the listings generations move with every event, participant or category write
+    return f'{date.today().isoformat()}:{invalidation.generation(ALL)}.{invalidation.generation(LISTS)}'
+
+
+def dashboard_stats():
+    """Event, participant and category counts; current as of the last listing change."""
+    return swr.fetch('dashboard-stats', 'stats:dashboard', _compute_stats, version=_stats_version(),
+                     ttl=settings.DASHBOARD_STATS_TTL)
+
+
+async def adashboard_stats():
+    return await swr.afetch('dashboard-stats', 'stats:dashboard', _acompute_stats, version=_stats_version(),
+                            ttl=settings.DASHBOARD_STATS_TTL)
+
+
+def connect():
+    """Called from EventsConfig.ready()."""
+    invalidation.watch('categories', Category)
@@ -0,0 +1,49 @@
+from django.apps import apps
+from django.core.checks import Warning, register
+from django.db.models import UniqueConstraint
+
+# (model, field) pairs the listing views filter or order on
+HOT_LOOKUPS = [
+    ('events.Event', 'date'),
+    ('events.Event', 'category'),
+    ('events.RSVP', 'user'),
+    ('events.RSVP', 'event'),
+    ('events.RSVP', 'created_at'),
+    ('events.Participant', 'email'),
+    ('events.Category', 'name'),
+]
+
+
+def indexed_leading_fields(model):
+    """Field names that are the first column of some index on the model."""
+    opts = model._meta
+    leading = set()
+    for field in opts.concrete_fields:
+        if field.primary_key or field.unique or field.db_index:
+            leading.add(field.name)
+    for index in opts.indexes:
+        if index.fields:
+            leading.add(index.fields[0].lstrip('-'))
+    for fields in opts.unique_together:
+        leading.add(fields[0])
+    for constraint in opts.constraints:
+        if isinstance(constraint, UniqueConstraint) and constraint.fields:
+            leading.add(constraint.fields[0])
+    return leading
+
+
+@register('models')
+def check_hot_lookup_indexes(app_configs=None, **kwargs):
+    """Warn when a lookup used by the listing views has no index to start from."""
+    errors = []
+    for label, field_name in HOT_LOOKUPS:
+        model = apps.get_model(label)
+        if field_name not in indexed_leading_fields(model):
+            errors.append(Warning(
+                f'{label}.{field_name} is used for filtering/ordering but no index starts with it.',
+                hint=f"Add db_index=True or a Meta.indexes entry for '{field_name}', "
+                     f"then check the plan with 'manage.py perf_audit'.",
+                obj=model,
+                id='events.W001',
+            ))
+    return errors
@@ -4,14 +4,17 @@ from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from datetime import date
+from .autocomplete import AutocompleteSelect, AutocompleteSelectMultiple
 from .models import Event, Participant, Category
 from users.models import CustomUser
+from core.uploads import UploadedImageField
 
 
 class EventForm(forms.ModelForm):
     class Meta:
         model = Event
         fields = '__all__'
+        field_classes = {'image': UploadedImageField}
         widgets = {
             'name': forms.TextInput(attrs={
                 'class': 'w-full p-3 border border-blue-300 rounded-lg focus:outline-none focus:ring-4 focus:ring-blue-400 focus:border-transparent shadow-sm',
@@ -38,7 +41,7 @@ class EventForm(forms.ModelForm):
                 'class': 'w-full p-3 border border-blue-300 rounded-lg focus:outline-none focus:ring-4 focus:ring-blue-400 focus:border-transparent shadow-sm',
                 'placeholder': 'e.g., Grand Exhibition Hall'
             }),
-            'category': forms.Select(attrs={
+            'category': AutocompleteSelect('categories', attrs={
                 'class': 'w-full p-3 border border-blue-300 rounded-lg focus:outline-none focus:ring-4 focus:ring-blue-400 focus:border-transparent shadow-sm'
             })
         }
@@ -57,7 +60,7 @@ class ParticipantForm(forms.ModelForm):
                 'class': 'w-full p-3 border border-blue-300 rounded-lg focus:outline-none focus:ring-4 focus:ring-blue-400 focus:border-transparent shadow-sm',
                 'placeholder': 'e.g., jane.doe@example.com'
             }),
-            'events': forms.SelectMultiple(attrs={
+            'events': AutocompleteSelectMultiple('events', attrs={
                 'class': 'w-full p-3 border border-blue-300 rounded-lg focus:outline-none focus:ring-4 focus:ring-blue-400 focus:border-transparent shadow-sm'
             })
         }
@@ -101,7 +104,7 @@ class CategoryForm(forms.ModelForm):
                 raise ValidationError("Category name must be at least 2 characters long.")
 
             #duplicate names
-            if Category.objects.filter(name__iexact=name).exists():
+            if Category.objects.filter(name__iexact=name).exclude(pk=self.instance.pk).exists():
                 raise ValidationError("A category with this name already exists.")
         return name
 
@@ -191,7 +194,6 @@ class SignInForm(AuthenticationForm):
 
     def clean_username(self):
         username = self.cleaned_data.get('username')
-        print(f'Username before cleaning: {username}')
         if username:
             username = username.strip()
             # if len(username) < 2:
@@ -200,7 +202,6 @@ class SignInForm(AuthenticationForm):
 
     def clean_password(self):
         password = self.cleaned_data.get('password')
-        print(f'Password before cleaning: {password}')
         if password:
             password = password.strip()
             # if len(password) < 6:
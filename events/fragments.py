@@ -0,0 +1,87 @@
+"""
+Rendered event cards, cached per event version.
+
+A card's key is its variant (the template under events/cards/), the model,
+the event id and Event.updated_at, so a changed event simply gets a new
+key. Category and participant changes touch updated_at of the events they
+show on (connect()). Listings render through render_cards(), which fetches
+every card with one get_many and renders, prefetches and stores only the
+misses.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import prefetch_related_objects
+from django.db.models.signals import m2m_changed, post_save, pre_delete
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from core import images, metrics
+from .models import Category, Event, Participant
+
+VARIANTS = ('upcoming', 'previous', 'listing', 'today', 'organizer')
+
+
+def card_key(variant, event):
+    # archived events keep their id and never change, archived_at is their version
+    version = getattr(event, 'updated_at', None) or event.archived_at
+    return f'card:{variant}:{event._meta.model_name}:{event.pk}:{version.timestamp()}'
+
+
+def render_cards(events, variant):
+    """Concatenated card markup for events, in order."""
+    if variant not in VARIANTS:
+        raise ValueError(f'Unknown card variant: {variant}')
+    events = list(events)
+    if not events:
+        return ''
+    cache = caches[settings.FRAGMENT_CACHE_ALIAS]
+    keys = [card_key(variant, event) for event in events]
+    cards = cache.get_many(keys, version=settings.FRAGMENT_CACHE_VERSION)
+
+    misses = [event for event, key in zip(events, keys) if key not in cards]
+    metrics.CACHE_REQUESTS.inc(len(events) - len(misses), cache='fragments', result='hit')
+    if misses:
+        metrics.CACHE_REQUESTS.inc(len(misses), cache='fragments', result='miss')
+        for model in {type(event) for event in misses}:
+            prefetch_related_objects([e for e in misses if type(e) is model], 'category', 'participants')
+        # the cards' image tags then read them from memory
+        images.ready_hashes([event.image.name for event in misses])
+        rendered = {}
+        for event in misses:
+            rendered[card_key(variant, event)] = render_to_string(f'events/cards/{variant}.html', {'event': event})
+        cache.set_many(rendered, settings.FRAGMENT_CACHE_TIMEOUT, version=settings.FRAGMENT_CACHE_VERSION)
+        cards.update(rendered)
+    return mark_safe(''.join(cards[key] for key in keys))
+
+
+def touch(event_ids):
+    if event_ids:
+        Event.objects.filter(pk__in=event_ids).update(updated_at=timezone.now())
+
+
+def _category_saved(sender, instance, created, **kwargs):
+    if not created:
+        touch(list(Event.objects.filter(category_id=instance.pk).values_list('pk', flat=True)))
+
+
+def _participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    # forward: instance is a Participant and pk_set holds events; reverse: instance is the Event
+    if action == 'pre_clear' and not reverse:
+        # the links are gone by post_clear, remember which events they were
+        instance._cleared_event_ids = list(instance.events.values_list('pk', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        touch([instance.pk] if reverse else sorted(pk_set))
+    elif action == 'post_clear':
+        touch([instance.pk] if reverse else getattr(instance, '_cleared_event_ids', []))
+
+
+def _participant_deleted(sender, instance, **kwargs):
+    touch(list(instance.events.values_list('pk', flat=True)))
+
+
+def connect():
+    """Called from EventsConfig.ready()."""
+    post_save.connect(_category_saved, sender=Category, dispatch_uid='fragments-category')
+    m2m_changed.connect(_participants_changed, sender=Participant.events.through, dispatch_uid='fragments-participants')
+    pre_delete.connect(_participant_deleted, sender=Participant, dispatch_uid='fragments-participant-delete')
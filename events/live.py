@@ -0,0 +1,188 @@
+"""
+Live RSVP and dashboard updates over Server-Sent Events (ASGI only).
+
+A page opts in by rendering stream_url() and including
+events/live_script.html. Its stream (LiveStreamView) subscribes to topics:
+
+- 'event:<pk>': RSVPs of that event as they are confirmed, cancelled or
+  removed, plus the event's RSVP counters;
+- 'dashboard': the dashboard_stats() counters.
+
+Fan-out is in-process. hub keeps a bounded asyncio.Queue per open stream.
+Writes made by any worker reach it through the change log. One Bridge task
+per process runs while anything is subscribed. It checks the 'live'
+invalidation namespace every LIVE_CHECK_INTERVAL seconds. That namespace
+is bumped when an RSVP, event, participant or category write commits. The
+check is a read of the shared generation file, so the database is only
+queried after a change, or every LIVE_POLL_INTERVAL seconds in case a bump
+was missed. New entries are then read and published to the watched topics.
+
+A stream starts with the current counters. When the browser reconnects it
+simply resyncs, and a stream whose queue overflows is closed for the same
+reason.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from core import changelog, invalidation, metrics
+from . import caches
+from .models import RSVP, Category, Event, Participant
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = 'live'
+RSVP_LABEL = RSVP._meta.label
+WATCHED_MODELS = (RSVP_LABEL, 'events.Event', 'events.Category', 'events.Participant')
+
+LIVE_MESSAGES = metrics.Counter('live_messages', 'Messages published to Server-Sent Events streams, by type.')
+
+# closes a stream that fell too far behind; the browser reconnects and resyncs
+OVERFLOW = object()
+
+
+def stream_url(events=(), dashboard=False):
+    """URL of the stream for these topics, or None when live updates are off."""
+    if not settings.LIVE_UPDATES:
+        return None
+    params = [('event', pk) for pk in events]
+    if dashboard:
+        params.append(('dashboard', 1))
+    return f'{reverse("live")}?{urlencode(params)}'
+
+
+def encode(name, data):
+    """One Server-Sent Events message."""
+    lines = json.dumps(data, default=str).splitlines() or ['']
+    return f'event: {name}\n' + ''.join(f'data: {line}\n' for line in lines) + '\n'
+
+
+class Hub:
+    """Topic -> queues of the streams in this process; used from the event loop only."""
+
+    def __init__(self):
+        self.topics = defaultdict(set)
+        self.bridge = None
+
+    def subscribe(self, topics):
+        queue = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+        for topic in topics:
+            self.topics[topic].add(queue)
+        if self.bridge is None or self.bridge.done():
+            self.bridge = asyncio.create_task(Bridge(self).run())
+        return queue
+
+    def unsubscribe(self, queue, topics):
+        for topic in topics:
+            queues = self.topics.get(topic)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self.topics[topic]
+
+    def watched_events(self):
+        return {int(topic.split(':', 1)[1]) for topic in self.topics if topic.startswith('event:')}
+
+    def publish(self, topic, name, data):
+        for queue in list(self.topics.get(topic, ())):
+            try:
+                queue.put_nowait((name, data))
+            except asyncio.QueueFull:
+                # the stream is cut off; a queue is never full of OVERFLOW markers
+                queue.get_nowait()
+                queue.put_nowait((OVERFLOW, None))
+                self.unsubscribe(queue, list(self.topics))
+        LIVE_MESSAGES.inc(type=name)
+
+
+hub = Hub()
+
+
+async def event_counts(event_ids):
+    """{event_id: {'confirmed', 'cancelled', 'total'}} for the given events."""
+    counts = {pk: {'event': pk, 'confirmed': 0, 'cancelled': 0, 'total': 0} for pk in event_ids}
+    rows = RSVP.objects.filter(event_id__in=event_ids).order_by().values('event_id', 'status').annotate(
+        rsvps=Count('pk'))
+    async for row in rows:
+        entry = counts[row['event_id']]
+        entry['total'] += row['rsvps']
+        if row['status'] in ('confirmed', 'cancelled'):
+            entry[row['status']] = row['rsvps']
+    return counts
+
+
+async def snapshot(topics):
+    """(name, data) messages bringing a new stream up to date."""
+    messages = []
+    events = [int(topic.split(':', 1)[1]) for topic in topics if topic.startswith('event:')]
+    if events:
+        messages += [('counts', counts) for counts in (await event_counts(events)).values()]
+    if 'dashboard' in topics:
+        messages.append(('stats', await caches.adashboard_stats()))
+    return messages
+
+
+class Bridge:
+    """Carries committed writes from the change log to hub; runs while anything is subscribed."""
+
+    def __init__(self, hub):
+        self.hub = hub
+        # streams start with a snapshot, so the bridge only follows what commits after the head
+        self.tail = changelog.Tail(WATCHED_MODELS)
+        self.generation = None
+        self.last_poll = 0.0
+
+    async def run(self):
+        await sync_to_async(self.tail.start)()
+        self.generation = invalidation.generation(NAMESPACE)
+        while self.hub.topics:
+            await asyncio.sleep(settings.LIVE_CHECK_INTERVAL)
+            generation = invalidation.generation(NAMESPACE)
+            due = time.monotonic() - self.last_poll >= settings.LIVE_POLL_INTERVAL
+            if generation == self.generation and not due:
+                continue
+            self.generation = generation
+            try:
+                await self.poll()
+            except Exception:
+                logger.exception('Live update poll failed')
+
+    async def poll(self):
+        self.last_poll = time.monotonic()
+        # late commits behind the position are re-read too (core.changelog.Tail)
+        entries = await sync_to_async(self.tail.poll)()
+        if not entries:
+            return
+        await self.publish(entries)
+
+    async def publish(self, entries):
+        rsvp_ids = {int(entry.object_id) for entry in entries if entry.model == RSVP_LABEL}
+        watched = self.hub.watched_events()
+        if rsvp_ids and watched:
+            rsvps = {rsvp.pk: rsvp async for rsvp in RSVP.objects.filter(
+                pk__in=rsvp_ids, event_id__in=watched).select_related('user')}
+            for rsvp in rsvps.values():
+                self.hub.publish(f'event:{rsvp.event_id}', 'rsvp', {'id': rsvp.pk, 'rsvp': rsvp})
+            # removed RSVPs no longer say which event they belonged to
+            removed = [entry for entry in entries if entry.model == RSVP_LABEL and entry.action == 'delete']
+            affected = watched if removed else {rsvp.event_id for rsvp in rsvps.values()}
+            for entry in removed:
+                for pk in watched:
+                    self.hub.publish(f'event:{pk}', 'rsvp', {'id': int(entry.object_id), 'rsvp': None})
+            for pk, counts in (await event_counts(affected)).items():
+                self.hub.publish(f'event:{pk}', 'counts', counts)
+        if 'dashboard' in self.hub.topics and any(entry.model != RSVP_LABEL for entry in entries):
+            self.hub.publish('dashboard', 'stats', await caches.adashboard_stats())
+
+
+def connect():
+    """Called from EventsConfig.ready()."""
+    invalidation.watch(NAMESPACE, RSVP, Event, Participant, Category)
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from events import archive
+
+
+class Command(BaseCommand):
+    help = 'Move old events (with their RSVPs and participant links) and old cancelled RSVPs into the archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.ARCHIVE_EVENTS_AFTER_DAYS,
+                            help='Archive events dated more than this many days ago')
+        parser.add_argument('--rsvp-days', type=int, default=settings.ARCHIVE_RSVPS_AFTER_DAYS,
+                            help='Archive RSVPs cancelled more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=settings.ARCHIVE_BATCH_SIZE,
+                            help='Rows moved per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be archived')
+
+    def handle(self, *args, **options):
+        events = archive.archive_events(options['days'], options['batch_size'], options['dry_run'])
+        rsvps = archive.archive_cancelled_rsvps(options['rsvp_days'], options['batch_size'], options['dry_run'])
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {events} event(s) and {rsvps} cancelled RSVP(s)'))
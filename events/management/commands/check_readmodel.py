@@ -0,0 +1,63 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from events import readmodel
+from events.models import Category
+
+FIELDS = ('name', 'date', 'time', 'location', 'category_id')
+
+
+class Command(BaseCommand):
+    help = 'Compare the in-memory upcoming events read model against the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', type=float, metavar='SECONDS',
+                            help='Keep the model and re-check every SECONDS, exercising incremental updates')
+
+    def queries(self):
+        today = date.today()
+        yield 'all upcoming', {}
+        yield 'today', {'end': today}
+        yield 'next 7 days', {'end': today + timedelta(days=7)}
+        yield 'from next month', {'start': today + timedelta(days=30)}
+        for category in Category.objects.all():
+            yield f'category {category.name}', {'category_id': category.pk}
+
+    def compare(self, model):
+        snapshot = model.current()
+        problems = []
+        for label, query in self.queries():
+            start = max(query.get('start') or snapshot.today, snapshot.today)
+            cached = snapshot.select(start, query.get('end'), query.get('category_id'))
+            expected = readmodel._orm(query.get('start'), query.get('end'), query.get('category_id'))
+            if [e.pk for e in cached] != [e.pk for e in expected]:
+                missing = {e.pk for e in expected} - {e.pk for e in cached}
+                extra = {e.pk for e in cached} - {e.pk for e in expected}
+                problems.append(f'{label}: missing {sorted(missing)}, extra {sorted(extra)}')
+                continue
+            for a, b in zip(cached, expected):
+                diff = [f for f in FIELDS if getattr(a, f) != getattr(b, f)]
+                if a.participants.count() != b.participants.count():
+                    diff.append('participants')
+                if diff:
+                    problems.append(f'{label}: event {a.pk} differs in {", ".join(diff)}')
+        return snapshot, problems
+
+    def handle(self, *args, **options):
+        model = readmodel.UpcomingEvents()
+        model.rebuild()
+        while True:
+            snapshot, problems = self.compare(model)
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(problem))
+            if not problems:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Read model consistent: {len(snapshot.ids)} upcoming events at seq {snapshot.seq}'))
+            if not options['watch']:
+                break
+            time.sleep(options['watch'])
+            model.mark_dirty()
+        if problems:
+            raise CommandError(f'{len(problems)} inconsistencies')
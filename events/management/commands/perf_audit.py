@@ -0,0 +1,144 @@
+from django.contrib.auth.models import Group
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+
+from core.nplusone import fingerprint
+from events.models import Event
+from users.models import CustomUser
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Render the main views, EXPLAIN every query they run and report scans, temp sorts and missing indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', help='Write the report to this file instead of stdout')
+        parser.add_argument('--fail-on-warnings', action='store_true',
+                            help='Exit with an error if any full scan or missing index is found')
+
+    def targets(self):
+        event = Event.objects.order_by('pk').first()
+        targets = [
+            ('HomeView', reverse('home')),
+            ('EventsView', reverse('events')),
+            ('EventsView (filtered)', reverse('events') + '?search=a&category=1&start_date=2000-01-01&end_date=2100-01-01'),
+            ('DashboardView', reverse('dashboard')),
+            ('AdminDashboardView', reverse('admin-dashboard')),
+            ('OrganizerDashboardView', reverse('organizer-dashboard')),
+            ('ParticipantDashboardView', reverse('participant-dashboard')),
+            ('MyRSVPsView', reverse('my-rsvps')),
+            ('ManageRSVPsView', reverse('manage-rsvps')),
+            ('RBACDashboardView', reverse('rbac-dashboard')),
+        ]
+        if event is not None:
+            targets.append(('EventDetailView', reverse('event-detail', args=[event.pk])))
+            targets.append(('EventRSVPsView', reverse('event-rsvps', args=[event.pk])))
+        return targets
+
+    def capture(self, path, user):
+        """Run the view behind path and return the SELECT statements it executed."""
+        statements = []
+
+        def wrapper(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                statements.append((sql, params))
+            return execute(sql, params, many, context)
+
+        request = RequestFactory().get(path)
+        request.user = user
+        request.session = SessionStore()
+        request._messages = FallbackStorage(request)
+        match = resolve(request.path_info)
+        request.resolver_match = match
+
+        with connection.execute_wrapper(wrapper):
+            response = match.func(request, *match.args, **match.kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+        return response.status_code, statements
+
+    def explain(self, sql, params):
+        prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            rows = cursor.fetchall()
+        if connection.vendor == 'sqlite':
+            return [row[-1] for row in rows]
+        return [row[0] for row in rows]
+
+    def classify(self, plan):
+        flags = []
+        for line in plan:
+            detail = line.strip()
+            upper = detail.upper()
+            if upper.startswith('SCAN ') and 'INDEX' not in upper and 'SUBQUERY' not in upper and 'CONSTANT ROW' not in upper:
+                flags.append(f'FULL SCAN: {detail}')
+            elif upper.startswith('SEQ SCAN'):
+                flags.append(f'FULL SCAN: {detail}')
+            elif 'AUTOMATIC' in upper and 'INDEX' in upper:
+                flags.append(f'MISSING INDEX: {detail}')
+            elif 'TEMP B-TREE' in upper:
+                flags.append(f'TEMP B-TREE: {detail}')
+            elif upper.startswith('SEARCH ') and 'USING INDEX' in upper:
+                flags.append(f'NOT COVERING: {detail}')
+        return flags
+
+    def handle(self, *args, **options):
+        lines = []
+        warnings = 0
+        try:
+            with transaction.atomic():
+                user = CustomUser.objects.create_user('perf_audit_user', 'perf_audit@example.com', is_superuser=True)
+                for name in ('Admin', 'Organizer', 'Participant'):
+                    user.groups.add(Group.objects.get_or_create(name=name)[0])
+
+                for label, path in self.targets():
+                    try:
+                        with transaction.atomic():
+                            status, statements = self.capture(path, user)
+                    except Exception as e:
+                        warnings += 1
+                        lines.extend([f'== {label} {path.split("?")[0]} [error]', f'  ! {type(e).__name__}: {e}', ''])
+                        continue
+                    plans = {}
+                    for sql, params in statements:
+                        key = fingerprint(sql)
+                        if key not in plans:
+                            plans[key] = [1, self.explain(sql, params)]
+                        else:
+                            plans[key][0] += 1
+
+                    lines.append(f'== {label} {path.split("?")[0]} [status {status}, '
+                                 f'{len(statements)} queries, {len(plans)} distinct]')
+                    for key in sorted(plans):
+                        count, plan = plans[key]
+                        flags = self.classify(plan)
+                        warnings += sum(not flag.startswith('NOT COVERING') for flag in flags)
+                        lines.append(f'  {count}x {key}')
+                        for detail in plan:
+                            lines.append(f'      | {detail}')
+                        for flag in flags:
+                            lines.append(f'      ! {flag}')
+                    lines.append('')
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        lines.append(f'{warnings} warning(s)')
+        report = '\n'.join(lines) + '\n'
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                fh.write(report)
+            self.stdout.write(self.style.SUCCESS(f'Report written to {options["output"]}'))
+        else:
+            self.stdout.write(report)
+
+        if options['fail_on_warnings'] and warnings:
+            raise CommandError(f'{warnings} full scan / temp sort / missing index warning(s)')
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from events import archive
+from events.models import ArchivedEvent
+
+
+class Command(BaseCommand):
+    help = 'Move an archived event, its RSVPs and participant links back into the live tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_id', type=int)
+
+    def handle(self, *args, **options):
+        try:
+            event = archive.restore_event(options['event_id'])
+        except ArchivedEvent.DoesNotExist:
+            raise CommandError(f'No archived event with id {options["event_id"]}')
+        self.stdout.write(self.style.SUCCESS(f'Restored event {event.pk}: {event.name}'))
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.4 on 2026-10-19 06:15
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0008_event_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(django.db.models.functions.text.Lower('name'), condition=models.Q(('deleted_at__isnull', True)), name='category_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(django.db.models.functions.text.Lower('name'), condition=models.Q(('deleted_at__isnull', True)), name='event_name_lower_idx'),
+        ),
+    ]
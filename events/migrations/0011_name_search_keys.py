@@ -0,0 +1,42 @@
+# Generated by Django 5.2.4 on 2026-10-19 06:47
+
+import events.models
+from django.db import migrations
+
+
+def fill_name_keys(apps, schema_editor):
+    for label in ('Category', 'Event'):
+        model = apps.get_model('events', label)
+        rows = list(model.objects.only('pk', 'name'))
+        for row in rows:
+            row.name_key = events.models.search_key(row.name)[:model._meta.get_field('name_key').max_length]
+        model.objects.bulk_update(rows, ['name_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_category_name_live_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='category',
+            name='category_name_lower_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='event',
+            name='event_name_lower_idx',
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='name_key',
+            field=events.models.SearchKeyField(db_index=True, default='', editable=False, max_length=100, source='name'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='name_key',
+            field=events.models.SearchKeyField(db_index=True, default='', editable=False, max_length=200, source='name'),
+        ),
+        migrations.RunPython(fill_name_keys, migrations.RunPython.noop),
+    ]
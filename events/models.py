@@ -1,19 +1,67 @@
 from django.conf import settings
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
+from core.models import ChangeLoggedModel, ChangeLogManager, LiveManager
 
-class Category(models.Model):
-    name = models.CharField(max_length=100, unique=True)
+
+def search_key(text):
+    """Case-folded text, for comparing names the way people type them."""
+    return text.casefold()
+
+
+class SearchKeyField(models.CharField):
+    """
+    search_key() of the source field, set on save() and bulk_create() like an
+    auto_now field. Folded in Python, as the databases' LOWER() and UPPER()
+    handle ASCII only (SQLite) or depend on the collation. A queryset
+    update() of the source field has to set it as well.
+    """
+
+    defaults = {'editable': False, 'db_index': True, 'default': ''}
+
+    def __init__(self, source=None, *args, **kwargs):
+        self.source = source
+        super().__init__(*args, **{**self.defaults, **kwargs})
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source'] = self.source
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = search_key(getattr(model_instance, self.source))[:self.max_length]
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+class Category(ChangeLoggedModel):
+    name = models.CharField(max_length=100)
+    # prefix search in events.autocomplete
+    name_key = SearchKeyField('name', max_length=100)
     description = models.TextField(blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        constraints = [
+            # a soft-deleted category's name can be used again
+            models.UniqueConstraint(fields=['name'], condition=Q(deleted_at__isnull=True),
+                                    name='category_name_live_unique'),
+        ]
 
     def __str__(self):
         return self.name
 
 
-class Event(models.Model):
+class Event(ChangeLoggedModel):
     name = models.CharField(max_length=200)
+    # prefix search in events.autocomplete
+    name_key = SearchKeyField('name', max_length=200)
     description = models.TextField()
     image = models.ImageField(upload_to='event_images/', default='event_images/default.jpg')
     date = models.DateField()
@@ -21,6 +69,17 @@ class Event(models.Model):
     location = models.CharField(max_length=200)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='events')
     rsvps = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='rsvp_events', blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # version of the rendered card (events.fragments); also touched when its category or participants change
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', 'time'], name='event_date_time_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -51,7 +110,7 @@ class Event(models.Model):
         return confirmed_rsvp.user if confirmed_rsvp else None
 
 
-class RSVP(models.Model):
+class RSVP(ChangeLoggedModel):
     STATUS_CHOICES = [
         ('confirmed', 'Confirmed'),
         ('cancelled', 'Cancelled'),
@@ -64,10 +123,16 @@ class RSVP(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     notes = models.TextField(blank=True, help_text="Optional notes from the participant")
+
+    objects = ChangeLogManager()
     
     class Meta:
         unique_together = ('user', 'event') 
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='rsvp_created_at_idx'),
+            models.Index(fields=['event', 'status'], name='rsvp_event_status_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.event.name} ({self.status})"
@@ -92,10 +157,77 @@ class RSVP(models.Model):
         super().save(*args, **kwargs)
 
 
-class Participant(models.Model):
+class Participant(ChangeLoggedModel):
     name = models.CharField(max_length=100)
-    email = models.EmailField()
+    email = models.EmailField(db_index=True)
     events = models.ManyToManyField(Event, related_name='participants')
 
+    objects = ChangeLogManager()
+
     def __str__(self):
         return self.name
+
+
+class ArchivedEvent(models.Model):
+    """An Event moved out of the hot table by archive_events; keeps its original id."""
+    is_archived = True
+
+    id = models.IntegerField(primary_key=True)
+    name = models.CharField(max_length=200)
+    description = models.TextField()
+    image = models.ImageField(upload_to='event_images/', default='event_images/default.jpg')
+    date = models.DateField(db_index=True)
+    time = models.TimeField()
+    location = models.CharField(max_length=200)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='archived_events')
+    rsvps = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='archived_rsvp_events', blank=True)
+    participants = models.ManyToManyField(Participant, related_name='archived_events', blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-date', 'time']
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def is_past(self):
+        return timezone.now() > timezone.make_aware(timezone.datetime.combine(self.date, self.time))
+
+    @property
+    def event_rsvps(self):
+        return ArchivedRSVP.objects.filter(event_id=self.id)
+
+    @property
+    def rsvp_count(self):
+        return self.event_rsvps.filter(status='confirmed').count()
+
+    @property
+    def has_confirmed_rsvp(self):
+        return self.event_rsvps.filter(status='confirmed').exists()
+
+    @property
+    def confirmed_rsvp_user(self):
+        confirmed_rsvp = self.event_rsvps.filter(status='confirmed').select_related('user').first()
+        return confirmed_rsvp.user if confirmed_rsvp else None
+
+
+class ArchivedRSVP(models.Model):
+    """
+    An archived RSVP. event_id is a plain column because the event may be
+    archived with it or, for old cancelled RSVPs, still live.
+    """
+    id = models.IntegerField(primary_key=True)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='archived_rsvps')
+    event_id = models.IntegerField(db_index=True)
+    status = models.CharField(max_length=20, choices=RSVP.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    notes = models.TextField(blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.user_id} - event {self.event_id} ({self.status})"
@@ -0,0 +1,198 @@
+"""
+Full-page cache for anonymous visitors of the public pages.
+
+Entries are versioned by the invalidation generations (core.invalidation)
+of what a page shows: every page depends on ALL, listings on LISTS and an
+event's detail page on event_namespace(pk). A committed write bumps those
+namespaces, and the next request in any worker re-renders the page. This
+goes through core.swr, so only one request renders it while the rest get
+the previous copy, and copies keep being served in degraded mode when the
+database fails or is slow.
+
+Only the whitelisted query parameters are part of the key, and the page is
+rendered from that normalized QueryDict so what is stored matches the key.
+Misses render from the primary so a lagging replica cannot be cached under
+a fresh generation. Async views (events.async_views) share the cache
+through core.swr.afetch.
+"""
+import hashlib
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.db.models.signals import post_delete
+from django.http import HttpResponse, QueryDict
+
+from core import invalidation, routers, swr
+from .models import RSVP, Category, Event, Participant
+
+ALL = 'pages'
+LISTS = 'pages:lists'
+HEADER = 'X-Page-Cache'
+
+
+def event_namespace(pk):
+    return f'pages:event:{pk}'
+
+
+def cacheable(request):
+    if not settings.PAGE_CACHE_ENABLED or request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # a flash message belongs to this visitor only
+    return not len(get_messages(request))
+
+
+async def acacheable(request):
+    if not settings.PAGE_CACHE_ENABLED or request.method not in ('GET', 'HEAD'):
+        return False
+    # auser() loads the session, so reading the messages below does not query
+    if (await request.auser()).is_authenticated:
+        return False
+    return not len(get_messages(request))
+
+
+def normalize(query, params):
+    normalized = QueryDict(mutable=True)
+    for name in params:
+        value = query.get(name, '').strip()
+        if value:
+            normalized[name] = value
+    normalized._mutable = False
+    return normalized
+
+
+def make_key(request, query):
+    digest = hashlib.md5(f'{request.path}?{query.urlencode()}'.encode()).hexdigest()
+    return f'page:{digest}'
+
+
+def make_version(namespaces):
+    """Day plus the generations the page depends on; None if they cannot be read."""
+    generations = [invalidation.generation(namespace) for namespace in (ALL, *namespaces)]
+    if None in generations:
+        return None
+    return f'{date.today().isoformat()}:{".".join(map(str, generations))}'
+
+
+class AnonymousPageCacheMixin:
+    """View mixin for sync and async views; set page_cache_params and override page_cache_namespaces()."""
+    page_cache_params = ()
+
+    def page_cache_namespaces(self):
+        return [LISTS]
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.view_is_async:
+            return self.adispatch(request, *args, **kwargs)
+        if not cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+        query = normalize(request.GET, self.page_cache_params)
+        version = make_version(self.page_cache_namespaces())
+        if version is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        rendered = None
+
+        def render():
+            nonlocal rendered
+            request.GET = query
+            with routers.use_replica(False):
+                rendered = super(AnonymousPageCacheMixin, self).dispatch(request, *args, **kwargs)
+                if hasattr(rendered, 'render'):
+                    rendered.render()
+            return storable(rendered, request)
+
+        # a changed page is re-rendered by one request while the others get the previous copy
+        entry = swr.fetch('pages', make_key(request, query), render, version=version,
+                          alias=settings.PAGE_CACHE_ALIAS)
+        return respond(entry, rendered)
+
+    async def adispatch(self, request, *args, **kwargs):
+        if not await acacheable(request):
+            return await super().dispatch(request, *args, **kwargs)
+        query = normalize(request.GET, self.page_cache_params)
+        version = make_version(self.page_cache_namespaces())
+        if version is None:
+            return await super().dispatch(request, *args, **kwargs)
+
+        rendered = None
+
+        async def render():
+            nonlocal rendered
+            request.GET = query
+            with routers.use_replica(False):
+                rendered = await super(AnonymousPageCacheMixin, self).dispatch(request, *args, **kwargs)
+                if hasattr(rendered, 'render'):
+                    # templates may still query (lazy relations, tags), as Django's own handler does
+                    await sync_to_async(rendered.render)()
+            return storable(rendered, request)
+
+        entry = await swr.afetch('pages', make_key(request, query), render, version=version,
+                                 alias=settings.PAGE_CACHE_ALIAS)
+        return respond(entry, rendered)
+
+
+def storable(rendered, request):
+    """(content, content type) of a rendered page, or None if it must not be shared."""
+    # a page that issued a CSRF token or set a cookie is per-visitor
+    if (rendered.status_code == 200 and not rendered.streaming and not rendered.cookies
+            and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')):
+        return rendered.content, rendered['Content-Type']
+    return None
+
+
+def respond(entry, rendered):
+    """The page this request rendered, or the cached copy it was served."""
+    if rendered is not None:
+        if entry is not None:
+            rendered[HEADER] = 'miss'
+        return rendered
+    content, content_type = entry
+    response = HttpResponse(content, content_type=content_type)
+    response[HEADER] = 'hit'
+    return response
+
+
+def _event_pages(event_ids):
+    return [LISTS, *map(event_namespace, event_ids)]
+
+
+def _event_changed(object_ids, action, using):
+    return _event_pages(object_ids)
+
+
+def _category_changed(object_ids, action, using):
+    # names show on every listing and detail page
+    return [ALL]
+
+
+def _participant_changed(object_ids, action, using):
+    if action == 'delete':
+        # the event links are already gone
+        return [ALL]
+    event_ids = Participant.events.through.objects.using(using).filter(
+        participant_id__in=object_ids).values_list('event_id', flat=True)
+    return _event_pages(set(event_ids))
+
+
+def _rsvp_changed(object_ids, action, using):
+    if action == 'delete':
+        return []  # _rsvp_deleted still has the instance
+    event_ids = RSVP._base_manager.using(using).filter(pk__in=object_ids).values_list('event_id', flat=True)
+    return _event_pages(set(event_ids))
+
+
+def _rsvp_deleted(sender, instance, using, **kwargs):
+    invalidation.bump_on_commit(*_event_pages([instance.event_id]), using=using)
+
+
+def connect():
+    """Called from EventsConfig.ready()."""
+    invalidation.watch_objects(Event, _event_changed)
+    invalidation.watch_objects(Category, _category_changed)
+    invalidation.watch_objects(Participant, _participant_changed)
+    invalidation.watch_objects(RSVP, _rsvp_changed)
+    post_delete.connect(_rsvp_deleted, sender=RSVP, dispatch_uid='pagecache-rsvp-delete')
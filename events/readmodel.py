@@ -0,0 +1,203 @@
+"""
+Per-worker in-memory read model of upcoming events (date >= today).
+
+Events are kept in start order as parallel arrays of start keys and ids,
+with a per-category copy of the same arrays, so listings, category filters
+and date ranges are bisects and slices. The model is loaded once per
+process and then follows the change log: right after any worker commits
+a change (the 'events' invalidation namespace) and at least every
+READMODEL_POLL_INTERVAL seconds it reads new entries (core.changelog.Tail,
+which also catches entries that committed late) and reloads only the
+events they touch. Any failure falls back
+to the ORM, which is also what upcoming() uses when READMODEL_ENABLED is off.
+
+The Event instances handed out are shared between requests; treat them as
+read-only.
+"""
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, time as dtime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Q
+
+from core import changelog, invalidation
+from .models import Category, Event, Participant
+
+logger = logging.getLogger(__name__)
+
+WATCHED_MODELS = ('events.Event', 'events.Category', 'events.Participant')
+
+
+def start_key(day, at=None):
+    """Sortable integer for a date and time (seconds since 0001-01-01)."""
+    at = at or dtime.min
+    return day.toordinal() * 86400 + at.hour * 3600 + at.minute * 60 + at.second
+
+
+def _queryset():
+    return Event.objects.using(DEFAULT_DB_ALIAS).select_related('category').prefetch_related('participants')
+
+
+class Snapshot:
+    """Immutable sorted view over a dict of events; rebuilt on every change."""
+
+    def __init__(self, events, today, seq):
+        self.events = events
+        self.today = today
+        self.seq = seq
+        ordered = sorted(events.values(), key=lambda e: (start_key(e.date, e.time), e.pk))
+        self.keys = array('q', (start_key(e.date, e.time) for e in ordered))
+        self.ids = array('q', (e.pk for e in ordered))
+        self.by_category = {}
+        for event in ordered:
+            keys, ids = self.by_category.setdefault(event.category_id, (array('q'), array('q')))
+            keys.append(start_key(event.date, event.time))
+            ids.append(event.pk)
+
+    def select(self, start=None, end=None, category_id=None):
+        keys, ids = self.by_category.get(category_id, (array('q'), array('q'))) if category_id else (self.keys, self.ids)
+        lo = bisect_left(keys, start_key(start)) if start else 0
+        hi = bisect_right(keys, start_key(end, dtime.max)) if end else len(keys)
+        return [self.events[pk] for pk in ids[lo:hi]]
+
+
+class UpcomingEvents:
+    def __init__(self):
+        self.snapshot = None
+        self.tail = changelog.Tail(WATCHED_MODELS)
+        self._lock = threading.Lock()
+        self._last_poll = 0.0
+        self._dirty = False
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def rebuild(self):
+        today = date.today()
+        # the head first: entries committed after it are re-applied, which is harmless
+        seq = self.tail.start()
+        events = {event.pk: event for event in _queryset().filter(date__gte=today)}
+        self.snapshot = Snapshot(events, today, seq)
+        self._last_poll = time.monotonic()
+        logger.info('Upcoming events read model built', extra={'events': len(events), 'seq': seq})
+        return self.snapshot
+
+    def _affected_events(self, entries, snapshot):
+        ids = {'events.Event': set(), 'events.Category': set(), 'events.Participant': set()}
+        for entry in entries:
+            ids[entry.model].add(int(entry.object_id))
+        event_ids = set(ids['events.Event'])
+        if ids['events.Category']:
+            event_ids |= {e.pk for e in snapshot.events.values() if e.category_id in ids['events.Category']}
+        if ids['events.Participant']:
+            event_ids |= set(Participant.events.through.objects.using(DEFAULT_DB_ALIAS).filter(
+                participant_id__in=ids['events.Participant']).values_list('event_id', flat=True))
+        return event_ids
+
+    def refresh(self):
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.today != date.today():
+            return self.rebuild()
+        entries = self.tail.poll(settings.READMODEL_MAX_INCREMENT)
+        self._last_poll = time.monotonic()
+        if not entries:
+            return snapshot
+        if len(entries) == settings.READMODEL_MAX_INCREMENT:
+            return self.rebuild()
+
+        event_ids = self._affected_events(entries, snapshot)
+        events = dict(snapshot.events)
+        for pk in event_ids:
+            events.pop(pk, None)
+        events.update({e.pk: e for e in _queryset().filter(pk__in=event_ids, date__gte=snapshot.today)})
+        self.snapshot = Snapshot(events, snapshot.today, self.tail.position)
+        return self.snapshot
+
+    def fresh(self):
+        """Whether current() can answer from memory without touching the database."""
+        stale = self._dirty or time.monotonic() - self._last_poll >= settings.READMODEL_POLL_INTERVAL
+        return self.snapshot is not None and not stale
+
+    def current(self):
+        """Up-to-date snapshot; other threads keep reading the old one while one refreshes."""
+        if self.fresh():
+            return self.snapshot
+        if not self._lock.acquire(blocking=self.snapshot is None):
+            return self.snapshot
+        try:
+            self._dirty = False
+            return self.refresh()
+        finally:
+            self._lock.release()
+
+
+model = UpcomingEvents()
+
+
+def _orm(start=None, end=None, category_id=None, search=None):
+    queryset = _queryset().filter(date__gte=max(start or date.today(), date.today()))
+    if end:
+        queryset = queryset.filter(date__lte=end)
+    if category_id:
+        queryset = queryset.filter(category_id=category_id)
+    if search:
+        queryset = queryset.filter(
+            Q(name__icontains=search) | Q(description__icontains=search) | Q(location__icontains=search))
+    return list(queryset.order_by('date', 'time', 'pk'))
+
+
+def _matches(event, search):
+    search = search.lower()
+    return search in event.name.lower() or search in event.description.lower() or search in event.location.lower()
+
+
+def upcoming(start=None, end=None, category_id=None, search=None, limit=None):
+    """
+    Upcoming events (date >= today, start clamped to today) in start order,
+    optionally within [start, end], in one category and matching search.
+    """
+    if settings.READMODEL_ENABLED:
+        try:
+            snapshot = model.current()
+            events = snapshot.select(max(start or snapshot.today, snapshot.today), end,
+                                     int(category_id) if category_id else None)
+            if search:
+                events = [event for event in events if _matches(event, search)]
+            return events[:limit] if limit else events
+        except Exception:
+            logger.exception('Read model query failed, falling back to the ORM')
+    events = _orm(start, end, category_id, search)
+    return events[:limit] if limit else events
+
+
+async def aupcoming(start=None, end=None, category_id=None, search=None, limit=None):
+    """upcoming() for async views: straight from memory, in a thread when it has to query."""
+    if settings.READMODEL_ENABLED and model.fresh():
+        return upcoming(start, end, category_id, search, limit)
+    return await sync_to_async(upcoming)(start, end, category_id, search, limit)
+
+
+def count(start=None, end=None, category_id=None):
+    return len(upcoming(start, end, category_id))
+
+
+def connect():
+    """Called from EventsConfig.ready(): commits in any worker refresh on the next read."""
+    invalidation.watch('events', Event, Category, Participant)
+    invalidation.subscribe('events', model.mark_dirty)
+
+
+def warm():
+    """Build the model at startup (wsgi/asgi); failures leave it to build on first use."""
+    if not settings.READMODEL_ENABLED:
+        return
+    try:
+        model.rebuild()
+    except Exception:
+        logger.warning('Could not build the upcoming events read model at startup', exc_info=True)
@@ -1,12 +1,42 @@
-from django.db.models.signals import post_save, m2m_changed
+import logging
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_save, pre_save, m2m_changed
 from django.dispatch import receiver
 from django.core.mail import send_mail
 from django.contrib.auth.tokens import default_token_generator
 from django.conf import settings
 
+from core import metrics
 from users.models import CustomUser
 from .models import Event, RSVP
 
+logger = logging.getLogger(__name__)
+
+
+def _send_rsvp_mail(subject, message, email, log_message, log_args=()):
+    try:
+        send_mail(
+            subject=subject,
+            message=message,
+            from_email=settings.EMAIL_HOST_USER,
+            recipient_list=[email],
+            fail_silently=False,
+        )
+        logger.info(log_message, *log_args, extra={'email': email})
+    except Exception:
+        logger.exception('Failed to send RSVP email', extra={'email': email})
+
+
+def send_rsvp_mail_on_commit(subject, message, email, log_message, *log_args):
+    """
+    Send once the RSVP write commits: nothing goes out for a rolled back
+    write, lock retries do not send twice and no SMTP round trip happens
+    while the database write lock is held.
+    """
+    transaction.on_commit(partial(_send_rsvp_mail, subject, message, email, log_message, log_args))
+
 
 @receiver(post_save, sender=CustomUser)
 def send_activation_email(sender, instance, created, **kwargs):
@@ -39,10 +69,25 @@ Shan Event Management Team"""
                 fail_silently=False,
             )
 
-            print(f'Activation email sent successfully to {instance.email}')
+            logger.info('Activation email sent', extra={'email': instance.email})
+
+        except Exception:
+            logger.exception('Failed to send activation email', extra={'email': instance.email})
+
 
-        except Exception as e:
-            print(f'Failed to send activation email to {instance.email}: {str(e)}')
+@receiver(pre_save, sender=RSVP)
+def remember_rsvp_status(sender, instance, **kwargs):
+    """Status stored before this save, so record_rsvp_metrics only counts real transitions"""
+    instance._previous_status = None
+    if not instance._state.adding:
+        instance._previous_status = RSVP.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=RSVP)
+def record_rsvp_metrics(sender, instance, created, **kwargs):
+    """Count RSVP confirm/cancel transitions"""
+    if created or instance._previous_status != instance.status:
+        metrics.RSVP_TRANSITIONS.inc(status=instance.status)
 
 
 @receiver(post_save, sender=RSVP)
@@ -95,18 +140,10 @@ Shan Event Management Team"""
             else:
                 return
 
-            send_mail(
-                subject=subject,
-                message=message,
-                from_email=settings.EMAIL_HOST_USER,
-                recipient_list=[user.email],
-                fail_silently=False,
-            )
+            send_rsvp_mail_on_commit(subject, message, user.email, 'RSVP %s email sent', instance.status)
 
-            print(f'RSVP {instance.status} email sent to {user.email}')
-
-        except Exception as e:
-            print(f'Failed to send RSVP email: {str(e)}')
+        except Exception:
+            logger.exception('Failed to send RSVP email', extra={'rsvp_id': instance.pk})
 
 
 @receiver(m2m_changed, sender=Event.rsvps.through)
@@ -133,15 +170,7 @@ Thank you for your interest!
 
 Shan Event Management Team"""
 
-                send_mail(
-                    subject=subject,
-                    message=message,
-                    from_email=settings.EMAIL_HOST_USER,
-                    recipient_list=[user.email],
-                    fail_silently=False,
-                )
-
-                print(f'Legacy RSVP confirmation email sent to {user.email}')
+                send_rsvp_mail_on_commit(subject, message, user.email, 'Legacy RSVP confirmation email sent')
 
-        except Exception as e:
-            print(f'Failed to send legacy RSVP confirmation email: {str(e)}')
+        except Exception:
+            logger.exception('Failed to send legacy RSVP confirmation email', extra={'event_id': instance.pk})
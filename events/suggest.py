@@ -0,0 +1,345 @@
+"""
+Per-worker trigram index for typo-tolerant search suggestions on the events
+page (SuggestView, /search/suggest/?q=).
+
+Terms are event names, event locations and category names. The same text
+used by several events is indexed once and reference counted. Each term is
+split into trigrams, the same way pg_trgm does it: lower-cased words padded
+with two spaces in front and one behind. Postings map each trigram to the
+term ids containing it, as compact array('I') lists.
+
+A query is split the same way, except that its last word gets no trailing
+pad, so a half-typed word still matches as a prefix. Each term sharing
+trigrams with the query is scored on two things:
+
+- the share of the query's trigrams it contains, which tolerates a typo or
+  two;
+- the Jaccard similarity of the two trigram sets, which prefers terms
+  about as long as the query.
+
+The top SUGGEST_LIMIT terms scoring at least SUGGEST_MIN_SCORE are returned.
+
+The index is built from a snapshot at startup (warm(), from wsgi/asgi).
+After that it follows the change log like events.readmodel. When an event
+or category write commits (the 'suggest' invalidation namespace), and at
+least every SUGGEST_POLL_INTERVAL seconds, it reindexes only the rows the
+new entries touch. Its estimated size stays within SUGGEST_MAX_BYTES.
+Upcoming events are indexed first, so once the budget is spent the oldest
+events are left out.
+"""
+import heapq
+import logging
+import re
+import threading
+import time
+from array import array
+from collections import Counter
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.urls import reverse
+
+from core import changelog, invalidation, metrics
+from core.db import stream
+from .models import Category, Event
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = 'suggest'
+WATCHED_MODELS = ('events.Event', 'events.Category')
+KINDS = ('event', 'location', 'category')
+
+# rough CPython costs behind Index.nbytes: a term (string, list slots, refcount,
+# size, lookup key) and a trigram (dict entry, key string, array header)
+TERM_OVERHEAD = 200
+TRIGRAM_OVERHEAD = 150
+
+WORD = re.compile(r'\w+')
+
+
+def words(text):
+    return WORD.findall(text.lower())
+
+
+def trigrams(text, prefix=False):
+    """pg_trgm-style trigrams of text; with prefix, the last word is left open at the end."""
+    grams = set()
+    found = words(text)
+    for position, word in enumerate(found):
+        padded = f'  {word}' if prefix and position == len(found) - 1 else f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+class Index:
+    """Trigram postings over reference-counted terms; not thread-safe on its own."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.full = False
+        # per term id; None / 0 marks a free slot
+        self.texts = []
+        self.kinds = bytearray()
+        self.sizes = array('H')
+        self.refs = array('I')
+        # event terms: term id -> event ids, to link a name used by one event
+        self.events = {}
+        # category terms: term id -> category id
+        self.categories = {}
+        self.free = []
+        self.lookup = {}
+        self.postings = {}
+        # ('event' | 'category', pk) -> term ids it contributed
+        self.owners = {}
+
+    def __len__(self):
+        return len(self.texts) - len(self.free)
+
+    def _add_term(self, kind, text):
+        """Id of the term, created if needed; None when it does not fit the budget."""
+        key = (kind, ' '.join(words(text)))
+        if not key[1]:
+            return None
+        tid = self.lookup.get(key)
+        if tid is not None:
+            self.refs[tid] += 1
+            return tid
+        grams = trigrams(text)
+        cost = TERM_OVERHEAD + len(text) + len(grams) * array('I').itemsize
+        cost += sum(TRIGRAM_OVERHEAD for gram in grams if gram not in self.postings)
+        if self.nbytes + cost > self.max_bytes:
+            self.full = True
+            return None
+        self.nbytes += cost
+        if self.free:
+            tid = self.free.pop()
+            self.texts[tid], self.kinds[tid], self.sizes[tid], self.refs[tid] = text, KINDS.index(kind), len(grams), 1
+        else:
+            tid = len(self.texts)
+            self.texts.append(text)
+            self.kinds.append(KINDS.index(kind))
+            self.sizes.append(len(grams))
+            self.refs.append(1)
+        self.lookup[key] = tid
+        for gram in grams:
+            self.postings.setdefault(gram, array('I')).append(tid)
+        return tid
+
+    def _release_term(self, tid):
+        self.refs[tid] -= 1
+        if self.refs[tid]:
+            return
+        text = self.texts[tid]
+        grams = trigrams(text)
+        for gram in grams:
+            posting = self.postings[gram]
+            posting.remove(tid)
+            if not posting:
+                del self.postings[gram]
+                self.nbytes -= TRIGRAM_OVERHEAD
+        self.nbytes -= TERM_OVERHEAD + len(text) + len(grams) * array('I').itemsize
+        del self.lookup[(KINDS[self.kinds[tid]], ' '.join(words(text)))]
+        self.events.pop(tid, None)
+        self.categories.pop(tid, None)
+        self.texts[tid] = None
+        self.free.append(tid)
+        self.full = False
+
+    def remove(self, owner):
+        for tid in self.owners.pop(owner, ()):
+            if owner[0] == 'event' and tid in self.events:
+                self.events[tid].discard(owner[1])
+            self._release_term(tid)
+
+    def add_event(self, event):
+        owner = ('event', event.pk)
+        self.remove(owner)
+        tids = []
+        for kind, text in (('event', event.name), ('location', event.location)):
+            tid = self._add_term(kind, text)
+            if tid is not None:
+                tids.append(tid)
+                if kind == 'event':
+                    self.events.setdefault(tid, set()).add(event.pk)
+        if tids:
+            self.owners[owner] = tuple(tids)
+
+    def add_category(self, category):
+        owner = ('category', category.pk)
+        self.remove(owner)
+        tid = self._add_term('category', category.name)
+        if tid is not None:
+            self.categories[tid] = category.pk
+            self.owners[owner] = (tid,)
+
+    def search(self, query, limit, min_score):
+        """[(score, term id)] best first."""
+        grams = trigrams(query, prefix=True)
+        if not grams:
+            return []
+        shared = Counter()
+        for gram in grams:
+            posting = self.postings.get(gram)
+            if posting is not None:
+                shared.update(posting)
+        scored = []
+        for tid, count in shared.items():
+            coverage = count / len(grams)
+            jaccard = count / (len(grams) + self.sizes[tid] - count)
+            score = 0.7 * coverage + 0.3 * jaccard
+            if score >= min_score:
+                scored.append((score, tid))
+        return heapq.nlargest(limit, scored, key=lambda item: (item[0], -len(self.texts[item[1]])))
+
+    def suggestion(self, tid, score):
+        kind = KINDS[self.kinds[tid]]
+        suggestion = {'text': self.texts[tid], 'kind': kind, 'score': round(score, 3)}
+        if kind == 'event' and len(self.events.get(tid, ())) == 1:
+            suggestion['url'] = reverse('event-detail', args=[next(iter(self.events[tid]))])
+        elif kind == 'category':
+            suggestion['category'] = self.categories[tid]
+        return suggestion
+
+
+def _events():
+    return Event.objects.using(DEFAULT_DB_ALIAS).only('pk', 'name', 'location', 'date')
+
+
+def _categories():
+    return Category.objects.using(DEFAULT_DB_ALIAS).only('pk', 'name')
+
+
+class Suggestions:
+    """The worker's Index, kept current from the change log."""
+
+    def __init__(self):
+        self.index = None
+        self.tail = changelog.Tail(WATCHED_MODELS)
+        self._lock = threading.Lock()
+        self._last_poll = 0.0
+        self._dirty = False
+
+    def mark_dirty(self):
+        self._dirty = True
+
+    def build(self):
+        """A new index from a snapshot of the database; swapped in whole."""
+        # the head first: entries committed after it are re-applied, which is harmless
+        seq = self.tail.start()
+        index = Index(settings.SUGGEST_MAX_BYTES)
+        for category in _categories().order_by('name'):
+            index.add_category(category)
+        # upcoming first, then the most recent past events, while the budget lasts
+        today = date.today()
+        for queryset in (_events().filter(date__gte=today).order_by('date', 'pk'),
+                         _events().filter(date__lt=today).order_by('-date', '-pk')):
+            for event in stream(queryset):
+                if index.full:
+                    break
+                index.add_event(event)
+        self.index = index
+        self._last_poll = time.monotonic()
+        log = logger.warning if index.full else logger.info
+        log('Suggestion index built', extra={'terms': len(index), 'trigrams': len(index.postings),
+                                              'bytes': index.nbytes, 'full': index.full, 'seq': seq})
+        return index
+
+    def refresh(self):
+        entries = self.tail.poll(settings.SUGGEST_MAX_INCREMENT)
+        self._last_poll = time.monotonic()
+        if not entries:
+            return
+        # a backlog this long is cheaper to rebuild than to apply
+        if len(entries) == settings.SUGGEST_MAX_INCREMENT:
+            self.build()
+            return
+        index = self.index
+        ids = {label: {int(entry.object_id) for entry in entries if entry.model == label} for label in WATCHED_MODELS}
+        events = {event.pk: event for event in _events().filter(pk__in=ids['events.Event'])}
+        categories = {category.pk: category for category in _categories().filter(pk__in=ids['events.Category'])}
+        # removed and soft-deleted rows are no longer returned by the live managers
+        for pk in ids['events.Event']:
+            index.remove(('event', pk))
+        for pk in ids['events.Category']:
+            index.remove(('category', pk))
+        for category in categories.values():
+            index.add_category(category)
+        for event in events.values():
+            index.add_event(event)
+
+    def fresh(self):
+        """Whether search() can answer from memory without touching the database."""
+        stale = self._dirty or time.monotonic() - self._last_poll >= settings.SUGGEST_POLL_INTERVAL
+        return self.index is not None and not stale
+
+    def _lookup(self, query):
+        index = self.index
+        return [index.suggestion(tid, score)
+                for score, tid in index.search(query, settings.SUGGEST_LIMIT, settings.SUGGEST_MIN_SCORE)]
+
+    def search(self, query):
+        with self._lock:
+            if self.index is None:
+                self.build()
+            elif not self.fresh():
+                self._dirty = False
+                self.refresh()
+            return self._lookup(query)
+
+    def search_in_memory(self, query):
+        """search() that neither queries nor waits; None when the index is due a refresh or busy."""
+        if not self.fresh() or not self._lock.acquire(blocking=False):
+            return None
+        try:
+            return self._lookup(query)
+        finally:
+            self._lock.release()
+
+    def stats(self):
+        index = self.index
+        if index is None:
+            return {}
+        return {(('measure', 'terms'),): len(index), (('measure', 'trigrams'),): len(index.postings),
+                (('measure', 'bytes'),): index.nbytes}
+
+
+suggestions = Suggestions()
+
+metrics.Gauge('suggest_index', "Size of this worker's search suggestion index.", suggestions.stats)
+
+
+def suggest(query):
+    """Up to SUGGEST_LIMIT {'text', 'kind', 'score', ('url' | 'category')} for a partly typed query."""
+    if not settings.SUGGEST_ENABLED or not query.strip():
+        return []
+    return suggestions.search(query[:200])
+
+
+async def asuggest(query):
+    """suggest() for async views: from memory on the event loop, in a thread when it has to query."""
+    if not settings.SUGGEST_ENABLED or not query.strip():
+        return []
+    results = suggestions.search_in_memory(query[:200])
+    if results is None:
+        results = await sync_to_async(suggestions.search)(query[:200])
+    return results
+
+
+def connect():
+    """Called from EventsConfig.ready()."""
+    invalidation.watch(NAMESPACE, Event, Category)
+    invalidation.subscribe(NAMESPACE, suggestions.mark_dirty)
+
+
+def warm():
+    """Build the index at startup (wsgi/asgi); failures leave it to build on first use."""
+    if not settings.SUGGEST_ENABLED:
+        return
+    try:
+        with suggestions._lock:
+            suggestions.build()
+    except Exception:
+        logger.warning('Could not build the suggestion index at startup', exc_info=True)
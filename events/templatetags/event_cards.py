@@ -0,0 +1,14 @@
+from django import template
+
+from events.fragments import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def event_cards(events, variant):
+    """
+    Cached event cards, one cache round trip per listing.
+    Usage: {% event_cards upcoming_events 'upcoming' %}
+    """
+    return render_cards(events, variant)
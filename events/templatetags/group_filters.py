@@ -1,5 +1,7 @@
 from django import template
 
+from users.roles import has_role
+
 register = template.Library()
 
 
@@ -8,7 +10,7 @@ def has_group(user, group_name):
     Returns True if the user is in the given group, else False.
     Usage: {% if user|has_group:"Admin" %}
     """
-    return user.groups.filter(name=group_name).exists()
+    return has_role(user, group_name)
 
 
 register.filter('has_group', has_group)
@@ -0,0 +1,649 @@
+import os
+import tempfile
+from datetime import date, time, timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, Group
+from django.core import mail
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import OperationalError
+from django.http import Http404
+from django.test import AsyncRequestFactory, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from core import invalidation, metrics
+from core.db import retry_on_lock
+from core.models import ChangeLogEntry
+from users.models import CustomUser
+from . import archive, async_views, autocomplete, checks, fragments, live, pagecache, readmodel, suggest
+from .forms import CategoryForm
+from .views import LiveStreamView
+from .models import RSVP, ArchivedEvent, ArchivedRSVP, Category, Event, Participant
+
+
+# Pages render {% static %} without a collectstatic manifest; production keeps manifest storage
+PLAIN_STATIC = {**settings.STORAGES,
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'}}
+
+
+def make_user(username, *roles, **fields):
+    user = CustomUser.objects.create_user(username, f'{username}@example.com', 'pass-1234', **fields)
+    for role in roles:
+        user.groups.add(Group.objects.get_or_create(name=role)[0])
+    return user
+
+
+def make_event(name='Event', days=1, category=None, **fields):
+    if category is None:
+        category = Category.objects.get_or_create(name='General')[0]
+    return Event.objects.create(name=name, description='Description', date=date.today() + timedelta(days=days),
+                                time=fields.pop('time', time(10)), location=fields.pop('location', 'Main Hall'),
+                                category=category, **fields)
+
+
+class RSVPViewTests(TestCase):
+
+    def setUp(self):
+        self.user = make_user('guest', 'Participant')
+        self.event = make_event()
+        self.client.force_login(self.user)
+
+    def test_toggle_sends_mail_on_commit(self):
+        url = f'/events/{self.event.pk}/rsvp/'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(url)
+        self.assertEqual(RSVP.objects.get(user=self.user, event=self.event).status, 'confirmed')
+        self.assertTrue(self.event.rsvps.filter(pk=self.user.pk).exists())
+        self.assertEqual(mail.outbox, [])
+        for callback in callbacks:
+            callback()
+        self.assertEqual(len(mail.outbox), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url)
+        self.assertEqual(RSVP.objects.get(user=self.user, event=self.event).status, 'cancelled')
+        self.assertFalse(self.event.rsvps.filter(pk=self.user.pk).exists())
+        # cancelling sends nothing
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_second_confirmed_rsvp_is_refused(self):
+        RSVP.objects.create(user=make_user('other'), event=self.event)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/events/{self.event.pk}/rsvp/')
+        self.assertFalse(RSVP.objects.filter(user=self.user).exists())
+        self.assertEqual(mail.outbox, [])
+
+
+class RetryOnLockTests(TransactionTestCase):
+
+    def test_retries_lock_errors_only(self):
+        calls = []
+
+        @retry_on_lock(attempts=3, base_delay=0.001)
+        def write(error):
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError(error)
+            return 'done'
+
+        self.assertEqual(write('database is locked'), 'done')
+        self.assertEqual(len(calls), 3)
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            write('no such table: events_event')
+        self.assertEqual(len(calls), 1)
+
+
+class ArchiveTests(TestCase):
+
+    def test_archive_and_restore_keep_links(self):
+        event = make_event()
+        guest = make_user('guest')
+        RSVP.objects.create(user=guest, event=event)
+        event.rsvps.add(guest)
+        Participant.objects.create(name='Participant', email='p@example.com').events.add(event)
+        Event.objects.filter(pk=event.pk).update(date=date.today() - timedelta(days=10))
+
+        self.assertEqual(archive.archive_events(older_than_days=5), 1)
+        self.assertFalse(Event.objects.filter(pk=event.pk).exists())
+        self.assertEqual(archive.get_event(event.pk).__class__, ArchivedEvent)
+
+        restored = archive.restore_event(event.pk)
+        self.assertEqual(list(restored.rsvps.all()), [guest])
+        self.assertEqual(restored.participants.count(), 1)
+        self.assertEqual(RSVP.objects.get(event=restored).user, guest)
+        self.assertFalse(ArchivedEvent.objects.exists())
+
+    def test_restore_after_re_rsvp(self):
+        event = make_event()
+        guest = make_user('guest')
+        rsvp = RSVP.objects.create(user=guest, event=event)
+        rsvp.status = 'cancelled'
+        rsvp.save()
+        self.assertEqual(archive.archive_cancelled_rsvps(older_than_days=0), 1)
+        RSVP.objects.create(user=guest, event=event, notes='Back on')
+        Event.objects.filter(pk=event.pk).update(date=date.today() - timedelta(days=10))
+        archive.archive_events(older_than_days=5)
+        self.assertEqual(ArchivedRSVP.objects.filter(event_id=event.pk).count(), 2)
+
+        archive.restore_event(event.pk)
+        restored = RSVP.objects.get(user=guest, event_id=event.pk)
+        self.assertEqual((restored.status, restored.notes), ('confirmed', 'Back on'))
+        self.assertEqual(ArchivedRSVP.objects.get(event_id=event.pk).id, rsvp.id)
+
+
+@override_settings(STORAGES=PLAIN_STATIC)
+class SoftDeleteTests(TestCase):
+
+    def soft_delete(self, instance):
+        type(instance).all_objects.filter(pk=instance.pk).update(deleted_at=timezone.now())
+
+    def test_soft_deleted_category_name_can_be_reused(self):
+        self.soft_delete(Category.objects.create(name='Workshop'))
+        form = CategoryForm(data={'name': 'Workshop', 'description': ''})
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+        self.assertEqual(Category.all_objects.filter(name='Workshop').count(), 2)
+        self.assertFalse(CategoryForm(data={'name': 'workshop', 'description': ''}).is_valid())
+
+    def test_category_keeps_its_own_name_on_edit(self):
+        category = Category.objects.create(name='Workshop')
+        form = CategoryForm(data={'name': 'Workshop', 'description': 'Hands on'}, instance=category)
+        self.assertTrue(form.is_valid(), form.errors)
+
+    def test_listings_skip_soft_deleted_events(self):
+        category = Category.objects.create(name='Workshop')
+        kept, deleted = make_event('Kept', category=category), make_event('Deleted', days=2, category=category)
+        # committing drops roles cached for an earlier test's user with the same pk
+        with self.captureOnCommitCallbacks(execute=True):
+            guest = make_user('guest', 'Participant', 'Organizer')
+        for event in (kept, deleted):
+            RSVP.objects.create(user=guest, event=event)
+            event.rsvps.add(guest)
+        self.soft_delete(deleted)
+        self.client.force_login(guest)
+
+        response = self.client.get('/dashboard/organizer/')
+        self.assertEqual(response.context['categories'].get(pk=category.pk).event_count, 1)
+        response = self.client.get('/my-rsvps/')
+        self.assertEqual([rsvp.event_id for rsvp in response.context['rsvps']], [kept.pk])
+        response = self.client.get('/dashboard/participant/')
+        self.assertEqual(list(response.context['rsvp_events']), [kept])
+
+
+class ReadModelTests(TestCase):
+
+    def setUp(self):
+        self.model = self.enterContext(mock.patch.object(readmodel, 'model', readmodel.UpcomingEvents()))
+        self.talks = Category.objects.create(name='Talks')
+        self.late = make_event('Late', days=3, time=time(18))
+        self.early = make_event('Early', days=3, time=time(9), category=self.talks)
+        self.next = make_event('Next', days=1)
+        self.past = make_event('Past', days=-1)
+
+    def test_matches_the_orm(self):
+        self.assertEqual(readmodel.upcoming(), [self.next, self.early, self.late])
+        for kwargs in ({'category_id': self.talks.pk}, {'start': date.today() + timedelta(days=2)},
+                       {'end': date.today() + timedelta(days=1)}, {'search': 'ear'}, {'limit': 1}):
+            self.assertEqual(readmodel.upcoming(**kwargs), readmodel._orm(**{
+                key: value for key, value in kwargs.items() if key != 'limit'})[:kwargs.get('limit')], kwargs)
+
+    def test_refresh_applies_only_new_changes(self):
+        snapshot = self.model.current()
+        self.next.date = date.today() - timedelta(days=2)
+        self.next.save()
+        added = make_event('Added', days=2, category=self.talks)
+        self.talks.name = 'Tech Talks'
+        self.talks.save()
+        self.model.mark_dirty()
+        with mock.patch.object(self.model, 'rebuild') as rebuild:
+            refreshed = self.model.current()
+        rebuild.assert_not_called()
+        self.assertGreater(refreshed.seq, snapshot.seq)
+        self.assertEqual(refreshed.select(), [added, self.early, self.late])
+        self.assertEqual(refreshed.events[self.early.pk].category.name, 'Tech Talks')
+
+    def test_late_commit_behind_the_position_is_applied(self):
+        self.model.current()
+        self.next.name = 'Renamed'
+        self.next.save()
+        # the rename's transaction has not committed yet
+        late = ChangeLogEntry.objects.latest('seq')
+        late_seq = late.seq
+        late.delete()
+        make_event('Added', days=2)
+        self.model.mark_dirty()
+        self.assertEqual(self.model.current().events[self.next.pk].name, 'Next')
+        ChangeLogEntry.objects.create(seq=late_seq, model='events.Event', object_id=str(self.next.pk), action='update')
+        self.model.mark_dirty()
+        self.assertEqual(self.model.current().events[self.next.pk].name, 'Renamed')
+
+    @override_settings(READMODEL_MAX_INCREMENT=2)
+    def test_large_backlog_rebuilds(self):
+        self.model.current()
+        for n in range(3):
+            make_event(f'Backlog {n}', days=5)
+        self.model.mark_dirty()
+        with mock.patch.object(self.model, 'rebuild', wraps=self.model.rebuild) as rebuild:
+            self.assertEqual(len(self.model.current().select()), 6)
+        rebuild.assert_called_once()
+
+    @override_settings(READMODEL_ENABLED=False)
+    def test_disabled_uses_the_orm(self):
+        with mock.patch.object(self.model, 'current') as current:
+            self.assertEqual(readmodel.upcoming(), [self.next, self.early, self.late])
+        current.assert_not_called()
+
+
+def isolate_caches(test):
+    """A private invalidation file and empty shared and per-process caches for test."""
+    directory = test.enterContext(tempfile.TemporaryDirectory())
+    bus = test.enterContext(mock.patch.object(
+        invalidation, '_file', invalidation.GenerationFile(os.path.join(directory, 'invalidation.bus'))))
+    # the counters already seen belong to the previous file
+    test.enterContext(mock.patch.dict(invalidation._seen, {
+        namespace: bus.read(namespace) for namespace in invalidation._seen}))
+    # as after a bump: LocalCaches emptied, in-memory indexes marked dirty
+    for namespace in list(invalidation._subscribers):
+        invalidation._invalidate(namespace)
+    for alias in caches:
+        caches[alias].clear()
+
+
+@override_settings(STORAGES=PLAIN_STATIC, IMAGE_PIPELINE_ENABLED=False)
+class PageCacheTests(TestCase):
+
+    def setUp(self):
+        isolate_caches(self)
+        self.event = make_event('Jazz Night')
+
+    def state(self, path, **params):
+        return self.client.get(path, params).get(pagecache.HEADER)
+
+    def test_anonymous_pages_are_cached_by_whitelisted_params(self):
+        self.assertEqual(self.state('/events/'), 'miss')
+        self.assertEqual(self.state('/events/'), 'hit')
+        self.assertEqual(self.state('/events/', utm_source='mail'), 'hit')
+        self.assertEqual(self.state('/events/', search='jazz'), 'miss')
+        self.assertContains(self.client.get('/events/', {'search': ' jazz '}), 'Jazz Night')
+
+    def test_signed_in_visitors_bypass_the_cache(self):
+        self.client.force_login(make_user('guest'))
+        self.assertIsNone(self.state('/events/'))
+        self.assertIsNone(self.state('/events/'))
+
+    def test_committed_changes_invalidate_affected_pages(self):
+        other = make_event('Other', days=2)
+        detail, other_detail = f'/event/{self.event.pk}/', f'/event/{other.pk}/'
+        for path in ('/events/', detail, other_detail):
+            self.state(path)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.name = 'Jazz Evening'
+            self.event.save()
+        self.assertEqual(self.state('/events/'), 'miss')
+        self.assertEqual(self.state(detail), 'miss')
+        self.assertEqual(self.state(other_detail), 'hit')
+        self.assertContains(self.client.get(detail), 'Jazz Evening')
+
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_disabled(self):
+        self.assertIsNone(self.state('/events/'))
+
+
+@override_settings(IMAGE_PIPELINE_ENABLED=False)
+class FragmentCacheTests(TestCase):
+
+    def setUp(self):
+        isolate_caches(self)
+        self.events = [make_event('First'), make_event('Second', days=2)]
+
+    def render(self):
+        """Cards for freshly loaded events, and how many were rendered rather than cached."""
+        events = Event.objects.filter(pk__in=[event.pk for event in self.events]).order_by('date')
+        with mock.patch.object(fragments, 'render_to_string', wraps=fragments.render_to_string) as render:
+            html = fragments.render_cards(events, 'listing')
+        return html, render.call_count
+
+    def test_cards_are_cached_per_event_version(self):
+        html, rendered = self.render()
+        self.assertEqual(rendered, 2)
+        self.assertLess(html.index('First'), html.index('Second'))
+        self.assertEqual(self.render(), (html, 0))
+
+        self.events[0].name = 'First, renamed'
+        self.events[0].save()
+        html, rendered = self.render()
+        self.assertEqual(rendered, 1)
+        self.assertIn('First, renamed', html)
+
+    def test_category_and_participant_changes_touch_their_events(self):
+        self.render()
+        category = self.events[0].category
+        category.name = 'Renamed'
+        category.save()
+        self.assertEqual(self.render()[1], 2)
+
+        Participant.objects.create(name='Participant', email='p@example.com').events.add(self.events[1])
+        self.assertEqual(self.render()[1], 1)
+
+    def test_unknown_variant(self):
+        with self.assertRaises(ValueError):
+            fragments.render_cards(self.events, 'sidebar')
+
+
+@override_settings(STORAGES=PLAIN_STATIC, IMAGE_PIPELINE_ENABLED=False, PAGE_CACHE_ENABLED=False)
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        isolate_caches(self)
+        self.enterContext(mock.patch.object(readmodel, 'model', readmodel.UpcomingEvents()))
+        self.upcoming = make_event('Jazz Night', days=2)
+        self.past = make_event('Old Fair', days=-3)
+        self.factory = AsyncRequestFactory()
+
+    async def serve(self, view, path='/', user=None, **kwargs):
+        request = self.factory.get(path)
+        request.user = user or AnonymousUser()
+        request.session = {}
+
+        async def auser():
+            return request.user
+
+        request.auser = auser
+        response = await view.as_view()(request, **kwargs)
+        if hasattr(response, 'render'):
+            await sync_to_async(response.render)()
+        return response
+
+    async def test_home_and_list_match_the_sync_views(self):
+        response = await self.serve(async_views.AsyncHomeView)
+        self.assertEqual(response.context_data['upcoming_events'], [self.upcoming])
+        self.assertEqual(response.context_data['previous_events'], [self.past])
+        self.assertContains(response, 'Jazz Night')
+        response = await self.serve(async_views.AsyncEventsView, '/events/?search=jazz')
+        self.assertEqual(list(response.context_data['events']), [self.upcoming])
+
+    async def test_detail_falls_back_to_404(self):
+        response = await self.serve(async_views.AsyncEventDetailView, pk=self.upcoming.pk)
+        self.assertEqual(response.context_data['event'], self.upcoming)
+        with self.assertRaises(Http404):
+            await self.serve(async_views.AsyncEventDetailView, pk=self.upcoming.pk + 100)
+
+    async def test_my_rsvps_requires_sign_in(self):
+        response = await self.serve(async_views.AsyncMyRSVPsView)
+        self.assertEqual(response.status_code, 302)
+        user = await sync_to_async(make_user)('guest')
+        await RSVP.objects.acreate(user=user, event=self.upcoming)
+        response = await self.serve(async_views.AsyncMyRSVPsView, user=user)
+        self.assertEqual([rsvp.event_id for rsvp in response.context_data['rsvps']], [self.upcoming.pk])
+
+
+@override_settings(LIVE_UPDATES=True, LIVE_QUEUE_SIZE=2)
+class LiveUpdateTests(TestCase):
+
+    def setUp(self):
+        isolate_caches(self)
+        self.enterContext(mock.patch.object(live, 'hub', live.Hub()))
+        # the bridge is driven by hand below
+        self.enterContext(mock.patch.object(live.Bridge, 'run', mock.AsyncMock()))
+        self.event = make_event('Jazz Night')
+        # committing drops roles cached for an earlier test's user with the same pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = make_user('guest')
+            self.organizer = make_user('organizer', 'Organizer')
+
+    def test_encode_splits_lines(self):
+        self.assertEqual(live.encode('stats', {'total': 1}), 'event: stats\ndata: {"total": 1}\n\n')
+        self.assertEqual(live.encode('row', 'a\nb'), 'event: row\ndata: "a\\nb"\n\n')
+
+    async def test_overflow_closes_the_stream(self):
+        queue = live.hub.subscribe(['dashboard'])
+        for n in range(3):
+            live.hub.publish('dashboard', 'stats', n)
+        # the oldest message makes room for the marker
+        self.assertEqual(queue.get_nowait(), ('stats', 1))
+        self.assertEqual(queue.get_nowait(), (live.OVERFLOW, None))
+        self.assertEqual(dict(live.hub.topics), {})
+
+    async def test_bridge_publishes_committed_rsvps_to_watched_events(self):
+        queue = live.hub.subscribe([f'event:{self.event.pk}'])
+        other = await sync_to_async(make_event)('Other')
+        bridge = live.Bridge(live.hub)
+        await sync_to_async(bridge.tail.start)()
+        rsvp = await RSVP.objects.acreate(user=self.user, event=self.event)
+        await RSVP.objects.acreate(user=self.user, event=other)
+        await bridge.poll()
+        name, data = queue.get_nowait()
+        self.assertEqual((name, data['rsvp']), ('rsvp', rsvp))
+        self.assertEqual(queue.get_nowait(), ('counts', {'event': self.event.pk, 'confirmed': 1,
+                                                         'cancelled': 0, 'total': 1}))
+        self.assertTrue(queue.empty())
+
+    async def test_bridge_publishes_late_commits(self):
+        queue = live.hub.subscribe([f'event:{self.event.pk}'])
+        bridge = live.Bridge(live.hub)
+        await sync_to_async(bridge.tail.start)()
+        rsvp = await RSVP.objects.acreate(user=self.user, event=self.event)
+        # the RSVP's transaction has not committed yet
+        late = await ChangeLogEntry.objects.alatest('seq')
+        late_seq = late.seq
+        await late.adelete()
+        await sync_to_async(make_event)('Other')
+        await bridge.poll()
+        self.assertTrue(queue.empty())
+        await ChangeLogEntry.objects.acreate(seq=late_seq, model=live.RSVP_LABEL, object_id=str(rsvp.pk),
+                                             action='create')
+        await bridge.poll()
+        self.assertEqual(queue.get_nowait()[1]['rsvp'], rsvp)
+
+    async def test_stream_requires_asgi_and_a_manager(self):
+        view = LiveStreamView.as_view()
+        path = f'/live/?event={self.event.pk}'
+        response = await view(RequestFactory().get(path))
+        self.assertEqual(response.status_code, 204)
+        request = AsyncRequestFactory().get(path)
+        request.auser = mock.AsyncMock(return_value=self.user)
+        self.assertEqual((await view(request)).status_code, 403)
+
+        request = AsyncRequestFactory().get(path)
+        request.auser = mock.AsyncMock(return_value=self.organizer)
+        response = await view(request)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = LiveStreamView().stream(request, [f'event:{self.event.pk}'])
+        self.assertEqual(await anext(chunks), 'retry: 3000\n\n')
+        self.assertIn('"confirmed": 0', await anext(chunks))
+        await chunks.aclose()
+        self.assertEqual(dict(live.hub.topics), {})
+
+
+@override_settings(IMAGE_PIPELINE_ENABLED=False)
+class DashboardFragmentTests(TestCase):
+    htmx = {'HTTP_HX_REQUEST': 'true'}
+
+    def setUp(self):
+        isolate_caches(self)
+        # committing drops roles cached for an earlier test's user with the same pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(make_user('admin', 'Admin'))
+
+    def test_create_returns_the_new_row(self):
+        # runs the commit's bumps too, against the private file
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/category/add/', {'name': 'Talks'}, **self.htmx)
+        self.assertTemplateUsed(response, 'events/dashboard/fragment.html')
+        self.assertEqual(response.context['row'], Category.objects.get(name='Talks'))
+        self.assertTrue(response.context['created'])
+        self.assertEqual(response.context['total_categories'], 1)
+        self.assertFalse(response.context['form'].is_bound)
+        self.assertRedirects(self.client.post('/category/add/', {'name': 'Music'}), '/dashboard/',
+                             fetch_redirect_response=False)
+
+    def test_invalid_form_comes_back_with_errors(self):
+        Category.objects.create(name='Talks')
+        response = self.client.post('/category/add/', {'name': 'talks'}, **self.htmx)
+        self.assertTemplateUsed(response, 'events/dashboard/fragment.html')
+        self.assertIn('name', response.context['form'].errors)
+        self.assertFalse(response.context['counters'])
+
+    def test_edit_form_and_bulk_delete(self):
+        talks, music = Category.objects.create(name='Talks'), Category.objects.create(name='Music')
+        response = self.client.get(f'/category/{talks.pk}/edit/', **self.htmx)
+        self.assertTrue(response.context['editing_category'])
+        self.assertEqual(response.context['form'].instance, talks)
+        response = self.client.post('/dashboard/bulk-delete/category/', {'ids': [talks.pk, music.pk]}, **self.htmx)
+        self.assertEqual(response.context['removed'], [talks.pk, music.pk])
+        self.assertFalse(Category.objects.exists())
+
+    def test_single_deletes_need_a_post_and_a_manager(self):
+        participant = Participant.objects.create(name='Ann', email='ann@example.com')
+        url = f'/participant/{participant.pk}/delete/'
+        self.assertEqual(self.client.get(url, **self.htmx).status_code, 405)
+        response = self.client.post(url, **self.htmx)
+        self.assertEqual(response.context['removed'], [participant.pk])
+        self.assertFalse(Participant.objects.exists())
+        other = Participant.objects.create(name='Bob', email='bob@example.com')
+        self.client.force_login(make_user('guest'))
+        self.assertEqual(self.client.post(f'/participant/{other.pk}/delete/', **self.htmx).status_code, 403)
+        self.assertTrue(Participant.objects.filter(pk=other.pk).exists())
+
+
+@override_settings(AUTOCOMPLETE_PAGE_SIZE=2)
+class AutocompleteTests(TestCase):
+
+    def setUp(self):
+        # committing drops roles cached for an earlier test's user with the same pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.force_login(make_user('organizer', 'Organizer'))
+        for name in ('Éclair Workshop', 'eclipse Watch', 'Straße Fest', 'Echo Talks'):
+            Category.objects.create(name=name)
+
+    def names(self, term, page=1):
+        return [row['text'] for row in async_to_sync(autocomplete.asearch)('categories', term, page)['results']]
+
+    def test_prefix_ignores_case_beyond_ascii(self):
+        self.assertEqual(self.names('ÉCL'), ['Éclair Workshop'])
+        self.assertEqual(self.names('STRASS'), ['Straße Fest'])
+        self.assertEqual(self.names('ec'), ['Echo Talks', 'eclipse Watch'])
+        self.assertEqual(self.names('%'), [])
+
+    def test_keys_follow_renames_and_bulk_creates(self):
+        category = Category.objects.get(name='Echo Talks')
+        category.name = 'Ökotalks'
+        category.save()
+        Category.objects.bulk_create([Category(name='ÖKO Markt')])
+        self.assertEqual(self.names('ök'), ['ÖKO Markt', 'Ökotalks'])
+
+    def test_endpoint_pages_and_checks_roles(self):
+        response = self.client.get('/autocomplete/categories/', {'q': 'e', 'page': '1'})
+        self.assertEqual(response.json(), {
+            'results': [{'id': Category.objects.get(name='Echo Talks').pk, 'text': 'Echo Talks'},
+                        {'id': Category.objects.get(name='eclipse Watch').pk, 'text': 'eclipse Watch'}],
+            'pagination': {'more': False},
+        })
+        self.assertTrue(self.client.get('/autocomplete/categories/', {'page': '1'}).json()['pagination']['more'])
+        self.assertEqual(self.client.get('/autocomplete/users/').status_code, 404)
+        self.client.force_login(make_user('guest'))
+        self.assertEqual(self.client.get('/autocomplete/categories/').status_code, 403)
+
+
+class SuggestTests(TestCase):
+
+    def setUp(self):
+        self.suggestions = self.enterContext(mock.patch.object(suggest, 'suggestions', suggest.Suggestions()))
+        self.jazz = make_event('Jazz Night', location='Blue Note')
+        self.past = make_event('Jazz Brunch', days=-5)
+
+    def texts(self, query):
+        return [item['text'] for item in suggest.suggest(query)]
+
+    def test_tolerates_typos_and_partial_words(self):
+        first = suggest.suggest('jaz nigt')[0]
+        self.assertEqual((first['text'], first['kind'], first['url']), ('Jazz Night', 'event', f'/event/{self.jazz.pk}/'))
+        self.assertEqual(self.texts('blue no')[0], 'Blue Note')
+        self.assertEqual(suggest.suggest('  '), [])
+
+    def test_refresh_applies_new_changes(self):
+        self.suggestions.build()
+        self.jazz.name = 'Swing Night'
+        self.jazz.save()
+        self.suggestions.mark_dirty()
+        with mock.patch.object(self.suggestions, 'build') as build:
+            self.assertEqual(self.texts('swing')[0], 'Swing Night')
+            self.assertNotIn('Jazz Night', self.texts('jazz night'))
+        build.assert_not_called()
+
+    def test_late_commit_behind_the_position_is_applied(self):
+        self.suggestions.build()
+        self.jazz.name = 'Swing Night'
+        self.jazz.save()
+        # the rename's transaction has not committed yet
+        late = ChangeLogEntry.objects.latest('seq')
+        late_seq = late.seq
+        late.delete()
+        make_event('Other')
+        self.suggestions.mark_dirty()
+        self.assertEqual(self.texts('swing'), [])
+        ChangeLogEntry.objects.create(seq=late_seq, model='events.Event', object_id=str(self.jazz.pk), action='update')
+        self.suggestions.mark_dirty()
+        self.assertEqual(self.texts('swing')[0], 'Swing Night')
+
+    @override_settings(SUGGEST_MAX_INCREMENT=2)
+    def test_large_backlog_rebuilds(self):
+        self.suggestions.build()
+        for n in range(2):
+            make_event(f'Backlog {n}')
+        self.suggestions.mark_dirty()
+        with mock.patch.object(self.suggestions, 'build', wraps=self.suggestions.build) as build:
+            self.assertIn('Backlog 1', self.texts('backlog'))
+        build.assert_called_once()
+
+    def test_budget_keeps_upcoming_events(self):
+        with override_settings(SUGGEST_MAX_BYTES=4000):
+            index = self.suggestions.build()
+        self.assertTrue(index.full)
+        self.assertEqual(self.texts('jazz'), ['Jazz Night'])
+
+    def test_async_endpoint_answers_from_memory(self):
+        response = self.client.get('/search/suggest/', {'q': 'jazz nig'})
+        self.assertEqual(response.json()['suggestions'][0]['text'], 'Jazz Night')
+        with self.assertNumQueries(0):
+            self.assertEqual(async_to_sync(suggest.asuggest)('jazz nig')[0]['text'], 'Jazz Night')
+        self.suggestions.mark_dirty()
+        self.assertIsNone(self.suggestions.search_in_memory('jazz'))
+
+
+class RSVPMetricsTests(TestCase):
+
+    def test_counts_status_transitions_only(self):
+        rsvp = RSVP.objects.create(user=make_user('guest'), event=make_event())
+        with mock.patch.object(metrics.RSVP_TRANSITIONS, 'inc') as inc:
+            rsvp.notes = 'Bringing a friend'
+            rsvp.save()
+            inc.assert_not_called()
+            rsvp.status = 'cancelled'
+            rsvp.save()
+            inc.assert_called_once_with(status='cancelled')
+
+
+@override_settings(STORAGES=PLAIN_STATIC, PAGE_CACHE_ENABLED=False)
+class PerfAuditTests(TestCase):
+
+    def test_report_covers_views_and_rolls_back(self):
+        make_event()
+        out = StringIO()
+        call_command('perf_audit', stdout=out)
+        report = out.getvalue()
+        for view in ('HomeView', 'EventsView', 'DashboardView', 'MyRSVPsView', 'RBACDashboardView'):
+            self.assertIn(f'== {view} ', report)
+        self.assertNotIn('[error]', report)
+        self.assertRegex(report, r'\d+ warning\(s\)')
+        self.assertFalse(CustomUser.objects.filter(username='perf_audit_user').exists())
+
+    def test_index_check(self):
+        self.assertEqual(checks.check_hot_lookup_indexes(), [])
+        with mock.patch.object(checks, 'HOT_LOOKUPS', [('events.Event', 'location')]):
+            errors = checks.check_hot_lookup_indexes()
+        self.assertEqual([error.id for error in errors], ['events.W001'])
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth.views import LogoutView
 from events.views import (
@@ -9,9 +10,16 @@ from events.views import (
     ParticipantCreateView, ParticipantUpdateView, ParticipantDeleteView, 
     CategoryCreateView, CategoryUpdateView, CategoryDeleteView, 
     RBACDashboardView, AssignUserRoleView, CreateGroupView, 
-    DeleteGroupView, DeleteUserView
+    DeleteGroupView, DeleteUserView, BulkDeleteView, LiveStreamView, AutocompleteView,
+    SuggestView
 )
 
+if settings.ASYNC_VIEWS:
+    from events.async_views import (
+        AsyncHomeView as HomeView, AsyncEventsView as EventsView,
+        AsyncEventDetailView as EventDetailView, AsyncMyRSVPsView as MyRSVPsView,
+    )
+
 urlpatterns = [
     path('sign-up/', SignUpView.as_view(), name='sign-up'),
     path('sign-in/', CustomLoginView.as_view(), name='sign-in'),
@@ -27,8 +35,10 @@ urlpatterns = [
     path('manage-rsvps/', ManageRSVPsView.as_view(), name='manage-rsvps'),
     path('events/<int:event_id>/rsvps/', EventRSVPsView.as_view(), name='event-rsvps'),
     path('rsvps/<int:rsvp_id>/delete/', DeleteRSVPView.as_view(), name='delete-rsvp'),
+    path('live/', LiveStreamView.as_view(), name='live'),
     path('', HomeView.as_view(), name='home'),
     path('events/', EventsView.as_view(), name='events'),
+    path('search/suggest/', SuggestView.as_view(), name='search-suggest'),
     path('contact/', ContactView.as_view(), name='contact'),
     path('event/<int:pk>/', EventDetailView.as_view(), name='event-detail'),
     path('event/add/', EventCreateView.as_view(), name='event-add'),
@@ -40,6 +50,8 @@ urlpatterns = [
     path('category/add/', CategoryCreateView.as_view(), name='category-add'),
     path('category/<int:pk>/edit/', CategoryUpdateView.as_view(), name='category-edit'),
     path('category/<int:pk>/delete/', CategoryDeleteView.as_view(), name='category-delete'),
+    path('dashboard/bulk-delete/<str:kind>/', BulkDeleteView.as_view(), name='bulk-delete'),
+    path('autocomplete/<str:source>/', AutocompleteView.as_view(), name='autocomplete'),
     path('rbac/', RBACDashboardView.as_view(), name='rbac-dashboard'),
     path('rbac/assign-role/<int:user_id>/', AssignUserRoleView.as_view(), name='assign-role'),
     path('rbac/create-group/', CreateGroupView.as_view(), name='create-group'),
@@ -1,69 +1,101 @@
+import asyncio
+import logging
 from datetime import date
 
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
 from django.contrib import messages
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import Group, User
 from django.contrib.auth.tokens import default_token_generator
 from django.contrib.auth.views import LoginView
+from django.core.handlers.asgi import ASGIRequest
 from django.db.models import Q, Count
+from django.http import Http404, HttpResponse, JsonResponse, HttpResponseBadRequest, HttpResponseForbidden, StreamingHttpResponse
 from django.shortcuts import redirect, render, get_object_or_404
+from django.template.loader import render_to_string
+from django.template.response import TemplateResponse
 from django.urls import reverse_lazy
 from django.utils.decorators import method_decorator
 from django.utils.encoding import force_str
 from django.utils.http import urlsafe_base64_decode
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView, View
+from django.views.generic.edit import ModelFormMixin
 from django.contrib.auth.mixins import LoginRequiredMixin
 
+from core import images
+from core.db import retry_on_lock
+from core.deletion import schedule_deletion
+from core.models import DeletionJob
+from core.log import Lazy
+from core.routers import ReplicaReadsMixin
 from users.models import CustomUser
+from users.roles import has_role, roles
 from .decorators import group_required
 from .forms import EventForm, ParticipantForm, CategoryForm, SignUpForm, SignInForm, AssignRoleForm, CreateGroupForm
-from .models import Event, Participant, Category, RSVP
+from . import archive, autocomplete, caches, live, readmodel, suggest
+from .pagecache import AnonymousPageCacheMixin, event_namespace
+from .models import Event, Participant, Category, RSVP, ArchivedEvent
+
+logger = logging.getLogger(__name__)
 
 
 # home-page
-class HomeView(TemplateView):
+class HomeView(ReplicaReadsMixin, AnonymousPageCacheMixin, TemplateView):
     template_name = 'events/event_list.html'
+    page_cache_params = ('search', 'category', 'date')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         today = date.today()
 
         # upcoming
-        context['upcoming_events'] = Event.objects.select_related('category').prefetch_related('participants').filter(
-            date__gte=today).order_by('date', 'time')[:6]
+        context['upcoming_events'] = readmodel.upcoming(limit=6)
 
-        # previous
-        context['previous_events'] = Event.objects.select_related('category').prefetch_related('participants').filter(
-            date__lt=today).order_by('-date', 'time')[:6]
+        # previous, topped up from the archive once the hot table runs short
+        # cards are cached (events.fragments), which loads relations for the misses only
+        previous_events = list(Event.objects.filter(date__lt=today).order_by('-date', 'time')[:6])
+        if len(previous_events) < 6:
+            previous_events += ArchivedEvent.objects.order_by('-date', 'time')[:6 - len(previous_events)]
+        context['previous_events'] = previous_events
 
         # search
-        context['categories'] = Category.objects.all()
+        context['categories'] = caches.categories()
 
-        context['total_participants'] = Participant.objects.aggregate(total=Count('id'))['total']
+        context['total_participants'] = caches.dashboard_stats()['total_participants']
 
         return context
 
 
 # event
-class EventsView(ListView):
+class EventsView(ReplicaReadsMixin, AnonymousPageCacheMixin, ListView):
     model = Event
     template_name = 'events/events.html'
     context_object_name = 'events'
+    page_cache_params = ('search', 'category', 'start_date', 'end_date')
 
-    def get_queryset(self):
-
-        queryset = Event.objects.select_related('category').prefetch_related('participants')
-
-        #search
-        search = self.request.GET.get('search')
-        category = self.request.GET.get('category')
-        start_date = self.request.GET.get('start_date')
-        end_date = self.request.GET.get('end_date')
-
-        if any([search, category, start_date, end_date]):
-            print(
-                f"Search params - search: '{search}', category: '{category}', start: '{start_date}', end: '{end_date}'")
+    def upcoming_window(self, start_date, end_date, category):
+        """(start, end) when the range starts today or later, so the read model can answer; None means use the ORM."""
+        try:
+            start = date.fromisoformat(start_date) if start_date else None
+            end = date.fromisoformat(end_date) if end_date else None
+        except ValueError:
+            return None
+        if start is None or start < date.today() or (category and not category.isdigit()):
+            return None
+        return start, end
+
+    def upcoming_only(self, start_date, end_date, category):
+        window = self.upcoming_window(start_date, end_date, category)
+        if window is None:
+            return None
+        events = readmodel.upcoming(*window, category, self.request.GET.get('search'))
+        return events[::-1]
+
+    def search_queryset(self, search, category, start_date, end_date):
+        queryset = Event.objects.all()
 
         if search:
             queryset = queryset.filter(
@@ -71,40 +103,68 @@ class EventsView(ListView):
                 Q(description__icontains=search) |
                 Q(location__icontains=search)
             )
-            print(f"After search filter: {queryset.count()} events")
 
         if category:
             queryset = queryset.filter(category_id=category)
-            print(f"After category filter: {queryset.count()} events")
 
         if start_date:
             queryset = queryset.filter(date__gte=start_date)
-            print(f"After start_date filter: {queryset.count()} events")
 
         if end_date:
             queryset = queryset.filter(date__lte=end_date)
-            print(f"After end_date filter: {queryset.count()} events")
 
         return queryset.order_by('-date', '-time')
 
+    def get_queryset(self):
+
+        #search
+        search = self.request.GET.get('search')
+        category = self.request.GET.get('category')
+        start_date = self.request.GET.get('start_date')
+        end_date = self.request.GET.get('end_date')
+
+        events = self.upcoming_only(start_date, end_date, category)
+        if events is not None:
+            return events
+
+        queryset = self.search_queryset(search, category, start_date, end_date)
+
+        # count only runs if the debug record is actually emitted
+        if any([search, category, start_date, end_date]):
+            logger.debug('Event search matched %s events', Lazy(queryset.count), extra={
+                'search': search, 'category': category, 'start_date': start_date, 'end_date': end_date,
+            })
+
+        return queryset
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categories'] = Category.objects.all()
+        context['categories'] = caches.categories()
 
         #Tot-participants
-        context['total_participants'] = Participant.objects.aggregate(total=Count('id'))['total']
+        context['total_participants'] = caches.dashboard_stats()['total_participants']
 
         return context
 
 
+class SuggestView(View):
+    """Search-as-you-type suggestions for the events page (events.suggest): ?q=<partial query>."""
+
+    async def get(self, request):
+        return JsonResponse({'suggestions': await suggest.asuggest(request.GET.get('q', ''))})
+
+
 # contact-page
-class ContactView(TemplateView):
+class ContactView(AnonymousPageCacheMixin, TemplateView):
     template_name = 'events/contact.html'
 
+    def page_cache_namespaces(self):
+        return []
+
 
 # dashboard-page
 @method_decorator(group_required('Admin', 'Organizer'), name='dispatch')
-class DashboardView(TemplateView):
+class DashboardView(ReplicaReadsMixin, TemplateView):
     template_name = 'events/dashboard.html'
 
     def get_context_data(self, **kwargs):
@@ -113,15 +173,12 @@ class DashboardView(TemplateView):
 
         context['events'] = Event.objects.select_related('category').prefetch_related('participants').all().order_by(
             '-date', '-time')
+        # the rows' image tags then read them from memory
+        images.ready_hashes(event.image.name for event in context['events'])
         context['participants'] = Participant.objects.prefetch_related('events').all()
-        context['categories'] = Category.objects.all()
-
-        context['total_participants'] = Participant.objects.aggregate(total=Count('id'))['total']
-        context['total_events'] = Event.objects.aggregate(total=Count('id'))['total']
-        context['total_categories'] = Category.objects.aggregate(total=Count('id'))['total']
+        context['categories'] = caches.categories()
 
-        context['upcoming_events_count'] = Event.objects.filter(date__gte=today).count()
-        context['past_events_count'] = Event.objects.filter(date__lt=today).count()
+        context.update(caches.dashboard_stats())
 
         context['todays_events'] = Event.objects.select_related('category').prefetch_related('participants').filter(
             date=today).order_by('time')
@@ -130,6 +187,9 @@ class DashboardView(TemplateView):
         context['participant_form'] = ParticipantForm()
         context['category_form'] = CategoryForm()
 
+        context['deletion_jobs'] = DeletionJob.objects.filter(status__in=['pending', 'running'])
+        context['live_url'] = live.stream_url(dashboard=True)
+
         return context
 
     def post(self, request, *args, **kwargs):
@@ -141,8 +201,7 @@ class DashboardView(TemplateView):
                 form.save()
                 messages.success(request, 'Event created successfully!')
             else:
-                # error-log event
-                print("Event form errors:", form.errors)
+                logger.info('Event form invalid', extra={'errors': form.errors.get_json_data()})
                 error_message = "Error creating event. Please check the form."
                 if form.errors:
                     error_details = []
@@ -158,8 +217,7 @@ class DashboardView(TemplateView):
                 form.save()
                 messages.success(request, 'Participant created successfully!')
             else:
-                # error-log participant
-                print("Participant form errors:", form.errors)
+                logger.info('Participant form invalid', extra={'errors': form.errors.get_json_data()})
                 error_message = "Error creating participant. Please check the form."
                 if form.errors:
                     error_details = []
@@ -175,7 +233,7 @@ class DashboardView(TemplateView):
                 form.save()
                 messages.success(request, 'Category created successfully!')
             else:
-                print("Category form errors:", form.errors)
+                logger.info('Category form invalid', extra={'errors': form.errors.get_json_data()})
                 error_message = "Error creating category. Please check the form."
                 if form.errors:
                     error_details = []
@@ -188,18 +246,89 @@ class DashboardView(TemplateView):
         return redirect('dashboard')
 
 
-class EventDetailView(DetailView):
+class EventDetailView(ReplicaReadsMixin, AnonymousPageCacheMixin, DetailView):
     model = Event
     template_name = 'events/event_detail.html'
     context_object_name = 'event'
 
-    def get_queryset(self):
-        return Event.objects.select_related('category').prefetch_related('participants')
+    def page_cache_namespaces(self):
+        return [event_namespace(self.kwargs['pk'])]
+
+    def get_object(self, queryset=None):
+        event = archive.get_event(self.kwargs['pk'])
+        if event is None:
+            raise Http404('No event found matching the query')
+        return event
 
 
 #CRUD
+def wants_fragment(request):
+    """True for htmx requests, which get DashboardFragmentMixin's partial responses."""
+    return request.headers.get('HX-Request') == 'true'
+
+
+class DashboardFragmentMixin:
+    """
+    Partial responses for the dashboard CRUD views. An htmx request gets
+    the submitted form back (blank again, or with its errors), the changed
+    table row and fresh counters and messages, swapped in by id
+    (events/dashboard/fragment.html), so an action costs a few queries
+    instead of the whole dashboard. Other requests get the full page and
+    redirects as before.
+    """
+    fragment_kind = None
+
+    def fragment_response(self, form=None, row=None, created=False, removed=(), editing=False, counters=True):
+        kind = self.fragment_kind
+        context = {
+            'kind': kind,
+            'form': form,
+            f'{kind}_form': form,
+            f'editing_{kind}': editing,
+            'row': row,
+            'created': created,
+            'replace_row': not created,
+            'removed': removed,
+            'counters': counters,
+            # only read by the forms' "disabled" checks
+            'categories': caches.categories() if kind == 'event' else None,
+            'events': Event.objects.exists() if kind == 'participant' and form is not None else None,
+        }
+        if counters:
+            context.update(caches.dashboard_stats())
+            context['todays_events_count'] = Event.objects.filter(date=date.today()).count()
+        return TemplateResponse(self.request, 'events/dashboard/fragment.html', context)
+
+    def get(self, request, *args, **kwargs):
+        if wants_fragment(request) and isinstance(self, UpdateView):
+            self.object = self.get_object()
+            return self.fragment_response(self.get_form(), editing=True, counters=False)
+        return super().get(request, *args, **kwargs)
+
+    def form_valid(self, form):
+        created = isinstance(self, CreateView)
+        response = super().form_valid(form)
+        # DeleteView is a form view too, its POST keeps the plain response
+        if not wants_fragment(self.request) or not isinstance(self, ModelFormMixin):
+            return response
+        return self.fragment_response(self.get_form_class()(), row=self.object, created=created)
+
+    def form_invalid(self, form):
+        if not wants_fragment(self.request) or not isinstance(self, ModelFormMixin):
+            return super().form_invalid(form)
+        return self.fragment_response(form, editing=isinstance(self, UpdateView), counters=False)
+
+    def deleted(self, pks, message):
+        """Response once rows are gone (or hidden until process_deletions purges them)."""
+        messages.success(self.request, message)
+        if wants_fragment(self.request):
+            return self.fragment_response(removed=pks)
+        return redirect('dashboard')
+
+
 @method_decorator(group_required('Admin', 'Organizer'), name='dispatch')
-class EventCreateView(CreateView):
+class EventCreateView(DashboardFragmentMixin, CreateView):
+    fragment_kind = 'event'
     model = Event
     form_class = EventForm
     template_name = 'events/dashboard.html'
@@ -210,13 +339,11 @@ class EventCreateView(CreateView):
         today = date.today()
         context['events'] = Event.objects.select_related('category').prefetch_related('participants').all().order_by(
             '-date', '-time')
+        # the rows' image tags then read them from memory
+        images.ready_hashes(event.image.name for event in context['events'])
         context['participants'] = Participant.objects.prefetch_related('events').all()
-        context['categories'] = Category.objects.all()
-        context['total_participants'] = Participant.objects.aggregate(total=Count('id'))['total']
-        context['total_events'] = Event.objects.aggregate(total=Count('id'))['total']
-        context['total_categories'] = Category.objects.aggregate(total=Count('id'))['total']
-        context['upcoming_events_count'] = Event.objects.filter(date__gte=today).count()
-        context['past_events_count'] = Event.objects.filter(date__lt=today).count()
+        context['categories'] = caches.categories()
+        context.update(caches.dashboard_stats())
         context['todays_events'] = Event.objects.filter(date=today).select_related('category').prefetch_related(
             'participants')
         context['event_form'] = EventForm()
@@ -238,7 +365,8 @@ class EventCreateView(CreateView):
 
 
 @method_decorator(group_required('Admin', 'Organizer'), name='dispatch')
-class EventUpdateView(UpdateView):
+class EventUpdateView(DashboardFragmentMixin, UpdateView):
+    fragment_kind = 'event'
     model = Event
     form_class = EventForm
     template_name = 'events/dashboard.html'
@@ -249,13 +377,11 @@ class EventUpdateView(UpdateView):
         today = date.today() 
         context['events'] = Event.objects.select_related('category').prefetch_related('participants').all().order_by(
             '-date', '-time')
+        # the rows' image tags then read them from memory
+        images.ready_hashes(event.image.name for event in context['events'])
         context['participants'] = Participant.objects.prefetch_related('events').all()
-        context['categories'] = Category.objects.all()
-        context['total_participants'] = Participant.objects.aggregate(total=Count('id'))['total']
-        context['total_events'] = Event.objects.aggregate(total=Count('id'))['total']
-        context['total_categories'] = Category.objects.aggregate(total=Count('id'))['total']
-        context['upcoming_events_count'] = Event.objects.filter(date__gte=today).count()
-        context['past_events_count'] = Event.objects.filter(date__lt=today).count()
+        context['categories'] = caches.categories()
+        context.update(caches.dashboard_stats())
         context['todays_events'] = Event.objects.filter(date=today).select_related('category').prefetch_related(
             'participants')
         context['event_form'] = self.get_form() 
@@ -283,18 +409,21 @@ class EventUpdateView(UpdateView):
 
 
 @method_decorator(group_required('Admin'), name='dispatch')
-class EventDeleteView(DeleteView):
+class EventDeleteView(DashboardFragmentMixin, DeleteView):
+    fragment_kind = 'event'
     model = Event
     success_url = reverse_lazy('dashboard')
+    http_method_names = ['post']
 
-    def get(self, request, *args, **kwargs):
+    def post(self, request, *args, **kwargs):
         self.object = self.get_object()
-        self.object.delete()
-        messages.success(request, 'Event deleted successfully!')
-        return redirect(self.success_url)
+        # hidden now, rows purged in batches by process_deletions
+        schedule_deletion(Event.objects.filter(pk=self.object.pk), request.user)
+        return self.deleted([self.object.pk], 'Event deleted successfully!')
 
 
-class ParticipantCreateView(CreateView):
+class ParticipantCreateView(DashboardFragmentMixin, CreateView):
+    fragment_kind = 'participant'
     model = Participant
     form_class = ParticipantForm
     template_name = 'events/dashboard.html'
@@ -305,13 +434,11 @@ class ParticipantCreateView(CreateView):
         today = date.today()
         context['events'] = Event.objects.select_related('category').prefetch_related('participants').all().order_by(
             '-date', '-time')
+        # the rows' image tags then read them from memory
+        images.ready_hashes(event.image.name for event in context['events'])
         context['participants'] = Participant.objects.prefetch_related('events').all()
-        context['categories'] = Category.objects.all()
-        context['total_participants'] = Participant.objects.aggregate(total=Count('id'))['total']
-        context['total_events'] = Event.objects.aggregate(total=Count('id'))['total']
-        context['total_categories'] = Category.objects.aggregate(total=Count('id'))['total']
-        context['upcoming_events_count'] = Event.objects.filter(date__gte=today).count()
-        context['past_events_count'] = Event.objects.filter(date__lt=today).count()
+        context['categories'] = caches.categories()
+        context.update(caches.dashboard_stats())
         context['todays_events'] = Event.objects.filter(date=today).select_related('category').prefetch_related(
             'participants')
         context['event_form'] = EventForm()
@@ -329,7 +456,8 @@ class ParticipantCreateView(CreateView):
         return super().form_invalid(form)
 
 
-class ParticipantUpdateView(UpdateView):
+class ParticipantUpdateView(DashboardFragmentMixin, UpdateView):
+    fragment_kind = 'participant'
     model = Participant
     form_class = ParticipantForm
     template_name = 'events/dashboard.html'
@@ -340,13 +468,11 @@ class ParticipantUpdateView(UpdateView):
         today = date.today()
         context['events'] = Event.objects.select_related('category').prefetch_related('participants').all().order_by(
             '-date', '-time')
+        # the rows' image tags then read them from memory
+        images.ready_hashes(event.image.name for event in context['events'])
         context['participants'] = Participant.objects.prefetch_related('events').all()
-        context['categories'] = Category.objects.all()
-        context['total_participants'] = Participant.objects.aggregate(total=Count('id'))['total']
-        context['total_events'] = Event.objects.aggregate(total=Count('id'))['total']
-        context['total_categories'] = Category.objects.aggregate(total=Count('id'))['total']
-        context['upcoming_events_count'] = Event.objects.filter(date__gte=today).count()
-        context['past_events_count'] = Event.objects.filter(date__lt=today).count()
+        context['categories'] = caches.categories()
+        context.update(caches.dashboard_stats())
         context['todays_events'] = Event.objects.filter(date=today).select_related('category').prefetch_related(
             'participants')
         context['event_form'] = EventForm()
@@ -373,20 +499,24 @@ class ParticipantUpdateView(UpdateView):
         return super().form_invalid(form)
 
 
-class ParticipantDeleteView(DeleteView):
+@method_decorator(group_required('Admin', 'Organizer'), name='dispatch')
+class ParticipantDeleteView(DashboardFragmentMixin, DeleteView):
+    fragment_kind = 'participant'
     model = Participant
     success_url = reverse_lazy('dashboard')
+    http_method_names = ['post']
 
-    def get(self, request, *args, **kwargs):
+    def post(self, request, *args, **kwargs):
         self.object = self.get_object()
+        pk = self.object.pk
         self.object.delete()
-        messages.success(request, 'Participant deleted successfully!')
-        return redirect(self.success_url)
+        return self.deleted([pk], 'Participant deleted successfully!')
 
 
 
 @method_decorator(group_required('Admin', 'Organizer'), name='dispatch')
-class CategoryCreateView(CreateView):
+class CategoryCreateView(DashboardFragmentMixin, CreateView):
+    fragment_kind = 'category'
     model = Category
     form_class = CategoryForm
     template_name = 'events/dashboard.html'
@@ -397,13 +527,11 @@ class CategoryCreateView(CreateView):
         today = date.today() 
         context['events'] = Event.objects.select_related('category').prefetch_related('participants').all().order_by(
             '-date', '-time')
+        # the rows' image tags then read them from memory
+        images.ready_hashes(event.image.name for event in context['events'])
         context['participants'] = Participant.objects.prefetch_related('events').all()
-        context['categories'] = Category.objects.all()
-        context['total_participants'] = Participant.objects.aggregate(total=Count('id'))['total']
-        context['total_events'] = Event.objects.aggregate(total=Count('id'))['total']
-        context['total_categories'] = Category.objects.aggregate(total=Count('id'))['total']
-        context['upcoming_events_count'] = Event.objects.filter(date__gte=today).count()
-        context['past_events_count'] = Event.objects.filter(date__lt=today).count()
+        context['categories'] = caches.categories()
+        context.update(caches.dashboard_stats())
         context['todays_events'] = Event.objects.filter(date=today).select_related('category').prefetch_related(
             'participants')
         context['event_form'] = EventForm()
@@ -422,7 +550,8 @@ class CategoryCreateView(CreateView):
 
 
 @method_decorator(group_required('Admin', 'Organizer'), name='dispatch')
-class CategoryUpdateView(UpdateView):
+class CategoryUpdateView(DashboardFragmentMixin, UpdateView):
+    fragment_kind = 'category'
     model = Category
     form_class = CategoryForm
     template_name = 'events/dashboard.html'
@@ -433,13 +562,11 @@ class CategoryUpdateView(UpdateView):
         today = date.today()
         context['events'] = Event.objects.select_related('category').prefetch_related('participants').all().order_by(
             '-date', '-time')
+        # the rows' image tags then read them from memory
+        images.ready_hashes(event.image.name for event in context['events'])
         context['participants'] = Participant.objects.prefetch_related('events').all()
-        context['categories'] = Category.objects.all()
-        context['total_participants'] = Participant.objects.aggregate(total=Count('id'))['total']
-        context['total_events'] = Event.objects.aggregate(total=Count('id'))['total']
-        context['total_categories'] = Category.objects.aggregate(total=Count('id'))['total']
-        context['upcoming_events_count'] = Event.objects.filter(date__gte=today).count()
-        context['past_events_count'] = Event.objects.filter(date__lt=today).count()
+        context['categories'] = caches.categories()
+        context.update(caches.dashboard_stats())
         context['todays_events'] = Event.objects.filter(date=today).select_related('category').prefetch_related(
             'participants')
         context['event_form'] = EventForm()
@@ -467,15 +594,51 @@ class CategoryUpdateView(UpdateView):
 
 
 @method_decorator(group_required('Admin'), name='dispatch')
-class CategoryDeleteView(DeleteView):
+class CategoryDeleteView(DashboardFragmentMixin, DeleteView):
+    fragment_kind = 'category'
     model = Category
     success_url = reverse_lazy('dashboard')
+    http_method_names = ['post']
 
-    def get(self, request, *args, **kwargs):
+    def post(self, request, *args, **kwargs):
         self.object = self.get_object()
-        self.object.delete()
-        messages.success(request, 'Category deleted successfully!')
-        return redirect(self.success_url)
+        # hidden now, rows purged in batches by process_deletions
+        schedule_deletion(Category.objects.filter(pk=self.object.pk), request.user)
+        return self.deleted([self.object.pk], 'Category deleted successfully!')
+
+
+@method_decorator(group_required('Admin', 'Organizer'), name='dispatch')
+class BulkDeleteView(DashboardFragmentMixin, View):
+    http_method_names = ['post']
+    kinds = {'event': Event, 'category': Category}
+
+    def post(self, request, kind):
+        model = self.kinds.get(kind)
+        if model is None:
+            raise Http404('Unknown type')
+        self.fragment_kind = kind
+        ids = [int(value) for value in request.POST.getlist('ids') if value.isdigit()]
+        if not ids:
+            messages.error(request, f'Select at least one {model._meta.verbose_name} to delete.')
+            if wants_fragment(request):
+                return self.fragment_response(counters=False)
+            return redirect('dashboard')
+        count = schedule_deletion(model.objects.filter(pk__in=ids), request.user)
+        name = model._meta.verbose_name if count == 1 else model._meta.verbose_name_plural
+        return self.deleted(ids, f'{count} {name} deleted successfully!')
+
+
+# on get: a decorated dispatch would run sync and load the user on the event loop
+@method_decorator(group_required('Admin', 'Organizer'), name='get')
+class AutocompleteView(View):
+    """JSON prefix search for the dashboard pickers (events.autocomplete): ?q=<prefix>&page=<n>."""
+
+    async def get(self, request, source):
+        if source not in autocomplete.SOURCES:
+            raise Http404('Unknown autocomplete source')
+        page = request.GET.get('page', '1')
+        page = int(page) if page.isdigit() and int(page) > 0 else 1
+        return JsonResponse(await autocomplete.asearch(source, request.GET.get('q', ''), page))
 
 
 class SignUpView(CreateView):
@@ -524,7 +687,7 @@ class DashboardRedirectView(LoginRequiredMixin, View):
     login_url = 'sign-in'
     
     def get(self, request):
-        user_groups = request.user.groups.values_list('name', flat=True)
+        user_groups = roles(request.user)
         if 'Admin' in user_groups:
             return redirect('admin-dashboard')
         elif 'Organizer' in user_groups:
@@ -536,12 +699,12 @@ class DashboardRedirectView(LoginRequiredMixin, View):
             return redirect('sign-in')
 
 
-class AdminDashboardView(LoginRequiredMixin, TemplateView):
+class AdminDashboardView(LoginRequiredMixin, ReplicaReadsMixin, TemplateView):
     template_name = 'events/admin_dashboard.html'
     login_url = 'sign-in'
     
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name='Admin').exists():
+        if not has_role(request.user, 'Admin'):
             messages.error(request, 'Access denied. Admin privileges required.')
             return redirect('dashboard-redirect')
         return super().dispatch(request, *args, **kwargs)
@@ -552,13 +715,9 @@ class AdminDashboardView(LoginRequiredMixin, TemplateView):
         context.update({
             'events': Event.objects.select_related('category').prefetch_related('participants').all().order_by('-date', '-time'),
             'participants': Participant.objects.prefetch_related('events').all(),
-            'categories': Category.objects.all(),
-            'total_participants': Participant.objects.aggregate(total=Count('id'))['total'],
-            'total_events': Event.objects.aggregate(total=Count('id'))['total'],
-            'total_categories': Category.objects.aggregate(total=Count('id'))['total'],
-            'upcoming_events_count': Event.objects.filter(date__gte=today).count(),
-            'past_events_count': Event.objects.filter(date__lt=today).count(),
-            'todays_events': Event.objects.filter(date=today).select_related('category').prefetch_related('participants'),
+            'categories': caches.categories(),
+            **caches.dashboard_stats(),
+            'todays_events': readmodel.upcoming(end=today),
             'event_form': EventForm(),
             'participant_form': ParticipantForm(),
             'category_form': CategoryForm()
@@ -566,12 +725,12 @@ class AdminDashboardView(LoginRequiredMixin, TemplateView):
         return context
 
 
-class OrganizerDashboardView(LoginRequiredMixin, TemplateView):
+class OrganizerDashboardView(LoginRequiredMixin, ReplicaReadsMixin, TemplateView):
     template_name = 'events/organizer_dashboard.html'
     login_url = 'sign-in'
     
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name='Organizer').exists():
+        if not has_role(request.user, 'Organizer'):
             messages.error(request, 'Access denied. Organizer privileges required.')
             return redirect('dashboard-redirect')
         return super().dispatch(request, *args, **kwargs)
@@ -581,15 +740,12 @@ class OrganizerDashboardView(LoginRequiredMixin, TemplateView):
         today = date.today()
         context.update({
             'events': Event.objects.select_related('category').prefetch_related('participants').all().order_by('-date', '-time'),
-            'organized_events': Event.objects.select_related('category').prefetch_related('participants').all().order_by('-date', '-time'),
+            'organized_events': Event.objects.order_by('-date', '-time'),
             'participants': Participant.objects.prefetch_related('events').all(),
-            'categories': Category.objects.all(),
-            'total_participants': Participant.objects.aggregate(total=Count('id'))['total'],
-            'total_events': Event.objects.aggregate(total=Count('id'))['total'],
-            'total_categories': Category.objects.aggregate(total=Count('id'))['total'],
-            'upcoming_events_count': Event.objects.filter(date__gte=today).count(),
-            'past_events_count': Event.objects.filter(date__lt=today).count(),
-            'todays_events': Event.objects.filter(date=today).select_related('category').prefetch_related('participants'),
+            'categories': Category.objects.annotate(
+                event_count=Count('events', filter=Q(events__deleted_at__isnull=True))),
+            **caches.dashboard_stats(),
+            'todays_events': readmodel.upcoming(end=today),
             'event_form': EventForm(),
             'participant_form': ParticipantForm(),
             'category_form': CategoryForm()
@@ -602,14 +758,15 @@ class ParticipantDashboardView(LoginRequiredMixin, TemplateView):
     login_url = 'sign-in'
     
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name__in=['Participant', 'Admin']).exists():
+        if not has_role(request.user, 'Participant', 'Admin'):
             messages.error(request, 'Access denied.')
             return redirect('dashboard-redirect')
         return super().dispatch(request, *args, **kwargs)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['rsvp_events'] = self.request.user.rsvp_events.all()
+        context['rsvp_events'] = self.request.user.rsvp_events.filter(deleted_at__isnull=True)
+        images.ready_hashes(event.image.name for event in context['rsvp_events'])
         return context
 
 
@@ -622,49 +779,51 @@ class RSVPEventView(LoginRequiredMixin, View):
         if event.is_past:
             messages.error(request, 'Cannot RSVP to past events.')
             return redirect('event-detail', pk=event_id)
-        
+
+        try:
+            level, message = self.toggle(request.user, event)
+        except Exception:
+            logger.exception('RSVP failed', extra={'event_id': event_id})
+            level, message = messages.ERROR, 'An error occurred while processing your RSVP. Please try again.'
+        messages.add_message(request, level, message)
+        return redirect('event-detail', pk=event_id)
+
+    @method_decorator(retry_on_lock)
+    def toggle(self, user, event):
+        """The RSVP write, retried as a whole on lock contention; returns a (level, message) for the user."""
         existing_confirmed_rsvp = RSVP.objects.filter(event=event, status='confirmed').first()
-        if existing_confirmed_rsvp and existing_confirmed_rsvp.user != request.user:
-            messages.error(request, 'This event already has a confirmed RSVP. Only one person can RSVP per event.')
-            return redirect('event-detail', pk=event_id)
+        if existing_confirmed_rsvp and existing_confirmed_rsvp.user_id != user.pk:
+            return messages.ERROR, 'This event already has a confirmed RSVP. Only one person can RSVP per event.'
         
-        existing_rsvp = RSVP.objects.filter(user=request.user, event=event).first()
+        existing_rsvp = RSVP.objects.filter(user=user, event=event).first()
         
         if existing_rsvp:
             if existing_rsvp.status == 'confirmed':
                 existing_rsvp.status = 'cancelled'
                 existing_rsvp.save()
-                event.rsvps.remove(request.user)
-                messages.success(request, 'You have successfully cancelled your RSVP.')
-            else:
-                existing_rsvp.status = 'confirmed'
-                existing_rsvp.save()
-                event.rsvps.add(request.user)
-                messages.success(request, 'You have successfully RSVP\'d for this event! A confirmation email has been sent to your registered email address.')
-        else:
-            try:
-                rsvp = RSVP.objects.create(
-                    user=request.user,
-                    event=event,
-                    status='confirmed'
-                )
-                event.rsvps.add(request.user)
-                participant, created = Participant.objects.get_or_create(
-                    name=request.user.get_full_name() or request.user.username,
-                    email=request.user.email,
-                    defaults={
-                        'name': request.user.get_full_name() or request.user.username,
-                        'email': request.user.email
-                    }
-                )
-                
-                participant.events.add(event)
-                
-                messages.success(request, 'You have successfully RSVP\'d for this event and been added as a participant! A confirmation email has been sent to your registered email address.')
-            except Exception as e:
-                messages.error(request, 'An error occurred while processing your RSVP. Please try again.')
-
-        return redirect('event-detail', pk=event_id)
+                event.rsvps.remove(user)
+                return messages.SUCCESS, 'You have successfully cancelled your RSVP.'
+            existing_rsvp.status = 'confirmed'
+            existing_rsvp.save()
+            event.rsvps.add(user)
+            return messages.SUCCESS, 'You have successfully RSVP\'d for this event! A confirmation email has been sent to your registered email address.'
+
+        RSVP.objects.create(
+            user=user,
+            event=event,
+            status='confirmed'
+        )
+        event.rsvps.add(user)
+        participant, created = Participant.objects.get_or_create(
+            name=user.get_full_name() or user.username,
+            email=user.email,
+            defaults={
+                'name': user.get_full_name() or user.username,
+                'email': user.email
+            }
+        )
+        participant.events.add(event)
+        return messages.SUCCESS, 'You have successfully RSVP\'d for this event and been added as a participant! A confirmation email has been sent to your registered email address.'
     
     def get(self, request, event_id):
         return redirect('event-detail', pk=event_id)
@@ -678,12 +837,14 @@ class MyRSVPsView(LoginRequiredMixin, ListView):
     def get_queryset(self):
         return RSVP.objects.filter(
             user=self.request.user, 
-            status='confirmed'
+            status='confirmed',
+            event__deleted_at__isnull=True
         ).select_related('event', 'event__category').order_by('-created_at')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['total_rsvps'] = self.get_queryset().count()
+        images.ready_hashes(rsvp.event.image.name for rsvp in context['rsvps'])
         return context
 
 
@@ -693,13 +854,14 @@ class ManageRSVPsView(LoginRequiredMixin, ListView):
     login_url = 'sign-in'
     
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name__in=['Admin', 'Organizer']).exists():
+        if not has_role(request.user, 'Admin', 'Organizer'):
             messages.error(request, 'Access denied. Admin or Organizer privileges required.')
             return redirect('dashboard-redirect')
         return super().dispatch(request, *args, **kwargs)
     
     def get_queryset(self):
-        return RSVP.objects.select_related('user', 'event', 'event__category').order_by('-created_at')
+        return RSVP.objects.filter(event__deleted_at__isnull=True).select_related(
+            'user', 'event', 'event__category').order_by('-created_at')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -717,9 +879,10 @@ class EventRSVPsView(LoginRequiredMixin, DetailView):
     template_name = 'events/event_rsvps.html'
     context_object_name = 'event'
     login_url = 'sign-in'
+    pk_url_kwarg = 'event_id'
     
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name__in=['Admin', 'Organizer']).exists():
+        if not has_role(request.user, 'Admin', 'Organizer'):
             messages.error(request, 'Access denied. Admin or Organizer privileges required.')
             return redirect('dashboard-redirect')
         return super().dispatch(request, *args, **kwargs)
@@ -732,17 +895,66 @@ class EventRSVPsView(LoginRequiredMixin, DetailView):
             'confirmed_rsvps': rsvps.filter(status='confirmed'),
             'cancelled_rsvps': rsvps.filter(status='cancelled'),
             'total_rsvps': rsvps.filter(status='confirmed').count(),
+            'live_url': live.stream_url(events=[self.object.pk]),
         })
         return context
 
 
+class LiveStreamView(View):
+    """Server-Sent Events for events.live: ?event=<pk> (repeatable) and/or ?dashboard=1."""
+
+    async def get(self, request, *args, **kwargs):
+        if not settings.LIVE_UPDATES or not isinstance(request, ASGIRequest):
+            # a WSGI worker would be held for the life of the stream; 204 stops EventSource retrying
+            return HttpResponse(status=204)
+        request.user = await request.auser()
+        if not await sync_to_async(has_role)(request.user, 'Admin', 'Organizer'):
+            return HttpResponseForbidden()
+        topics = [f'event:{pk}' for pk in request.GET.getlist('event') if pk.isdigit()]
+        if request.GET.get('dashboard'):
+            topics.append('dashboard')
+        if not topics:
+            return HttpResponseBadRequest()
+        response = StreamingHttpResponse(self.stream(request, topics), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # nginx would otherwise buffer the stream
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def render_row(self, request, rsvp):
+        if rsvp is None:
+            return None
+        return render_to_string('events/rsvp_row.html', {'rsvp': rsvp}, request=request)
+
+    async def stream(self, request, topics):
+        queue = live.hub.subscribe(topics)
+        try:
+            yield f'retry: {settings.LIVE_RETRY_MS}\n\n'
+            for name, data in await live.snapshot(topics):
+                yield live.encode(name, data)
+            while True:
+                try:
+                    name, data = await asyncio.wait_for(queue.get(), settings.LIVE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # keeps proxies from closing an idle stream
+                    yield ': ping\n\n'
+                    continue
+                if name is live.OVERFLOW:
+                    return
+                if name == 'rsvp':
+                    data = {'id': data['id'], 'html': self.render_row(request, data['rsvp'])}
+                yield live.encode(name, data)
+        finally:
+            live.hub.unsubscribe(queue, topics)
+
+
 class DeleteRSVPView(LoginRequiredMixin, DeleteView):
     model = RSVP
     success_url = reverse_lazy('manage-rsvps')
     login_url = 'sign-in'
     
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name__in=['Admin', 'Organizer']).exists():
+        if not has_role(request.user, 'Admin', 'Organizer'):
             messages.error(request, 'Access denied. Admin or Organizer privileges required.')
             return redirect('dashboard-redirect')
         return super().dispatch(request, *args, **kwargs)
@@ -759,27 +971,31 @@ class DeleteRSVPView(LoginRequiredMixin, DeleteView):
         event_id = rsvp.event.id
         user = rsvp.user
         
-        rsvp.event.rsvps.remove(user)
-        rsvp.delete()
+        self.remove(rsvp)
         
         messages.success(request, f'RSVP for {user.username} has been removed.')
         return redirect('event-rsvps', event_id=event_id)
 
+    @method_decorator(retry_on_lock)
+    def remove(self, rsvp):
+        rsvp.event.rsvps.remove(rsvp.user)
+        rsvp.delete()
+
 
 class RBACDashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'events/rbac_dashboard.html'
     login_url = 'sign-in'
     
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name='Admin').exists():
+        if not has_role(request.user, 'Admin'):
             messages.error(request, 'Access denied. Admin privileges required.')
             return redirect('dashboard-redirect')
         return super().dispatch(request, *args, **kwargs)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        users = CustomUser.objects.select_related().prefetch_related('groups').all()
-        groups = Group.objects.all()
+        users = CustomUser.objects.select_related().prefetch_related('groups').filter(deleted_at__isnull=True)
+        groups = Group.objects.annotate(user_count=Count('customuser_set'))
         
         # Role info
         for user in users:
@@ -802,7 +1018,7 @@ class AssignUserRoleView(LoginRequiredMixin, View):
     login_url = 'sign-in'
     
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name='Admin').exists():
+        if not has_role(request.user, 'Admin'):
             messages.error(request, 'Access denied. Admin privileges required.')
             return redirect('dashboard-redirect')
         return super().dispatch(request, *args, **kwargs)
@@ -834,7 +1050,7 @@ class CreateGroupView(LoginRequiredMixin, View):
     login_url = 'sign-in'
     
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name='Admin').exists():
+        if not has_role(request.user, 'Admin'):
             messages.error(request, 'Access denied. Admin privileges required.')
             return redirect('dashboard-redirect')
         return super().dispatch(request, *args, **kwargs)
@@ -864,7 +1080,7 @@ class DeleteGroupView(LoginRequiredMixin, DeleteView):
     login_url = 'sign-in'
     
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name='Admin').exists():
+        if not has_role(request.user, 'Admin'):
             messages.error(request, 'Access denied. Admin privileges required.')
             return redirect('dashboard-redirect')
         return super().dispatch(request, *args, **kwargs)
@@ -891,12 +1107,12 @@ class DeleteGroupView(LoginRequiredMixin, DeleteView):
 
 
 class DeleteUserView(LoginRequiredMixin, DeleteView):
-    model = User
+    model = CustomUser
     success_url = reverse_lazy('rbac-dashboard')
     login_url = 'sign-in'
     
     def dispatch(self, request, *args, **kwargs):
-        if not request.user.groups.filter(name='Admin').exists():
+        if not has_role(request.user, 'Admin'):
             messages.error(request, 'Access denied. Admin privileges required.')
             return redirect('dashboard-redirect')
         return super().dispatch(request, *args, **kwargs)
@@ -906,7 +1122,7 @@ class DeleteUserView(LoginRequiredMixin, DeleteView):
         user_id = self.kwargs.get('user_id')
         if user_id is None:
             raise AttributeError("Generic detail view %s must be called with either an object pk or a slug in the URLconf." % self.__class__.__name__)
-        return get_object_or_404(User, id=user_id)
+        return get_object_or_404(CustomUser, id=user_id, deleted_at__isnull=True)
     
     def get(self, request, *args, **kwargs):
         user = self.get_object()
@@ -917,7 +1133,9 @@ class DeleteUserView(LoginRequiredMixin, DeleteView):
             messages.error(request, 'Cannot delete superuser accounts')
         else:
             username = user.username
-            user.delete()
+            schedule_deletion(CustomUser.objects.filter(pk=user.pk), request.user)
             messages.success(request, f'Successfully deleted user: {username}')
         
         return redirect(self.success_url)
+
+    post = get
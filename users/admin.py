@@ -1,5 +1,8 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db import models
+
+from core.uploads import UploadedImageField
 
 from .models import CustomUser, UserProfile
 
@@ -9,6 +12,7 @@ class UserProfileInline(admin.StackedInline):
     can_delete = False
     verbose_name_plural = 'Profile'
     fk_name = 'user'
+    formfield_overrides = {models.ImageField: {'form_class': UploadedImageField}}
 
 
 class CustomUserAdmin(BaseUserAdmin):
@@ -43,6 +47,7 @@ class UserProfileAdmin(admin.ModelAdmin):
     list_filter = ('created_at', 'date_of_birth')
     search_fields = ('user__username', 'user__email', 'phone_number', 'address')
     readonly_fields = ('created_at', 'updated_at')
+    formfield_overrides = {models.ImageField: {'form_class': UploadedImageField}}
 
     fieldsets = (
         ('User Information', {
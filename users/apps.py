@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from core import images
+        from users import roles
+        from users.models import CustomUser, UserProfile
+        roles.connect()
+        images.register(CustomUser, 'profile_picture')
+        images.register(UserProfile, 'profile_picture')
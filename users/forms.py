@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import PasswordChangeForm
 
+from core.uploads import UploadedImageField
 from .models import CustomUser
 
 
@@ -22,6 +23,7 @@ class UserProfileForm(forms.ModelForm):
     class Meta:
         model = CustomUser
         fields = ['phone_number', 'profile_picture', 'bio', 'date_of_birth', 'address']
+        field_classes = {'profile_picture': UploadedImageField}
         widgets = {
             'phone_number': forms.TextInput(attrs={
                 'class': 'form-input',
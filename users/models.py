@@ -1,4 +1,4 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
@@ -7,8 +7,15 @@ from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
+from core import images
+from core.models import ChangeLoggedModel, ChangeLogQuerySet
 
-class CustomUser(AbstractUser):
+
+class CustomUserManager(UserManager.from_queryset(ChangeLogQuerySet)):
+    pass
+
+
+class CustomUser(AbstractUser, ChangeLoggedModel):
     phone_regex = RegexValidator(
         regex=r'^\+?1?\d{9,15}$',
         message=_("Phone number must be entered in the format: '+999999999'. Up to 15 digits allowed.")
@@ -21,6 +28,7 @@ class CustomUser(AbstractUser):
     date_of_birth = models.DateField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
     groups = models.ManyToManyField(
         'auth.Group',
         related_name='customuser_set',
@@ -36,6 +44,8 @@ class CustomUser(AbstractUser):
         verbose_name='user permissions',
     )
 
+    objects = CustomUserManager()
+
     def __str__(self):
         return self.username
 
@@ -74,6 +84,9 @@ class UserProfile(models.Model):
     @property
     def profile_picture_url(self):
         if self.profile_picture and hasattr(self.profile_picture, 'url'):
+            sha256 = images.ready_hash(self.profile_picture.name)
+            if sha256:
+                return images.variant_url(sha256, 'thumbnail', 'webp')
             return self.profile_picture.url
         return '/static/images/default-profile.png'
 
@@ -0,0 +1,29 @@
+"""
+Role (auth group) membership per user, cached per process and dropped in
+every worker through core.invalidation when memberships or groups change.
+"""
+from django.contrib.auth.models import Group
+from django.db import DEFAULT_DB_ALIAS
+
+from core import invalidation
+from .models import CustomUser
+
+_roles = invalidation.LocalCache('roles', max_entries=10000)
+
+
+def roles(user):
+    """Frozen set of the user's group names (empty for anonymous users)."""
+    if not user.is_authenticated:
+        return frozenset()
+    return _roles.get_or_set(user.pk, lambda: frozenset(
+        Group.objects.using(DEFAULT_DB_ALIAS).filter(customuser_set=user.pk).values_list('name', flat=True)))
+
+
+def has_role(user, *names):
+    """True if the user is in at least one of the named groups."""
+    return not roles(user).isdisjoint(names)
+
+
+def connect():
+    """Called from UsersConfig.ready()."""
+    invalidation.watch('roles', Group, CustomUser.groups.through)